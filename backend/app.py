@@ -3,7 +3,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from pymongo import MongoClient
+import redis
 from datetime import timedelta
 import os
 
@@ -11,6 +11,11 @@ import os
 from routes.auth import auth_bp
 from routes.lessons import lessons_bp
 from routes.skills import skills_bp
+from routes.health import health_bp
+from utils.database import init_mongo
+from utils.cache import CacheManager
+from utils.singleflight import SingleFlight
+from utils.session_store import make_session_store
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path='../.env')
@@ -22,7 +27,16 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'dev-key')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     app.config['MONGODB_URI'] = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/innoserve-dev')
+    # Connection pool per worker process (see utils/database.py::mongo_client_options)
+    app.config['MONGO_MAX_POOL_SIZE'] = int(os.environ.get('MONGO_MAX_POOL_SIZE', 50))
+    app.config['MONGO_MIN_POOL_SIZE'] = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+    app.config['MONGO_MAX_IDLE_TIME_MS'] = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 60000))
+    app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+    app.config['MONGO_COMPRESSORS'] = os.environ.get('MONGO_COMPRESSORS')  # e.g. "zstd,zlib"
+    app.config['MONGO_WRITE_CONCERN'] = os.environ.get('MONGO_WRITE_CONCERN')  # e.g. "majority" or "1"
+    app.config['MONGO_READ_PREFERENCE'] = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
     app.config['CORS_ORIGINS'] = os.environ.get('CORS_ORIGINS', 'http://localhost:5173')
+    app.config['REDIS_URL'] = os.environ.get('REDIS_URL')  # optional; without it caches stay in process and due counts/sessions use MongoDB
 
     # Extensions
     CORS(app, origins=app.config['CORS_ORIGINS'].split(','))
@@ -32,18 +46,26 @@ def create_app():
 
     # MongoDB
     try:
-        app.mongo = MongoClient(app.config['MONGODB_URI'], serverSelectionTimeoutMS=5000)
-        # Verify connection
-        app.mongo.server_info()
+        init_mongo(app)
         app.logger.info("Successfully connected to MongoDB")
     except Exception as e:
         app.logger.error(f"Failed to connect to MongoDB: {str(e)}", exc_info=True)
         raise
 
+    # Redis (optional)
+    app.redis = None
+    if app.config['REDIS_URL']:
+        app.redis = redis.Redis.from_url(app.config['REDIS_URL'], socket_timeout=2)
+        app.logger.info("Redis configured")
+    app.cache = CacheManager.for_app(app)
+    app.singleflight = SingleFlight.for_app(app)
+    app.session_store = make_session_store(app)
+
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(lessons_bp, url_prefix='/api/lessons')
     app.register_blueprint(skills_bp, url_prefix='/api/skills')
+    app.register_blueprint(health_bp, url_prefix='/api/health')
 
     return app
 
@@ -0,0 +1,44 @@
+"""
+Gunicorn settings (used by the Dockerfile: gunicorn -c gunicorn.conf.py "app:create_app()").
+
+The app is imported once in the master (preload_app) and the in-memory
+question bank is loaded there, then gc.freeze() moves everything allocated so
+far out of the collector's reach right before workers are forked. Workers
+therefore share those pages copy-on-write instead of each loading (and the GC
+touching) its own copy. MongoClient is not fork-safe, so every worker opens
+its own client (pool sized by the MONGO_* settings) in post_fork.
+
+Workers are threaded (gthread) so a long /lessons/explain/stream response
+holds one thread rather than a whole worker; GUNICORN_THREADS sets the
+threads per worker and the timeout covers the slowest explanation stream.
+"""
+
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+def when_ready(server):
+    from utils.database import get_db
+    from models.question_bank import QuestionBank
+
+    app = server.app.wsgi()
+    with app.app_context():
+        try:
+            QuestionBank.load(get_db())
+        except Exception as e:
+            # Workers fall back to loading the bank lazily on first use
+            server.log.warning(f"Question bank preload failed: {e}")
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+def post_fork(server, worker):
+    from utils.database import init_mongo
+
+    init_mongo(server.app.wsgi())
@@ -0,0 +1,113 @@
+"""
+Due Histogram Schema (MongoDB: due_histograms collection):
+- _id: ObjectId
+- user_id: ObjectId (refers to users._id)
+- buckets: {'YYYY-MM-DD': int} (number of the user's cards whose due_date falls on that UTC day)
+- updated_at: datetime
+
+FSRSCard.save moves a card between buckets ($inc -1 on the old day, +1 on the
+new one), so a forecast read is a single small document fetch regardless of
+how many cards the user has. A bucket the move empties is $unset, so a
+document only holds days that still have due cards (at most one per card)
+rather than every day a card was ever due. scripts/rebuild_due_histograms.py
+recomputes the documents from fsrs_cards if they drift (e.g. after bulk card
+deletes).
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+from pymongo import ReturnDocument
+from utils.database import get_db
+from bson import ObjectId
+from bson.errors import InvalidId
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUCKET_FORMAT = '%Y-%m-%d'
+
+class DueForecast:
+    @staticmethod
+    def bucket_key(value: datetime) -> str:
+        """UTC day bucket for a due date; naive datetimes are treated as UTC."""
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime(BUCKET_FORMAT)
+
+    @classmethod
+    def record_move(cls, user_id, old_due: Optional[datetime], new_due: Optional[datetime], db=None):
+        """Move one card from its old due bucket to its new one (either side may be None)."""
+        old_key = cls.bucket_key(old_due) if old_due else None
+        new_key = cls.bucket_key(new_due) if new_due else None
+        if old_key == new_key:
+            return
+        try:
+            user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
+        except (InvalidId, TypeError):
+            # Cards owned by non-ObjectId users (test fixtures) have no histogram
+            return
+
+        inc = {}
+        if old_key:
+            inc[f'buckets.{old_key}'] = -1
+        if new_key:
+            inc[f'buckets.{new_key}'] = 1
+        db = db if db is not None else get_db()
+        doc = db.due_histograms.find_one_and_update(
+            {'user_id': user_oid},
+            {'$inc': inc, '$set': {'updated_at': datetime.now(timezone.utc)}},
+            projection={f'buckets.{old_key}': 1} if old_key else {'_id': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if old_key and ((doc or {}).get('buckets') or {}).get(old_key, 0) <= 0:
+            # Conditional, so a card moved into the day meanwhile keeps it
+            db.due_histograms.update_one(
+                {'user_id': user_oid, f'buckets.{old_key}': {'$lte': 0}},
+                {'$unset': {f'buckets.{old_key}': ''}}
+            )
+
+    @classmethod
+    def get_forecast(cls, user_id, days: int = 30, now: Optional[datetime] = None) -> dict:
+        """Reviews due per UTC day for the next `days` days; day 0 includes overdue cards."""
+        db = get_db()
+        now = now or datetime.now(timezone.utc)
+        doc = db.due_histograms.find_one({'user_id': ObjectId(user_id)}, {'buckets': 1}) or {}
+        buckets = doc.get('buckets') or {}
+
+        today = cls.bucket_key(now)
+        overdue = sum(count for key, count in buckets.items() if key < today and count > 0)
+        forecast = []
+        for offset in range(days):
+            key = cls.bucket_key(now + timedelta(days=offset))
+            count = max(buckets.get(key, 0), 0)
+            if offset == 0:
+                count += overdue
+            forecast.append({'date': key, 'count': count})
+
+        return {
+            'days': forecast,
+            'overdue': overdue,
+            'total': sum(day['count'] for day in forecast)
+        }
+
+    @classmethod
+    def rebuild_pipeline(cls, match: Optional[dict] = None) -> list:
+        """Aggregation that recomputes histogram buckets from fsrs_cards."""
+        match = dict(match or {})
+        match['due_date'] = {'$type': 'date'}
+        return [
+            {'$match': match},
+            {'$group': {
+                '_id': {
+                    'user_id': '$user_id',
+                    'day': {'$dateToString': {'format': BUCKET_FORMAT, 'date': '$due_date'}}
+                },
+                'count': {'$sum': 1}
+            }},
+            {'$group': {
+                '_id': '$_id.user_id',
+                'buckets': {'$push': {'k': '$_id.day', 'v': '$count'}}
+            }},
+            {'$project': {'buckets': {'$arrayToObject': '$buckets'}}}
+        ]
@@ -13,20 +13,35 @@ FSRS Card Schema (MongoDB: fsrs_cards collection):
 - state: int (FSRS state: New, Learning, Review, Relearning)
 - step: Optional[int] (learning/relearning step; 0+ for Learning/Relearning, None for Review)
 - last_review: datetime (last review timestamp)
+- category: str (lowercased questions.category, denormalized for the user_progress rollup
+  and for skill-filtered due queries on the (user_id, category, due_date) index)
+- question_difficulty: Optional[int] (questions.difficulty 1-5, denormalized)
+- ever_correct: bool (the question has been answered correctly at least once)
 - created_at: datetime
 - updated_at: datetime
 """
 
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 from utils.database import get_db
 from fsrs import Card, State, Rating
 from bson import ObjectId
 from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from models.due_forecast import DueForecast
+from models.user_progress import UserProgress
+from models.question_bank import QuestionBank
+from utils.due_counter import DueCounter
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fields of the previous card document needed by the due histogram and progress rollup
+PREVIOUS_PROJECTION = {
+    'due_date': 1, 'state': 1, 'stability': 1, 'difficulty': 1, 'reps': 1,
+    'lapses': 1, 'last_review': 1, 'category': 1, 'ever_correct': 1
+}
+
 # Normalize string/ObjectId values; keep strings that aren't valid ObjectIds
 def _normalize_id(value):
     if isinstance(value, ObjectId):
@@ -41,7 +56,8 @@ def _normalize_id(value):
 class FSRSCard:
     def __init__(self, user_id=None, question_id=None, due_date=None, stability=None,
                  difficulty=None, elapsed_days=None, scheduled_days=None, reps=None,
-                 lapses=None, step: Optional[int] = None, state=None, last_review=None, _id=None):
+                 lapses=None, step: Optional[int] = None, state=None, last_review=None, _id=None,
+                 category=None, ever_correct=False, question_difficulty=None):
         self._id = _id
         self.user_id = user_id
         self.question_id = question_id
@@ -63,6 +79,9 @@ class FSRSCard:
         else:
             self.step = step
         self.last_review = last_review
+        self.category = category
+        self.question_difficulty = question_difficulty
+        self.ever_correct = bool(ever_correct)
         self.created_at = datetime.now(timezone.utc)
         self.updated_at = datetime.now(timezone.utc)
 
@@ -115,14 +134,40 @@ class FSRSCard:
             'state': self.state,
             'step': self.step,
             'last_review': self.last_review,
+            'category': self.category or '',
+            'question_difficulty': self.question_difficulty,
+            'ever_correct': self.ever_correct,
             'updated_at': self.updated_at
         }
+        # Both paths return the pre-image so the due histogram and progress
+        # rollup can move the card out of its previous bucket without an extra read
         if self._id:
-            db.fsrs_cards.update_one({'_id': self._id}, {'$set': card_data})
+            previous = db.fsrs_cards.find_one_and_update(
+                {'_id': self._id},
+                {'$set': card_data},
+                projection=PREVIOUS_PROJECTION,
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous is None:
+                logger.warning(f"FSRS card {self._id} no longer exists; nothing saved")
+                return
         else:
-            card_data['created_at'] = self.created_at
-            result = db.fsrs_cards.insert_one(card_data)
-            self._id = result.inserted_id
+            # Upsert on the unique (user_id, question_id) key so a brand-new card
+            # is written in one round trip without a prior existence check
+            new_id = ObjectId()
+            previous = db.fsrs_cards.find_one_and_update(
+                {'user_id': card_data['user_id'], 'question_id': card_data['question_id']},
+                {'$set': card_data, '$setOnInsert': {'_id': new_id, 'created_at': self.created_at}},
+                projection=PREVIOUS_PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+            self._id = previous['_id'] if previous else new_id
+        previous_due = previous.get('due_date') if previous else None
+        DueForecast.record_move(card_data['user_id'], previous_due, self.due_date, db=db)
+        DueCounter.record(card_data['user_id'], self._id, self.due_date)
+        # Separate best-effort write after the card update; failures are logged and counted
+        UserProgress.record_card(card_data['user_id'], previous, card_data, db=db)
         logger.debug(f"Saved FSRS card: {self._id}")
 
     def update_from_fsrs_card(self, fsrs_card: Card):
@@ -197,14 +242,23 @@ class FSRSCard:
             return cls._from_dict(card_data)
         return None
 
+    @staticmethod
+    def _due_query(user_id: str, categories: Optional[Iterable[str]] = None,
+                   state: Optional[int] = None) -> dict:
+        # With categories this is a range scan on (user_id, category, due_date)
+        query = {'user_id': _normalize_id(user_id), 'due_date': {'$lte': datetime.now(timezone.utc)}}
+        if categories:
+            query['category'] = {'$in': sorted({c.lower() for c in categories})}
+        if state is not None:
+            query['state'] = state
+        return query
+
     @classmethod
-    def get_due_cards(cls, user_id: str, limit: int = 20) -> List['FSRSCard']:
+    def get_due_cards(cls, user_id: str, limit: int = 20, categories: Optional[Iterable[str]] = None,
+                      state: Optional[int] = None) -> List['FSRSCard']:
+        """Due cards, most overdue first, optionally only in `categories` and/or one state"""
         db = get_db()
-        now = datetime.now(timezone.utc)
-        cursor = db.fsrs_cards.find({
-            'user_id': _normalize_id(user_id),
-            'due_date': {'$lte': now}
-        }).sort('due_date', 1).limit(limit)
+        cursor = db.fsrs_cards.find(cls._due_query(user_id, categories, state)).sort('due_date', 1).limit(limit)
         return [cls._from_dict(card_data) for card_data in cursor]
 
     @classmethod
@@ -231,6 +285,7 @@ class FSRSCard:
     def delete_test_data(cls):
         db = get_db()
         db.fsrs_cards.delete_many({'user_id': {'$regex': 'test_'}})
+        db.user_progress.delete_many({'user_id': {'$regex': 'test_'}})
 
     @classmethod
     def _from_dict(cls, card_data: dict) -> 'FSRSCard':
@@ -266,7 +321,10 @@ class FSRSCard:
             lapses=card_data.get('lapses', 0),
             step=step_val,
             state=state_val,
-            last_review=last_review
+            last_review=last_review,
+            category=card_data.get('category'),
+            ever_correct=card_data.get('ever_correct', False),
+            question_difficulty=card_data.get('question_difficulty')
         )
 
     @staticmethod
@@ -291,74 +349,50 @@ class FSRSCard:
         """Initialize card difficulty from question data"""
         if 'difficulty' in question_data:
             self.difficulty = self.convert_difficulty_to_fsrs(question_data['difficulty'])
+        return self.denormalize_question(question_data)
+
+    def denormalize_question(self, question_data: dict):
+        """Copy the question fields due queries filter on (category, difficulty) onto the card"""
+        self.category = (question_data.get('category') or '').lower()
+        difficulty = question_data.get('difficulty')
+        self.question_difficulty = difficulty if isinstance(difficulty, int) else None
         return self
 
     @classmethod
-    def get_cards_with_context(cls, user_id: str, limit: int = 20) -> List[tuple['FSRSCard', dict]]:
+    def get_cards_with_context(cls, user_id: str, limit: int = 20, categories: Optional[Iterable[str]] = None,
+                               state: Optional[int] = None) -> List[tuple['FSRSCard', dict]]:
         """Get due cards along with their question data"""
         db = get_db()
-        now = datetime.now(timezone.utc)
-        
-        # First get the due cards
-        cursor = db.fsrs_cards.find({
-            'user_id': _normalize_id(user_id),
-            'due_date': {'$lte': now}
-        }).sort('due_date', 1).limit(limit)
-        
-        cards = [cls._from_dict(card_data) for card_data in cursor]
+        cards = cls.get_due_cards(user_id, limit=limit, categories=categories, state=state)
         
-        # Batch fetch questions
+        # Batch fetch questions (from the in-memory question bank)
         obj_ids = []
         for card in cards:
             try:
                 obj_ids.append(ObjectId(card.question_id))
             except (InvalidId, TypeError):
                 continue
-        questions = {
-            str(q['_id']): q 
-            for q in db.questions.find({'_id': {'$in': obj_ids}})
-        }
+        questions = QuestionBank.get_many(obj_ids, db)
         
         return [(card, questions.get(card.question_id, {})) for card in cards]
 
     @classmethod
     def get_user_stats(cls, user_id: str) -> dict:
-        """Aggregate basic study stats for a user."""
-        db = get_db()
-        match_stage = {'$match': {'user_id': _normalize_id(user_id)}}
-        total_pipeline = [
-            match_stage,
-            {'$group': {
-                '_id': None,
-                'total_cards': {'$sum': 1},
-                'total_reps': {'$sum': {'$ifNull': ['$reps', 0]}},
-                'total_lapses': {'$sum': {'$ifNull': ['$lapses', 0]}}
-            }}
-        ]
-        totals = list(db.fsrs_cards.aggregate(total_pipeline))
-        totals_doc = totals[0] if totals else {'total_cards': 0, 'total_reps': 0, 'total_lapses': 0}
-        states_pipeline = [
-            match_stage,
-            {'$group': {
-                '_id': '$state',
-                'count': {'$sum': 1},
-                'avg_stability': {'$avg': {'$ifNull': ['$stability', 0]}},
-                'avg_difficulty': {'$avg': {'$ifNull': ['$difficulty', 0]}}
-            }}
-        ]
+        """Basic study stats for a user, summed from the user_progress rollups."""
+        docs = UserProgress.get_for_user(_normalize_id(user_id))
+        total_reps = int(sum(doc.get('reps', 0) for doc in docs))
+        total_lapses = int(sum(doc.get('lapses', 0) for doc in docs))
         states = []
-        for s in db.fsrs_cards.aggregate(states_pipeline):
+        for state, totals in sorted(UserProgress.state_totals(docs).items()):
             states.append({
-                'state': s['_id'],
-                'count': s['count'],
-                'avg_stability': float(s.get('avg_stability') or 0.0),
-                'avg_difficulty': float(s.get('avg_difficulty') or 0.0)
+                'state': state,
+                'count': totals['count'],
+                'avg_stability': float(totals['stability'] / totals['count']),
+                'avg_difficulty': float(totals['difficulty'] / totals['count'])
             })
-        total_reps = int(totals_doc.get('total_reps', 0) or 0)
-        total_lapses = int(totals_doc.get('total_lapses', 0) or 0)
         retention = (total_reps - total_lapses) / total_reps if total_reps > 0 else 0.0
         return {
-            'total_cards': int(totals_doc.get('total_cards', 0) or 0),
+            'total_cards': int(sum(doc.get('cards', 0) for doc in docs)),
             'total_reps': total_reps,
             'total_lapses': total_lapses,
             'retention_rate': round(retention, 2),
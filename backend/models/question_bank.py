@@ -0,0 +1,283 @@
+"""
+Question Bank Version Schema (MongoDB: question_bank collection):
+- _id: 'meta'
+- version: str (opaque; QuestionBank.publish stores the content hash of the questions collection)
+- published_at: datetime
+
+The question bank changes only when questions are imported or edited, yet
+/next, /submit, /explain and /explain/chat each fetched their question with a
+find_one. QuestionBank keeps an immutable snapshot of the whole collection in
+process memory so those lookups are dictionary hits:
+
+- Records are compact __slots__ objects holding a shared key tuple and a
+  tuple of frozen values; get() materializes a fresh dict for the caller, so
+  handlers can still mutate what they receive.
+- Under gunicorn the snapshot is loaded in the master before fork and
+  gc.freeze()d (see gunicorn.conf.py), so workers share its pages
+  copy-on-write instead of each holding a copy.
+- Workers compare the version published in question_bank every
+  QUESTION_BANK_CHECK_SECONDS and, only when it changed, load a new snapshot
+  in the background and swap the module reference in one assignment. A
+  reload gives the worker a private copy, so the age-based reload
+  (QUESTION_BANK_MAX_AGE_SECONDS) is off unless set. Questions missing from the
+  snapshot are read through the shared cache ('question' namespace) and then
+  MongoDB.
+- Each snapshot also keeps per-(category, difficulty) pools of question ids
+  as tuples, so QuestionBank.sample picks a lesson's questions in O(count)
+  without scanning or copying a category. match_categories resolves the
+  requested names against the pool keys first, falling back to a
+  case-insensitive substring match ("algebra" -> "linear algebra") when no
+  name matches whole, as the old `$regex` query did.
+
+scripts/build_skill_taxonomy.py publishes the version after question imports.
+"""
+
+from datetime import datetime, timezone
+from types import MappingProxyType
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional
+from utils.database import get_db
+from utils.cache import get_cache
+from bson import ObjectId, encode
+import threading
+import hashlib
+import logging
+import random
+import time
+import sys
+import os
+
+logger = logging.getLogger(__name__)
+
+META_ID = 'meta'
+CHECK_INTERVAL = float(os.environ.get('QUESTION_BANK_CHECK_SECONDS', 60))
+MAX_AGE = float(os.environ.get('QUESTION_BANK_MAX_AGE_SECONDS', 0))  # 0 = reload only on a new published version
+FALLBACK_TTL = 300  # seconds a question missing from the snapshot stays in the shared cache
+INTERN_MAX_LENGTH = 64  # categories, sub_topics, tags and types repeat across questions
+
+_key_layouts: Dict[tuple, tuple] = {}
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, str) and len(value) <= INTERN_MAX_LENGTH:
+        return sys.intern(value)
+    return value
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+class QuestionRecord:
+    """One question document, frozen. Documents with the same fields share one key tuple."""
+
+    __slots__ = ('keys', 'values')
+
+    def __init__(self, doc: dict):
+        keys = tuple(sys.intern(key) for key in doc)
+        self.keys = _key_layouts.setdefault(keys, keys)
+        self.values = tuple(_freeze(doc[key]) for key in keys)
+
+    def to_dict(self) -> dict:
+        return {key: _thaw(value) for key, value in zip(self.keys, self.values)}
+
+def _difficulty(doc: dict) -> int:
+    # Same rule as the Question model: 1-5, anything else counts as 1
+    difficulty = doc.get('difficulty')
+    return difficulty if isinstance(difficulty, int) and 1 <= difficulty <= 5 else 1
+
+class QuestionBankSnapshot:
+    __slots__ = ('version', 'published', 'records', 'pools', 'loaded_at')
+
+    def __init__(self, version: str, published: Optional[str], records: Dict[ObjectId, QuestionRecord],
+                 pools: Optional[Dict[str, Dict[int, tuple]]] = None):
+        self.version = version      # content hash of the loaded documents
+        self.published = published  # question_bank version seen when loading
+        self.records = records
+        self.pools = pools or {}    # lowercased category -> difficulty -> tuple of ids
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.records)
+
+_snapshot: Optional[QuestionBankSnapshot] = None
+_load_lock = threading.Lock()
+_state = {'checked': 0.0, 'refreshing': False}
+_refresh_lock = threading.Lock()
+
+class QuestionBank:
+    @staticmethod
+    def content_version(docs: Iterable[dict]) -> str:
+        """Hash of the documents in _id order; equal banks give equal versions."""
+        digest = hashlib.sha1()
+        for doc in docs:
+            digest.update(encode(doc))
+        return digest.hexdigest()
+
+    @classmethod
+    def load(cls, db=None) -> QuestionBankSnapshot:
+        """Read every question into a new snapshot and make it current."""
+        global _snapshot
+        db = db if db is not None else get_db()
+        # Read the published version first so a publish racing this load triggers another one
+        meta = db.question_bank.find_one({'_id': META_ID}, {'version': 1}) or {}
+        digest = hashlib.sha1()
+        records = {}
+        pools: Dict[str, Dict[int, list]] = {}
+        for doc in db.questions.find({}).sort('_id', 1):
+            digest.update(encode(doc))
+            records[doc['_id']] = QuestionRecord(doc)
+            category = doc.get('category')
+            if isinstance(category, str):
+                pools.setdefault(category.lower(), {}).setdefault(_difficulty(doc), []).append(doc['_id'])
+        pools = {category: {difficulty: tuple(ids) for difficulty, ids in levels.items()}
+                 for category, levels in pools.items()}
+        snapshot = QuestionBankSnapshot(digest.hexdigest(), meta.get('version'), records, pools)
+        _snapshot = snapshot  # atomic swap; readers keep whichever snapshot they already hold
+        logger.info(f"Loaded question bank {snapshot.version} ({len(snapshot)} questions)")
+        return snapshot
+
+    @classmethod
+    def publish(cls, db=None) -> str:
+        """Record the current content version so running workers reload their snapshot."""
+        db = db if db is not None else get_db()
+        version = cls.content_version(db.questions.find({}).sort('_id', 1))
+        db.question_bank.update_one(
+            {'_id': META_ID},
+            {'$set': {'version': version, 'published_at': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        return version
+
+    @classmethod
+    def snapshot(cls, db=None) -> QuestionBankSnapshot:
+        """The current snapshot, loading it on first use (when not preloaded before fork)."""
+        snapshot = _snapshot
+        if snapshot is None:
+            with _load_lock:
+                snapshot = _snapshot
+                if snapshot is None:
+                    snapshot = cls.load(db)
+            return snapshot
+        cls._maybe_refresh(snapshot, db)
+        return snapshot
+
+    @classmethod
+    def _maybe_refresh(cls, snapshot: QuestionBankSnapshot, db=None):
+        now = time.monotonic()
+        # Claim the check under the lock so concurrent request threads start at most one reload
+        with _refresh_lock:
+            if now - _state['checked'] < CHECK_INTERVAL or _state['refreshing']:
+                return
+            _state['checked'] = now
+            _state['refreshing'] = True
+        started = False
+        try:
+            started = cls._start_reload(snapshot, now, db)
+        finally:
+            if not started:
+                with _refresh_lock:
+                    _state['refreshing'] = False
+
+    @classmethod
+    def _start_reload(cls, snapshot: QuestionBankSnapshot, now: float, db=None) -> bool:
+        db = db if db is not None else get_db()
+        try:
+            meta = db.question_bank.find_one({'_id': META_ID}, {'version': 1})
+        except Exception as e:
+            logger.warning(f"Could not check question bank version: {e}")
+            return False
+        stale = meta is not None and meta.get('version') != snapshot.published
+        expired = MAX_AGE > 0 and now - snapshot.loaded_at >= MAX_AGE
+        if not stale and not expired:
+            return False
+
+        def reload():
+            try:
+                cls.load(db)
+            except Exception as e:
+                logger.error(f"Failed to reload question bank: {e}", exc_info=True)
+            finally:
+                with _refresh_lock:
+                    _state['refreshing'] = False
+
+        threading.Thread(target=reload, name='question-bank-reload', daemon=True).start()
+        return True
+
+    @classmethod
+    def get(cls, question_id, db=None) -> Optional[dict]:
+        """Question document by id (str or ObjectId), or None if it does not exist."""
+        oid = question_id if isinstance(question_id, ObjectId) else ObjectId(question_id)
+        record = cls.snapshot(db).records.get(oid)
+        if record is not None:
+            return record.to_dict()
+        # Added after the snapshot was taken
+        return cls._load_missing([oid], db).get(str(oid))
+
+    @classmethod
+    def get_many(cls, question_ids: Iterable, db=None) -> Dict[str, dict]:
+        """Questions keyed by str(_id); ids that do not exist are left out."""
+        records = cls.snapshot(db).records
+        found, missing = {}, []
+        for question_id in question_ids:
+            oid = question_id if isinstance(question_id, ObjectId) else ObjectId(question_id)
+            record = records.get(oid)
+            if record is not None:
+                found[str(oid)] = record.to_dict()
+            else:
+                missing.append(oid)
+        if missing:
+            found.update(cls._load_missing(missing, db))
+        return found
+
+    @classmethod
+    def match_categories(cls, categories: Iterable[str], db=None) -> List[str]:
+        """Lowercased bank categories for the requested names: the whole-name
+        matches, or if there are none, every category containing one of them."""
+        snapshot = cls.snapshot(db)
+        requested = list(dict.fromkeys(c.lower() for c in categories))
+        exact = [c for c in requested if c in snapshot.pools]
+        if exact:
+            return exact
+        return sorted(name for name in snapshot.pools if any(c and c in name for c in requested))
+
+    @classmethod
+    def sample(cls, categories: Iterable[str], count: int, difficulties: Optional[Iterable[int]] = None,
+               db=None) -> List[ObjectId]:
+        """Up to `count` distinct random question ids from the categories (matched
+        case-insensitively), optionally only from the given difficulty levels."""
+        snapshot = cls.snapshot(db)
+        levels = set(difficulties) if difficulties else None
+        pools = [
+            pool
+            for category in dict.fromkeys(c.lower() for c in categories)
+            for difficulty, pool in snapshot.pools.get(category, {}).items()
+            if levels is None or difficulty in levels
+        ]
+        # Positions in the pools laid end to end; nothing is concatenated
+        ends = list(accumulate(len(pool) for pool in pools))
+        total = ends[-1] if ends else 0
+        picked = []
+        for position in random.sample(range(total), min(count, total)):
+            i = bisect_right(ends, position)
+            picked.append(pools[i][position - (ends[i - 1] if i else 0)])
+        return picked
+
+    @staticmethod
+    def _load_missing(oids, db=None) -> Dict[str, dict]:
+        """Questions not in the snapshot: shared cache first, then one $in query."""
+        cache = get_cache()
+        found = cache.get_many('question', [str(oid) for oid in oids])
+        remaining = [oid for oid in oids if str(oid) not in found]
+        if remaining:
+            db = db if db is not None else get_db()
+            loaded = {str(doc['_id']): doc for doc in db.questions.find({'_id': {'$in': remaining}})}
+            cache.set_many('question', loaded, ttl=FALLBACK_TTL)
+            found.update(loaded)
+        return found
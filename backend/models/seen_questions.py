@@ -0,0 +1,96 @@
+"""
+Seen Questions Schema (MongoDB: seen_questions collection):
+- _id: str ('<user_id>:<bucket>')
+- user_id: ObjectId (refers to users._id)
+- bucket: int (0..BUCKETS-1, from the question id's trailing counter bytes)
+- ids: [ObjectId] (questions in this bucket the user has answered correctly)
+
+Replaces the unbounded users.seen_question_ids array, which every user load
+used to drag along. A user's set is split over at most BUCKETS small
+documents, and reads never ship the arrays back:
+
+- contains/seen_among project `$setIntersection` of the bucket with the ids
+  asked about, so the server returns only the matches (one query per call).
+- count projects `$size` per bucket and sums at most BUCKETS integers.
+- add is one `$addToSet` upsert per touched bucket, in a single bulk_write.
+
+scripts/migrate_seen_questions.py moves existing users.seen_question_ids here.
+"""
+
+from typing import Dict, Iterable, List, Set
+from bson import ObjectId
+from pymongo import UpdateOne
+from utils.database import get_db
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = 16  # fixed: changing it would move ids to buckets they are not stored in
+
+def _oid(value) -> ObjectId:
+    return value if isinstance(value, ObjectId) else ObjectId(value)
+
+class SeenQuestions:
+    @staticmethod
+    def bucket(question_id) -> int:
+        # The trailing counter bytes of an ObjectId are evenly spread
+        return int(str(_oid(question_id))[-4:], 16) % BUCKETS
+
+    @classmethod
+    def _by_bucket(cls, user_id: ObjectId, question_ids: Iterable) -> Dict[str, List[ObjectId]]:
+        grouped: Dict[str, List[ObjectId]] = {}
+        for question_id in question_ids:
+            oid = _oid(question_id)
+            grouped.setdefault(f"{user_id}:{cls.bucket(oid)}", []).append(oid)
+        return grouped
+
+    @classmethod
+    def add(cls, user_id, question_ids: Iterable, db=None):
+        """Mark questions as seen (idempotent)."""
+        user_id = _oid(user_id)
+        grouped = cls._by_bucket(user_id, question_ids)
+        if not grouped:
+            return
+        db = db if db is not None else get_db()
+        db.seen_questions.bulk_write([
+            UpdateOne(
+                {'_id': key},
+                {'$addToSet': {'ids': {'$each': oids}},
+                 '$setOnInsert': {'user_id': user_id, 'bucket': int(key.rsplit(':', 1)[1])}},
+                upsert=True
+            )
+            for key, oids in grouped.items()
+        ], ordered=False)
+
+    @classmethod
+    def seen_among(cls, user_id, question_ids: Iterable, db=None) -> Set[str]:
+        """Which of `question_ids` the user has seen, as str ids."""
+        grouped = cls._by_bucket(_oid(user_id), question_ids)
+        if not grouped:
+            return set()
+        db = db if db is not None else get_db()
+        # A bucket only holds its own ids, so intersecting each with all of them is exact
+        oids = [oid for ids in grouped.values() for oid in ids]
+        cursor = db.seen_questions.find(
+            {'_id': {'$in': list(grouped)}},
+            {'_id': 0, 'hits': {'$setIntersection': [{'$ifNull': ['$ids', []]}, oids]}}
+        )
+        return {str(oid) for doc in cursor for oid in doc.get('hits', [])}
+
+    @classmethod
+    def contains(cls, user_id, question_id, db=None) -> bool:
+        return str(_oid(question_id)) in cls.seen_among(user_id, [question_id], db)
+
+    @staticmethod
+    def count(user_id, db=None) -> int:
+        db = db if db is not None else get_db()
+        cursor = db.seen_questions.find(
+            {'user_id': _oid(user_id)},
+            {'_id': 0, 'n': {'$size': {'$ifNull': ['$ids', []]}}}
+        )
+        return sum(doc.get('n', 0) for doc in cursor)
+
+    @staticmethod
+    def reset(user_id, db=None):
+        db = db if db is not None else get_db()
+        db.seen_questions.delete_many({'user_id': _oid(user_id)})
@@ -0,0 +1,194 @@
+"""
+Skill Taxonomy Schema (MongoDB: skill_taxonomy collection, single document):
+- _id: 'current'
+- version: str (hash of the tree; served as the ETag)
+- built_at: datetime
+- total: int (questions covered)
+- categories: [{
+    name: str (lowercased category, falling back to the legacy skill_category),
+    count: int,
+    difficulty: {'1'..'5': int} (questions per difficulty level),
+    sub_topics: [{name, count, difficulty, tags: [{name, count, difficulty}]}]
+  }]
+
+The tree only changes when questions are imported, so it is built once by
+scripts/build_skill_taxonomy.py (after imports or on a schedule) instead of
+running distinct scans over questions per request. Workers keep it in an
+in-process cache and revalidate the stored version every
+SKILL_TAXONOMY_TTL_SECONDS through the shared cache ('taxonomy' namespace),
+so MongoDB sees about one read per version instead of one per worker; if no
+document exists yet it is built on demand.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+from utils.database import get_db
+from utils.cache import get_cache
+import threading
+import hashlib
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+TAXONOMY_ID = 'current'
+CACHE_TTL = float(os.environ.get('SKILL_TAXONOMY_TTL_SECONDS', 300))
+
+_NORMALIZED_FIELDS = {'$project': {
+    'category': {'$toLower': {'$ifNull': ['$category', {'$ifNull': ['$skill_category', '']}]}},
+    'sub_topic': {'$ifNull': ['$sub_topic', '']},
+    'difficulty': {'$ifNull': ['$difficulty', 1]},
+    'tags': {'$ifNull': ['$tags', []]}
+}}
+
+# Question counts per (category, sub_topic, difficulty)
+NODE_PIPELINE = [
+    _NORMALIZED_FIELDS,
+    {'$group': {
+        '_id': {'category': '$category', 'sub_topic': '$sub_topic', 'difficulty': '$difficulty'},
+        'count': {'$sum': 1}
+    }}
+]
+
+# Question counts per (category, sub_topic, tag, difficulty)
+TAG_PIPELINE = [
+    _NORMALIZED_FIELDS,
+    {'$unwind': '$tags'},
+    {'$group': {
+        '_id': {'category': '$category', 'sub_topic': '$sub_topic', 'tag': '$tags', 'difficulty': '$difficulty'},
+        'count': {'$sum': 1}
+    }}
+]
+
+_cache = {'doc': None, 'checked': 0.0}
+_cache_lock = threading.Lock()
+
+def _node(name: str) -> dict:
+    return {'name': name, 'count': 0, 'difficulty': {}}
+
+def _add(node: dict, difficulty, count: int):
+    node['count'] += count
+    key = str(difficulty)
+    node['difficulty'][key] = node['difficulty'].get(key, 0) + count
+
+class SkillTaxonomy:
+    @staticmethod
+    def assemble(node_rows: Iterable[dict], tag_rows: Iterable[dict]) -> dict:
+        """Build the category -> sub_topic -> tag tree from the two aggregation results."""
+        categories: Dict[str, dict] = {}
+        sub_topics: Dict[tuple, dict] = {}
+        tags: Dict[tuple, dict] = {}
+        total = 0
+
+        for row in node_rows:
+            key = row['_id']
+            if not key.get('category'):
+                continue
+            category = categories.setdefault(key['category'], dict(_node(key['category']), sub_topics=[]))
+            sub_key = (key['category'], key.get('sub_topic') or '')
+            sub_topic = sub_topics.get(sub_key)
+            if sub_topic is None:
+                sub_topic = sub_topics[sub_key] = dict(_node(sub_key[1]), tags=[])
+                category['sub_topics'].append(sub_topic)
+            _add(category, key.get('difficulty'), row['count'])
+            _add(sub_topic, key.get('difficulty'), row['count'])
+            total += row['count']
+
+        for row in tag_rows:
+            key = row['_id']
+            sub_topic = sub_topics.get((key.get('category'), key.get('sub_topic') or ''))
+            if sub_topic is None or not isinstance(key.get('tag'), str):
+                continue
+            tag_key = (key['category'], sub_topic['name'], key['tag'])
+            tag = tags.get(tag_key)
+            if tag is None:
+                tag = tags[tag_key] = _node(key['tag'])
+                sub_topic['tags'].append(tag)
+            _add(tag, key.get('difficulty'), row['count'])
+
+        ordered = sorted(categories.values(), key=lambda c: c['name'])
+        for category in ordered:
+            category['sub_topics'].sort(key=lambda s: s['name'])
+            for sub_topic in category['sub_topics']:
+                sub_topic['tags'].sort(key=lambda t: t['name'])
+
+        tree = {'total': total, 'categories': ordered}
+        canonical = json.dumps(tree, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        tree['version'] = hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+        return tree
+
+    @classmethod
+    def build(cls, db=None) -> dict:
+        """Recompute the taxonomy from questions and store it."""
+        db = db if db is not None else get_db()
+        tree = cls.assemble(
+            db.questions.aggregate(NODE_PIPELINE, allowDiskUse=True),
+            db.questions.aggregate(TAG_PIPELINE, allowDiskUse=True)
+        )
+        tree['built_at'] = datetime.now(timezone.utc)
+        db.skill_taxonomy.replace_one({'_id': TAXONOMY_ID}, dict(tree, _id=TAXONOMY_ID), upsert=True)
+        logger.info(f"Built skill taxonomy {tree['version']} ({tree['total']} questions)")
+        cls.invalidate()
+        return tree
+
+    @staticmethod
+    def _stored_version(db) -> str:
+        """Version of the stored taxonomy (None if it has not been built)."""
+        stored = db.skill_taxonomy.find_one({'_id': TAXONOMY_ID}, {'version': 1})
+        return stored.get('version') if stored else None
+
+    @staticmethod
+    def _stored_tree(db, version: str) -> dict:
+        doc = db.skill_taxonomy.find_one({'_id': TAXONOMY_ID}, {'_id': 0})
+        return doc if doc and doc.get('version') == version else None
+
+    @classmethod
+    def get(cls) -> dict:
+        """The current taxonomy from the per-process cache."""
+        now = time.monotonic()
+        with _cache_lock:
+            doc = _cache['doc']
+            if doc is not None and now - _cache['checked'] < CACHE_TTL:
+                return doc
+
+        db = get_db()
+        cache = get_cache()
+        # Cheap revalidation: only refetch the tree when the stored version changed
+        version = cache.get_or_load('taxonomy', 'version', lambda: cls._stored_version(db), ttl=int(CACHE_TTL))
+        if doc is not None and version == doc['version']:
+            with _cache_lock:
+                _cache['checked'] = now
+            return doc
+
+        doc = None
+        if version is not None:
+            doc = cache.get_or_load('taxonomy', version, lambda: cls._stored_tree(db, version))
+        if doc is None:
+            doc = cls.build(db)
+            cache.set('taxonomy', 'version', doc['version'], ttl=int(CACHE_TTL))
+        with _cache_lock:
+            _cache['doc'] = doc
+            _cache['checked'] = now
+        return doc
+
+    @staticmethod
+    def invalidate():
+        with _cache_lock:
+            _cache['doc'] = None
+            _cache['checked'] = 0.0
+
+    @classmethod
+    def category_names(cls) -> List[str]:
+        return [category['name'] for category in cls.get()['categories']]
+
+    @classmethod
+    def category_counts(cls) -> Dict[str, int]:
+        return {category['name']: category['count'] for category in cls.get()['categories']}
+
+    @classmethod
+    def count_for(cls, categories: Iterable[str]) -> int:
+        """Number of questions in the given (case-insensitive) categories."""
+        counts = cls.category_counts()
+        return sum(counts.get(name, 0) for name in {name.lower() for name in categories})
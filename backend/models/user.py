@@ -2,12 +2,24 @@ from utils.database import get_db
 from bson import ObjectId
 import datetime
 from utils.security import PasswordManager
+from models.skill_taxonomy import SkillTaxonomy
+from models.seen_questions import SeenQuestions
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fields each loader view reads; a User built from a view only has those set
+USER_VIEWS = {
+    'id': {'_id': 1},
+    'role': {'role': 1, 'auth_version': 1},
+    'auth': {'username': 1, 'email': 1, 'password_hash': 1, 'role': 1, 'auth_version': 1, 'selected_skills': 1},
+    'profile': {'username': 1, 'email': 1, 'role': 1, 'selected_skills': 1, 'scheduler_profile': 1},
+    'stats': {'selected_skills': 1, 'total_questions_answered': 1, 'correct_answers': 1},
+    'full': None,
+}
+
 class User:
-    def __init__(self, id=None, username=None, email=None, password_hash=None, role='user', last_login=None, selected_skills=None, total_questions_answered=0, seen_question_ids=None, correct_answers=0):
+    def __init__(self, id=None, username=None, email=None, password_hash=None, role='user', last_login=None, selected_skills=None, total_questions_answered=0, correct_answers=0, scheduler_profile=None, auth_version=0):
         self.id = id
         self.username = username
         self.email = email
@@ -16,14 +28,16 @@ class User:
         self.last_login = last_login
         self.selected_skills = selected_skills or []
         self.total_questions_answered = total_questions_answered
-        self.seen_question_ids = seen_question_ids or []
         self.correct_answers = correct_answers or 0
+        self.scheduler_profile = scheduler_profile or {}
+        # Bumped whenever the role changes; tokens carry the value they were issued with
+        self.auth_version = auth_version or 0
 
     @classmethod
-    def find_by_email(cls, email):
+    def find_by_email(cls, email, view='auth'):
         db = get_db()
         try:
-            data = db.users.find_one({'email': email})
+            data = db.users.find_one({'email': email}, USER_VIEWS[view])
             if data:
                 logger.info(f"Found user with email {email}")
                 return cls._from_dict(data)
@@ -34,21 +48,35 @@ class User:
             return None
 
     @classmethod
-    def find_by_username(cls, username):
+    def find_by_username(cls, username, view='profile'):
         db = get_db()
-        data = db.users.find_one({'username': username})
+        data = db.users.find_one({'username': username}, USER_VIEWS[view])
         if data:
             return cls._from_dict(data)
         return None
 
     @classmethod
-    def get_by_id(cls, user_id):
+    def get_by_id(cls, user_id, view='profile'):
         db = get_db()
-        data = db.users.find_one({'_id': ObjectId(user_id)})
+        data = db.users.find_one({'_id': ObjectId(user_id)}, USER_VIEWS[view])
         if data:
             return cls._from_dict(data)
         return None
 
+    @classmethod
+    def get_scheduler_profile(cls, user_id):
+        """Fetch only the user's stored FSRS scheduler profile."""
+        db = get_db()
+        data = db.users.find_one({'_id': ObjectId(user_id)}, {'scheduler_profile': 1})
+        return (data or {}).get('scheduler_profile') or {}
+
+    @classmethod
+    def update_scheduler_profile(cls, user_id, profile):
+        """Store a validated scheduler profile; returns False if the user does not exist."""
+        db = get_db()
+        result = db.users.update_one({'_id': ObjectId(user_id)}, {'$set': {'scheduler_profile': profile}})
+        return result.matched_count == 1
+
     @classmethod
     def create_user(cls, username, email, password):
         db = get_db()
@@ -66,13 +94,24 @@ class User:
         user['_id'] = result.inserted_id
         return cls._from_dict(user)
 
+    @classmethod
+    def set_role(cls, user_id, role):
+        """Change a user's role; bumping auth_version retires tokens issued with the old one."""
+        db = get_db()
+        result = db.users.update_one({'_id': ObjectId(user_id)}, {'$set': {'role': role}, '$inc': {'auth_version': 1}})
+        return result.matched_count == 1
+
     def check_password(self, password):
         return PasswordManager.verify_password(password, self.password_hash)
 
-    def update_last_login(self):
+    def update_last_login(self, password_hash=None):
+        """Record a login; `password_hash` replaces the stored hash in the same update (rehash on login)."""
         db = get_db()
         self.last_login = datetime.datetime.utcnow()
-        db.users.update_one({'_id': ObjectId(self.id)}, {'$set': {'last_login': self.last_login}})
+        update = {'last_login': self.last_login}
+        if password_hash:
+            self.password_hash = update['password_hash'] = password_hash
+        db.users.update_one({'_id': ObjectId(self.id)}, {'$set': update})
 
     @classmethod
     def create_test_user(cls):
@@ -85,13 +124,14 @@ class User:
 
     def mark_question_seen(self, question_id):
         """Mark a question as seen only if it's correctly answered."""
-        db = get_db()
-        db.users.update_one(
-            {'_id': ObjectId(self.id)},
-            {'$addToSet': {'seen_question_ids': ObjectId(question_id)}}
-        )
-        self.seen_question_ids.append(str(question_id))
-        
+        SeenQuestions.add(self.id, [question_id])
+
+    def has_seen(self, question_id):
+        return SeenQuestions.contains(self.id, question_id)
+
+    def seen_count(self):
+        return SeenQuestions.count(self.id)
+
     def reset_question_tracking(self):
         """Reset question tracking for this user."""
         db = get_db()
@@ -99,13 +139,12 @@ class User:
             {'_id': ObjectId(self.id)},
             {
                 '$set': {
-                    'seen_question_ids': [],
                     'total_questions_answered': 0,
                     'correct_answers': 0
                 }
             }
         )
-        self.seen_question_ids = []
+        SeenQuestions.reset(self.id, db)
         self.total_questions_answered = 0
         self.correct_answers = 0
 
@@ -114,19 +153,16 @@ class User:
         return {
             'total_questions': self.total_questions_answered,
             'correct_questions': self.correct_answers,
-            'seen_questions': len(self.seen_question_ids),
+            'seen_questions': self.seen_count(),
             'accuracy': round((self.correct_answers / self.total_questions_answered * 100), 2) if self.total_questions_answered > 0 else 0
         }
 
     def get_completion_status(self):
         """Check completion status for questions in user's selected skills."""
-        db = get_db()
         # Get total questions in user's selected skills
-        total_questions = db.questions.count_documents({
-            'category': {'$in': [s.lower() for s in self.selected_skills]}
-        })
+        total_questions = SkillTaxonomy.count_for(self.selected_skills)
         # Get correctly answered questions (seen questions are only those answered correctly)
-        completed_questions = len(self.seen_question_ids)
+        completed_questions = self.seen_count()
         
         return {
             'total_available': total_questions,
@@ -145,8 +181,9 @@ class User:
             last_login=data.get('last_login'),
             selected_skills=data.get('selected_skills', []),
             total_questions_answered=data.get('total_questions_answered', 0),
-            seen_question_ids=data.get('seen_question_ids', []),
-            correct_answers=data.get('correct_answers', 0)
+            correct_answers=data.get('correct_answers', 0),
+            scheduler_profile=data.get('scheduler_profile'),
+            auth_version=data.get('auth_version', 0)
         )
 
     @staticmethod
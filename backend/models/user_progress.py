@@ -0,0 +1,126 @@
+"""
+User Progress Schema (MongoDB: user_progress collection):
+- _id: ObjectId
+- user_id: ObjectId (refers to users._id)
+- category: str (lowercased questions.category of the card's question; '' if unknown)
+- answered: int (distinct questions answered = cards with a last_review)
+- correct: int (distinct questions answered correctly at least once = cards with ever_correct)
+- cards: int (FSRS cards)
+- states: {'<state>': int} (cards per FSRS state)
+- stability_sum / difficulty_sum: {'<state>': float} (for per-state averages)
+- reps, lapses: int (sums over the cards)
+- updated_at: datetime
+
+FSRSCard.save computes the difference between the card's previous document
+(returned by its find_one_and_update) and the new one and applies it with one
+$inc upsert per touched category, so /api/lessons/progress-summary and
+FSRSCard.get_user_stats read a handful of small documents instead of
+aggregating the user's whole history.
+
+The rollup is best-effort: it is written after the card update, not
+atomically with it. A failed rollup write is logged and counted (stats(),
+/health/progress) and does not fail the answer; the affected user's rollups
+are then off until scripts/backfill_user_progress.py rebuilds them from
+fsrs_cards and lesson_reports (which is also how existing data is loaded).
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from utils.database import get_db
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {'writes': 0, 'failed_writes': 0}
+
+class UserProgress:
+    @staticmethod
+    def card_contribution(card: dict, sign: int = 1) -> Dict[str, float]:
+        """Counters one card document adds to its category rollup."""
+        state = str(card.get('state'))
+        contribution = {
+            'cards': sign,
+            f'states.{state}': sign,
+            f'stability_sum.{state}': sign * (card.get('stability') or 0.0),
+            f'difficulty_sum.{state}': sign * (card.get('difficulty') or 0.0),
+            'reps': sign * (card.get('reps') or 0),
+            'lapses': sign * (card.get('lapses') or 0),
+        }
+        if card.get('last_review'):
+            contribution['answered'] = sign
+        if card.get('ever_correct'):
+            contribution['correct'] = sign
+        return contribution
+
+    @classmethod
+    def card_delta(cls, previous: Optional[dict], current: dict) -> Dict[str, Dict[str, float]]:
+        """$inc per category for a card moving from `previous` to `current`.
+
+        Cards written before the rollup existed have no `category` field and were
+        never counted, so they are only added.
+        """
+        deltas: Dict[str, Dict[str, float]] = {}
+
+        def add(card, sign):
+            inc = deltas.setdefault(card.get('category') or '', {})
+            for field, value in cls.card_contribution(card, sign).items():
+                inc[field] = inc.get(field, 0) + value
+
+        if previous is not None and 'category' in previous:
+            add(previous, -1)
+        add(current, 1)
+        return {
+            category: {field: value for field, value in inc.items() if value}
+            for category, inc in deltas.items()
+        }
+
+    @classmethod
+    def record_card(cls, user_id, previous: Optional[dict], current: dict, db=None):
+        """Apply a card change to the user's rollups (one upsert per touched category).
+
+        Best-effort: the card is already saved, so a failed write is logged and
+        counted instead of raised; backfill_user_progress.py repairs the rollup.
+        """
+        db = db if db is not None else get_db()
+        now = datetime.now(timezone.utc)
+        for category, inc in cls.card_delta(previous, current).items():
+            if not inc:
+                continue
+            try:
+                db.user_progress.update_one(
+                    {'user_id': user_id, 'category': category},
+                    {'$inc': inc, '$set': {'updated_at': now}},
+                    upsert=True
+                )
+                outcome = 'writes'
+            except Exception as e:
+                logger.error(f"user_progress rollup write failed for user {user_id}, "
+                             f"category {category!r} (run backfill_user_progress.py): {str(e)}")
+                outcome = 'failed_writes'
+            with _stats_lock:
+                _stats[outcome] += 1
+
+    @staticmethod
+    def stats() -> dict:
+        """Rollup writes and failed rollup writes in this process."""
+        with _stats_lock:
+            return dict(_stats)
+
+    @staticmethod
+    def get_for_user(user_id, db=None) -> List[dict]:
+        db = db if db is not None else get_db()
+        return list(db.user_progress.find({'user_id': user_id}, {'_id': 0, 'user_id': 0}))
+
+    @staticmethod
+    def state_totals(docs: List[dict]) -> Dict[int, dict]:
+        """Card count and stability/difficulty sums per FSRS state across categories."""
+        totals: Dict[int, dict] = {}
+        for doc in docs:
+            for state, count in (doc.get('states') or {}).items():
+                entry = totals.setdefault(int(state), {'count': 0, 'stability': 0.0, 'difficulty': 0.0})
+                entry['count'] += count
+                entry['stability'] += (doc.get('stability_sum') or {}).get(state, 0.0)
+                entry['difficulty'] += (doc.get('difficulty_sum') or {}).get(state, 0.0)
+        return {state: entry for state, entry in totals.items() if entry['count'] > 0}
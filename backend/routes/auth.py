@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models.user import User
-from utils.security import PasswordManager
+from utils.security import PasswordManager, access_token_claims
+from utils.fsrs_helper import FSRSHelper
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -18,10 +20,6 @@ def register():
     for field in required_fields:
         if not data.get(field):
             return jsonify({'error': f'{field} required'}), 400
-    if User.find_by_email(data['email']):
-        return jsonify({'error': '該電子郵件信箱已被註冊'}), 409
-    if User.find_by_username(data['username']):
-        return jsonify({'error': '該使用者名稱已被註冊'}), 409
     try:
         user = User.create_user(
             username=data['username'],
@@ -29,6 +27,11 @@ def register():
             password=data['password']
         )
         return jsonify({'message': 'User created successfully', 'user_id': str(user.id)}), 201
+    except DuplicateKeyError as e:
+        # The unique email/username indexes decide; no lookups before the insert
+        if 'email' in ((e.details or {}).get('keyPattern') or {}):
+            return jsonify({'error': '該電子郵件信箱已被註冊'}), 409
+        return jsonify({'error': '該使用者名稱已被註冊'}), 409
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -58,8 +61,10 @@ def login():
             current_app.logger.warning(f"Login failed: Invalid password for email {data.get('email')}")
             return jsonify({'error': '電子郵件信箱或密碼有誤'}), 401
             
-        user.update_last_login()
-        access_token = create_access_token(identity=str(user.id))
+        # Hashes made with an older BCRYPT_ROUNDS are upgraded while the password is at hand
+        rehashed = PasswordManager.hash_password(data['password']) if PasswordManager.needs_rehash(user.password_hash) else None
+        user.update_last_login(rehashed)
+        access_token = create_access_token(identity=str(user.id), additional_claims=access_token_claims(user))
         
         # Return user info including selected_skills
         user_data = {
@@ -93,7 +98,8 @@ def get_current_user():
         'username': user.username,
         'email': user.email,
         'selected_skills': getattr(user, 'selected_skills', []),
-        'role': getattr(user, 'role', 'user')
+        'role': getattr(user, 'role', 'user'),
+        'scheduler_profile': getattr(user, 'scheduler_profile', {})
     }
     return jsonify(user_data)
 
@@ -113,3 +119,17 @@ def update_skills():
         return jsonify({'message': 'Skills updated successfully'})
     else:
         return jsonify({'error': 'User not found or no change'}), 404
+
+@auth_bp.route('/scheduler-profile', methods=['PATCH'])
+@jwt_required()
+def update_scheduler_profile():
+    """Set the user's FSRS scheduler profile (user_level, desired_retention, steps, ...)."""
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    try:
+        profile = FSRSHelper.normalize_profile(data.get('scheduler_profile'))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    if not User.update_scheduler_profile(user_id, profile):
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify({'message': 'Scheduler profile updated', 'scheduler_profile': profile})
@@ -0,0 +1,80 @@
+from flask import Blueprint, jsonify, current_app
+from utils.security import require_role, get_principal_cache
+from utils.cache import get_cache
+from utils.singleflight import get_singleflight
+from utils.followup_cache import get_followup_cache
+from utils.explanation_cache import get_explanation_cache
+from utils.database import get_pool_stats
+from models.user_progress import UserProgress
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/cache', methods=['GET'])
+@require_role('admin')
+def cache_stats():
+    """Hit/miss counters per cache namespace for this worker"""
+    try:
+        return jsonify(get_cache().stats())
+    except Exception as e:
+        current_app.logger.error(f"Error reading cache stats: {str(e)}")
+        return jsonify({'error': 'Failed to read cache stats'}), 500
+
+@health_bp.route('/singleflight', methods=['GET'])
+@require_role('admin')
+def singleflight_stats():
+    """Coalescing counters for explanation generation in this worker"""
+    try:
+        return jsonify(get_singleflight().stats())
+    except Exception as e:
+        current_app.logger.error(f"Error reading singleflight stats: {str(e)}")
+        return jsonify({'error': 'Failed to read singleflight stats'}), 500
+
+@health_bp.route('/followup', methods=['GET'])
+@require_role('admin')
+def followup_stats():
+    """Follow-up answer cache counters (exact/similar hits, misses) for this worker"""
+    try:
+        return jsonify(get_followup_cache().stats())
+    except Exception as e:
+        current_app.logger.error(f"Error reading follow-up cache stats: {str(e)}")
+        return jsonify({'error': 'Failed to read follow-up cache stats'}), 500
+
+@health_bp.route('/explanations', methods=['GET'])
+@require_role('admin')
+def explanation_cache_stats():
+    """Explanation lookups per cache level and in-process LRU usage for this worker"""
+    try:
+        return jsonify(get_explanation_cache().stats())
+    except Exception as e:
+        current_app.logger.error(f"Error reading explanation cache stats: {str(e)}")
+        return jsonify({'error': 'Failed to read explanation cache stats'}), 500
+
+@health_bp.route('/principals', methods=['GET'])
+@require_role('admin')
+def principal_cache_stats():
+    """Role lookups served from the principal cache vs the database for this worker"""
+    try:
+        return jsonify(get_principal_cache().stats())
+    except Exception as e:
+        current_app.logger.error(f"Error reading principal cache stats: {str(e)}")
+        return jsonify({'error': 'Failed to read principal cache stats'}), 500
+
+@health_bp.route('/mongo', methods=['GET'])
+@require_role('admin')
+def mongo_pool_stats():
+    """MongoDB connection checkouts, waits and connections in use for this worker"""
+    try:
+        return jsonify(get_pool_stats())
+    except Exception as e:
+        current_app.logger.error(f"Error reading MongoDB pool stats: {str(e)}")
+        return jsonify({'error': 'Failed to read MongoDB pool stats'}), 500
+
+@health_bp.route('/progress', methods=['GET'])
+@require_role('admin')
+def progress_rollup_stats():
+    """user_progress rollup writes and failed writes for this worker"""
+    try:
+        return jsonify(UserProgress.stats())
+    except Exception as e:
+        current_app.logger.error(f"Error reading progress rollup stats: {str(e)}")
+        return jsonify({'error': 'Failed to read progress rollup stats'}), 500
@@ -1,19 +1,32 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.fsrs_helper import FSRSHelper
 from models.user import User
 from models.question import Question
+from models.question_bank import QuestionBank
 from models.fsrs_card import FSRSCard
+from models.due_forecast import DueForecast
+from utils.due_counter import DueCounter
+from models.user_progress import UserProgress
+from models.skill_taxonomy import SkillTaxonomy
 from utils.security import log_errors
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from marshmallow import Schema, fields, validate, ValidationError
 from bson import ObjectId
-from datetime import datetime, timezone
+from datetime import datetime
 import logging
-import re
+import json
 from fsrs import State, Rating
 from utils.database import get_db
+from utils.explanation_cache import get_explanation_cache, question_version
+from utils.singleflight import get_singleflight
+from utils.llm_helper import get_llm
+from utils.followup_cache import get_followup_cache, selection_key
+from utils.chat_context import THREAD_CONTEXT_PROJECTION, build_chat_context
+from utils.submit_pipeline import SubmitPipeline
+from utils.lesson_composer import LESSON_SIZE, compose_lesson, serve_questions
+from utils.session_store import get_session_store
 
 logger = logging.getLogger(__name__)
 lessons_bp = Blueprint('lessons', __name__)
@@ -22,6 +35,7 @@ limiter = Limiter(key_func=get_remote_address)
 class LessonStartSchema(Schema):
     skill_ids = fields.List(fields.String(), required=True, validate=validate.Length(min=1, max=10))
     type = fields.String(required=True, validate=validate.OneOf(['initial', 'review', 'practice']))
+    difficulty = fields.List(fields.Integer(validate=validate.Range(min=1, max=5)), validate=validate.Length(min=1, max=5))
 
 class ExplanationRequestSchema(Schema):
     question_id = fields.String(required=True)
@@ -63,56 +77,31 @@ def start_lesson():
             return jsonify({'error': 'User not found'}), 404
 
         # Log available categories first
-        available_cats = list(db.questions.distinct('category'))
+        available_cats = SkillTaxonomy.category_names()
         logger.info(f"Available categories in DB: {available_cats}")
         logger.info(f"Requested categories: {categories}")
         
-        # Find questions for selected categories
-        pipeline = [
-            {'$match': {'category': {'$in': categories}}},
-            {'$project': {'_id': 1, 'category': 1, 'question_text': 1, 'text': 1, 'options': 1}}
-        ]
-        questions = list(db.questions.aggregate(pipeline))
-        logger.info(f"Found {len(questions)} questions matching categories: {categories}")
-        
-        if not questions:
-            # Try case-insensitive search
-            pipeline = [
-                {'$match': {'category': {'$regex': '|'.join(map(re.escape, categories)), '$options': 'i'}}},
-                {'$project': {'_id': 1, 'category': 1, 'question_text': 1, 'text': 1, 'options': 1}}
-            ]
-            questions = list(db.questions.aggregate(pipeline))
-            logger.info(f"Case-insensitive search found {len(questions)} questions")
-        
-        if not questions:
+        # Due cards first, then new and practice questions, as the lesson type allows
+        plan = compose_lesson(db, user_id, categories, lesson_type, validated_data.get('difficulty'))
+        question_ids = plan.question_ids
+        logger.info(f"Composed lesson for categories {categories}: {plan.due} due, {plan.new} new, {plan.practice} practice")
+
+        if not question_ids:
             logger.error(f"No questions found for categories: {categories}")
             return jsonify({'error': 'No questions found for selected categories'}), 404
-            
-        # Limit to 10 random questions
-        import random
-        if len(questions) > 10:
-            questions = random.sample(questions, 10)
 
         # Create a new session
         session_id = str(ObjectId())
-        session = {
-            'session_id': session_id,
-            'user_id': user_id,
-            'selected_categories': categories,
-            'type': lesson_type,
-            'available_questions': [str(q['_id']) for q in questions],
-            'used_questions': [],
-            'completed': False,
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
-        }
-
-        db.lesson_sessions.insert_one(session)
+        get_session_store().create(
+            session_id, user_id, [str(oid) for oid in question_ids],
+            selected_categories=categories, type=lesson_type
+        )
         logger.info(f"Created new lesson session {session_id} for user {user_id}")
 
         return jsonify({
             'session_id': session_id,
-            'total_questions': len(questions),
+            'total_questions': len(question_ids),
+            'composition': {'due': plan.due, 'new': plan.new, 'practice': plan.practice},
             'categories': categories,
             'type': lesson_type
         })
@@ -124,84 +113,63 @@ def start_lesson():
 @lessons_bp.route('/next', methods=['POST'])
 @jwt_required()
 def next_question():
-    data = request.get_json()
+    """Next question of a session, or with `prefetch` (1-10) the next K questions.
+
+    Prefetch responses carry `questions` and `remaining`; every question is
+    trimmed to the served fields with an `is_review` flag, and the session
+    cursor moves past all returned questions in one update.
+    """
+    data = request.get_json() or {}
     session_id = data.get('session_id')
+    prefetch = data.get('prefetch')
     logger.info(f"Fetching next question for session: {session_id}")
-    
-    db = Question.get_db() if hasattr(Question, 'get_db') else None
-    if db is None:
-        from utils.database import get_db
-        db = get_db()
-    
-    session = db.lesson_sessions.find_one({'session_id': session_id})
-    if not session:
+
+    try:
+        count = 1 if prefetch is None else min(max(int(prefetch), 1), LESSON_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'prefetch must be an integer'}), 400
+
+    user_id = get_jwt_identity()
+    step = get_session_store().next(session_id, user_id, count)
+    if step is None:
         logger.error(f"Session not found: {session_id}")
         return jsonify({'error': 'Session not found'}), 404
-    
-    # Get session state
-    skill_ids = [s.lower() for s in session['selected_categories']]
-    available_questions = session.get('available_questions', [])
-    used_questions = session.get('used_questions', [])
-    
-    # Check if we've used all available questions
-    if not available_questions:
+
+    if not step.question_ids:
         logger.info("No more available questions - session complete")
         return jsonify({'completed': True, 'message': 'Session complete'}), 200
-    
-    # Get next question from available questions
-    if available_questions:
-        next_q_id = available_questions[0]
-        next_q = db.questions.find_one({'_id': ObjectId(next_q_id)})
-        
-        if next_q:
-            user_id = session['user_id']
-            # Check if user has seen this question before
-            existing_card = FSRSCard.get_by_user_and_question(user_id, next_q_id)
-            # A question is considered for review if it exists and has been reviewed before
-            is_review = existing_card is not None and existing_card.last_review is not None
-
-            # Update session state
-            db.lesson_sessions.update_one(
-                {'session_id': session_id},
-                {'$pull': {'available_questions': next_q_id},
-                 '$push': {'used_questions': next_q_id}}
-            )
-
-            # Convert ObjectId to string for the response
-            next_q['_id'] = str(next_q['_id'])
-            
-            # Return the question with all necessary fields
-            return jsonify({
-                'question': {
-                    **next_q,
-                    'id': next_q['_id'],  # Add both id and _id for compatibility
-                    'is_review': is_review,
-                }
-            })
-        else:
-            logger.error(f"Question {next_q_id} not found in database")
-            return jsonify({'error': 'Question not found'}), 404
-    else:
-        logger.info("No more available questions")
-        return jsonify({'completed': True, 'message': 'Session complete'}), 200
+
+    questions = serve_questions(get_db(), user_id, step.question_ids)
+    if not questions:
+        logger.error(f"Questions {step.question_ids} not found in database")
+        return jsonify({'error': 'Question not found'}), 404
+    if prefetch is None:
+        return jsonify({'question': questions[0]})
+    return jsonify({'questions': questions, 'remaining': step.remaining, 'completed': False})
 
 @lessons_bp.route('/due-count', methods=['GET'])
 @jwt_required()
 def get_due_count():
     user_id = get_jwt_identity()
     try:
-        db = get_db()
-        # Count all due cards accurately (no arbitrary limit)
-        now = datetime.utcnow()
-        due_filter = {
-            'user_id': ObjectId(user_id),
-            'due_date': { '$lte': now }
-        }
-        due_count = db.fsrs_cards.count_documents(due_filter)
+        # Rank query on the user's maintained due counter instead of a count_documents scan
+        due_count = DueCounter.count_due(user_id)
         return jsonify({'due_count': due_count, 'review_count': due_count})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@lessons_bp.route('/forecast', methods=['GET'])
+@jwt_required()
+def get_review_forecast():
+    """Reviews due on each of the next N UTC days, served from the user's due histogram."""
+    user_id = get_jwt_identity()
+    try:
+        days = min(max(request.args.get('days', 30, type=int), 1), 365)
+        return jsonify(DueForecast.get_forecast(user_id, days=days))
+    except Exception as e:
+        logger.error(f"Error in forecast: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @lessons_bp.route('/progress-summary', methods=['GET'])
 @jwt_required()
 def get_progress_summary():
@@ -212,41 +180,23 @@ def get_progress_summary():
         db = get_db()
         
         # Get the user and their skills
-        user = db.users.find_one({'_id': ObjectId(user_id)})
+        user = db.users.find_one({'_id': ObjectId(user_id)}, {'selected_skills': 1})
         if not user:
             return jsonify({'error': 'User not found'}), 404
             
         # Case-insensitive selection from user
         selected_skills = [s.lower() for s in user.get('selected_skills', [])]
         
-        # Aggregate answers across all categories first (robust baseline)
-        base_pipeline = [
-            {'$match': {'user_id': ObjectId(user_id)}},
-            {'$lookup': {
-                'from': 'questions',
-                'localField': 'question_id',
-                'foreignField': '_id',
-                'as': 'question'
-            }},
-            {'$unwind': '$question'},
-            {'$group': {
-                '_id': '$question.category',
-                'answered_set': {'$addToSet': '$question_id'},
-                'correct_ids': {'$addToSet': {'$cond': [{'$eq': ['$is_correct', True]}, '$question_id', None]}}
-            }},
-            {'$project': {
-                '_id': 1,
-                'answered': {'$size': '$answered_set'},
-                'total_correct': {'$size': {'$setDifference': ['$correct_ids', [None]]}}
-            }}
-        ]
-        all_progress_list = list(db.lesson_reports.aggregate(base_pipeline))
-        progress_by_cat_all = {s['_id'].lower(): s for s in all_progress_list}
-
-        # Totals per category (all)
-        totals_all = {doc['_id'].lower(): doc['total'] for doc in db.questions.aggregate([
-            {'$group': {'_id': '$category', 'total': {'$sum': 1}}}
-        ])}
+        # Per-category rollups maintained on every card save (see models/user_progress.py)
+        progress_docs = UserProgress.get_for_user(ObjectId(user_id), db=db)
+        progress_by_cat_all = {
+            doc['category']: {'answered': doc.get('answered', 0), 'total_correct': doc.get('correct', 0)}
+            for doc in progress_docs
+            if doc.get('category') and doc.get('answered', 0) > 0
+        }
+
+        # Totals per category (all), from the cached skill taxonomy
+        totals_all = SkillTaxonomy.category_counts()
 
         # If user has selected skills, try to filter by them; otherwise use all
         use_selected = bool(selected_skills)
@@ -293,16 +243,7 @@ def get_progress_summary():
                     mastery_rate += skill_mastery * mastery_weights.get(skill, 0)
         
         # FSRS stats
-        fsrs_stats = db.fsrs_cards.aggregate([
-            {'$match': {'user_id': ObjectId(user_id)}},
-            {'$group': {
-                '_id': None,
-                'learning_count': {'$sum': {'$cond': [{'$eq': ['$state', 1]}, 1, 0]}},
-                'review_count': {'$sum': {'$cond': [{'$eq': ['$state', 2]}, 1, 0]}},
-                'relearning_count': {'$sum': {'$cond': [{'$eq': ['$state', 3]}, 1, 0]}}
-            }}
-        ])
-        fsrs_stats = next(fsrs_stats, {'learning_count': 0, 'review_count': 0, 'relearning_count': 0})
+        state_counts = {state: totals['count'] for state, totals in UserProgress.state_totals(progress_docs).items()}
         
         return jsonify({
             'total_questions': total_answered,
@@ -310,9 +251,9 @@ def get_progress_summary():
             'mastery_rate': round(mastery_rate, 2),
             'skills_progress': skills_progress,
             'learning_stats': {
-                'learning': fsrs_stats['learning_count'],
-                'review': fsrs_stats['review_count'],
-                'relearning': fsrs_stats['relearning_count']
+                'learning': state_counts.get(State.Learning.value, 0),
+                'review': state_counts.get(State.Review.value, 0),
+                'relearning': state_counts.get(State.Relearning.value, 0)
             }
         })
     except Exception as e:
@@ -345,10 +286,12 @@ def submit_answer():
         answer_indices = data['answer_indices']
         response_time = data['response_time']
 
-        # Get the question and session
+        # Load question, session, card and user stats in one concurrent round
         db = get_db()
-        question = db.questions.find_one({'_id': ObjectId(question_id)})
-        session = db.lesson_sessions.find_one({'session_id': session_id})
+        pipeline = SubmitPipeline(db)
+        ctx = pipeline.load(user_id, session_id, question_id)
+        question = ctx.question
+        session = ctx.session
 
         if not question or not session:
             logger.error(f"Question or session not found - question_id: {question_id}, session_id: {session_id}")
@@ -359,23 +302,11 @@ def submit_answer():
         if not isinstance(correct_indices, list):
             correct_indices = [correct_indices] if correct_indices is not None else []
         is_correct = sorted(answer_indices) == sorted(correct_indices)
+
+        streak = ctx.user_stats.get('current_streak', 0)
         
-        # Get or create FSRS card
-        card = FSRSHelper.ensure_card(user_id, question_id)
-        if not card:
-            logger.error(f"Failed to create/get FSRS card for user {user_id}, question {question_id}")
-            return jsonify({'error': 'Internal server error'}), 500
-
-        # Get user stats for streak
-        user_stats = db.users.find_one(
-            {'_id': ObjectId(user_id)},
-            {'stats': 1}
-        ) or {'stats': {}}
-        
-        streak = user_stats.get('stats', {}).get('current_streak', 0)
-        
-        # Review card with performance data
-        helper = FSRSHelper()
+        # Review card with performance data; the card is persisted by the pipeline below
+        helper = FSRSHelper(ctx.scheduler_profile)
         performance_data = {
             'is_correct': is_correct,
             'response_time': response_time,
@@ -384,79 +315,14 @@ def submit_answer():
         }
         
         updated_card, review_log = helper.review_card(
-            card=card,
+            card=ctx.card,
             performance_data=performance_data,
-            question_data=question
-        )
-
-        # Update session
-        db.lesson_sessions.update_one(
-            {'session_id': session_id},
-            {
-                '$push': {
-                    'used_questions': question_id,
-                    'answers': {
-                        'question_id': question_id,
-                        'answer': answer_indices,
-                        'correct': is_correct,
-                        'response_time': response_time,
-                        'timestamp': datetime.now(timezone.utc)
-                    }
-                },
-                '$set': {
-                    'last_answer_time': datetime.now(timezone.utc),
-                    'last_answer_correct': is_correct
-                }
-            }
+            question_data=question,
+            save=False
         )
 
-        # Record attempt in lesson_reports for analytics (ensure types match aggregation)
-        try:
-            db.lesson_reports.insert_one({
-                'user_id': ObjectId(user_id),
-                'session_id': session_id,
-                'question_id': ObjectId(question_id),
-                'is_correct': is_correct,
-                'selected_indices': answer_indices,
-                'response_time': response_time,
-                'timestamp': datetime.now(timezone.utc)
-            })
-        except Exception as e:
-            logger.warning(f"Failed to write lesson report: {e}")
-
-        # Initialize user stats if they don't exist
-        db.users.update_one(
-            {'_id': ObjectId(user_id), 'stats': {'$exists': False}},
-            {'$set': {'stats': {
-                'total_questions': 0,
-                'correct_answers': 0,
-                'current_streak': 0
-            }}}
-        )
-
-        # Update user stats - handle streak properly
-        if is_correct:
-            update = {
-                '$inc': {
-                    'stats.total_questions': 1,
-                    'stats.correct_answers': 1,
-                    'stats.current_streak': 1
-                }
-            }
-        else:
-            update = {
-                '$inc': {
-                    'stats.total_questions': 1
-                },
-                '$set': {
-                    'stats.current_streak': 0  # Reset streak on incorrect answer
-                }
-            }
-
-        db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            update
-        )
+        # Card, session, report and user stats writes go out together
+        pipeline.commit(ctx, updated_card, is_correct, answer_indices, response_time)
 
         # Prepare response with learning feedback
         next_review_delta = round(updated_card.days_until_due, 1) if updated_card.due_date else 0.0
@@ -486,6 +352,35 @@ def submit_answer():
         logger.error(f"Error in submit_answer: {str(e)}", exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
+def _explanation_cache_key(data):
+    return f"explanation:{data['question_id']}:{','.join(map(str, sorted(data['selected_indices'])))}"
+
+def _cached_explanation(db, question, cache_key):
+    """Explanation for the question's current version from the in-process LRU, shared cache or explanation_cache."""
+    return get_explanation_cache().get(db, str(question['_id']), cache_key, question_version(question))
+
+def _store_explanation(db, question, cache_key, data, explanation):
+    get_explanation_cache().put(
+        db, str(question['_id']), cache_key, question_version(question), data['selected_indices'], explanation
+    )
+
+def _explanation_input(question, selected_indices):
+    """Prepare data for LLM"""
+    correct_indices = question.get('correct_answer', [])
+    if not isinstance(correct_indices, list):
+        correct_indices = [correct_indices] if correct_indices is not None else []
+
+    return {
+        'question_text': question.get('question_text') or question.get('text'),
+        'options': question.get('options', []),
+        'correct_indices': correct_indices,
+        'selected_indices': selected_indices,
+        'is_correct': sorted(selected_indices) == sorted(correct_indices)
+    }
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
 @lessons_bp.route('/explain', methods=['POST'])
 @jwt_required()
 @log_errors
@@ -501,49 +396,28 @@ def get_explanation():
             return jsonify({'error': 'Validation failed', 'details': err.messages}), 400
 
         db = get_db()
-        question = db.questions.find_one({'_id': ObjectId(data['question_id'])})
+        question = QuestionBank.get(data['question_id'], db)
         if not question:
             return jsonify({'error': 'Question not found'}), 404
 
         # Check cache first
-        cache_key = f"explanation:{data['question_id']}:{','.join(map(str, sorted(data['selected_indices'])))}"
-        cached = db.explanation_cache.find_one({'key': cache_key})
-        if cached and (datetime.now() - cached['created_at']).days < 30:  # Cache for 30 days
-            return jsonify({'explanation': cached['explanation']})
-
-        # Prepare data for LLM
-        correct_indices = question.get('correct_answer', [])
-        if not isinstance(correct_indices, list):
-            correct_indices = [correct_indices] if correct_indices is not None else []
+        cache_key = _explanation_cache_key(data)
+        explanation = _cached_explanation(db, question, cache_key)
+        if explanation:
+            return jsonify({'explanation': explanation})
 
-        question_data = {
-            'question_text': question.get('question_text') or question.get('text'),
-            'options': question.get('options', []),
-            'correct_indices': correct_indices,
-            'selected_indices': data['selected_indices'],
-            'is_correct': sorted(data['selected_indices']) == sorted(correct_indices)
-        }
+        question_data = _explanation_input(question, data['selected_indices'])
 
-        # Generate explanation
-        from utils.llm_helper import LLMHelper
-        try:
-            llm = LLMHelper()
-            explanation = llm.generate_explanation(question_data)
+        # Generate explanation; concurrent requests for the same key share one generation
+        def generate():
+            explanation = get_llm().generate_explanation(question_data)
             if not explanation:
                 raise ValueError("LLM returned empty explanation")
-            
-            # Cache the result (idempotent)
-            db.explanation_cache.update_one(
-                {'key': cache_key},
-                {'$set': {
-                    'key': cache_key,
-                    'explanation': explanation,
-                    'created_at': datetime.now(),
-                    'question_id': data['question_id'],
-                    'selected_indices': data['selected_indices']
-                }},
-                upsert=True
-            )
+            _store_explanation(db, question, cache_key, data, explanation)
+            return explanation
+
+        try:
+            explanation = get_singleflight().do(cache_key, generate, lambda: _cached_explanation(db, question, cache_key))
         except Exception as e:
             logger.error(f"Error generating explanation: {str(e)}", exc_info=True)
             return jsonify({
@@ -557,6 +431,82 @@ def get_explanation():
         logger.error(f"Error in get_explanation: {str(e)}", exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
+@lessons_bp.route('/explain/stream', methods=['POST'])
+@jwt_required()
+@log_errors
+def stream_explanation():
+    """Stream an explanation as Server-Sent Events.
+
+    Events: `delta` ({text}) for each formatted piece as the model produces it,
+    then `done` ({explanation}, the full text, also sent alone on a cache hit
+    or when another request was already generating it) or `error`
+    ({error, message}). The finished text is cached like /explain.
+    """
+    try:
+        schema = ExplanationRequestSchema()
+        try:
+            data = schema.load(request.get_json())
+        except ValidationError as err:
+            logger.error(f"Validation error in stream_explanation: {err.messages}")
+            return jsonify({'error': 'Validation failed', 'details': err.messages}), 400
+
+        db = get_db()
+        question = QuestionBank.get(data['question_id'], db)
+        if not question:
+            return jsonify({'error': 'Question not found'}), 404
+
+        headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        cache_key = _explanation_cache_key(data)
+        explanation = _cached_explanation(db, question, cache_key)
+        if explanation:
+            return Response(_sse('done', {'explanation': explanation}), mimetype='text/event-stream', headers=headers)
+
+        try:
+            llm = get_llm()
+        except Exception as e:
+            logger.error(f"Error generating explanation: {str(e)}", exc_info=True)
+            return jsonify({
+                'error': 'Failed to generate explanation',
+                'message': str(e)
+            }), 500
+        question_data = _explanation_input(question, data['selected_indices'])
+        flights = get_singleflight()
+
+        def events():
+            parts = []
+            flight = flights.try_lead(cache_key)
+            try:
+                if flight is None:
+                    # Another request is generating this explanation; send its result
+                    explanation = flights.wait(cache_key, lambda: _cached_explanation(db, question, cache_key))
+                    if explanation:
+                        yield _sse('done', {'explanation': explanation})
+                        return
+                    flight = flights.try_lead(cache_key)  # leader failed; generate here
+                for text in llm.stream_explanation(question_data):
+                    parts.append(text)
+                    yield _sse('delta', {'text': text})
+                explanation = ''.join(parts)
+                if not explanation:
+                    raise ValueError("LLM returned empty explanation")
+                _store_explanation(db, question, cache_key, data, explanation)
+                if flight is not None:
+                    flight.result = explanation
+                yield _sse('done', {'explanation': explanation})
+            except Exception as e:
+                # Client disconnects surface as GeneratorExit and skip caching the partial text
+                logger.error(f"Error streaming explanation: {str(e)}", exc_info=True)
+                yield _sse('error', {'error': 'Failed to generate explanation', 'message': str(e)})
+            finally:
+                if flight is not None:
+                    flight.release()
+
+        return Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
+
+    except Exception as e:
+        logger.error(f"Error in stream_explanation: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Internal server error'}), 500
+
 @lessons_bp.route('/explain/chat', methods=['POST'])
 @jwt_required()
 @log_errors
@@ -570,14 +520,12 @@ def explain_chat():
         message = payload.get('message', '').strip()
         thread_id = payload.get('thread_id')
         step_key = payload.get('step_key')
-        history = payload.get('history', []) or []
-        explanation_text = payload.get('explanation_text')
 
         if not question_id or not message:
             return jsonify({'error': 'Missing question_id or message'}), 400
 
         db = get_db()
-        q = db.questions.find_one({'_id': ObjectId(question_id)})
+        q = QuestionBank.get(question_id, db)
         if not q:
             return jsonify({'error': 'Question not found'}), 404
 
@@ -588,23 +536,41 @@ def explain_chat():
         if not isinstance(correct_indices, list):
             correct_indices = [correct_indices] if correct_indices is not None else []
 
-        ctx = {
-            'question_text': q.get('question_text') or q.get('text'),
-            'options': q.get('options', []),
-            'correct_indices': correct_indices,
-            'selected_indices': selected_indices,
-            'is_correct': sorted(selected_indices) == sorted(correct_indices),
-            'follow_up': {
-                'message': message,
-                'step_key': step_key,
-            },
-            'history': history,
-            'explanation_text': explanation_text,
-        }
-
-        from utils.llm_helper import LLMHelper
-        llm = LLMHelper()
-        reply = llm.generate_followup(ctx)
+        # Reuse an earlier answer to the same (or a very similar) follow-up on this step,
+        # given by a student who selected the same options
+        followups = get_followup_cache()
+        match = followups.lookup(db, question_id, step_key, selected_indices, message)
+        summary_update = None
+        if match:
+            logger.info(f"Follow-up for {question_id}/{step_key} answered from cache ({match.kind}, {match.score})")
+            reply = match.answer
+        else:
+            # Context comes from the stored thread and cached explanation; history and
+            # explanation_text in the payload are only used by older clients
+            thread = db.explanation_threads.find_one(
+                {'thread_id': thread_id, 'user_id': ObjectId(user_id)}, THREAD_CONTEXT_PROJECTION)
+            explanation_text = _cached_explanation(
+                db, q, _explanation_cache_key({'question_id': question_id, 'selected_indices': selected_indices})
+            ) or payload.get('explanation_text')
+            context = build_chat_context(thread, explanation_text, fallback_history=payload.get('history'))
+            summary_update = context.summary_update
+
+            ctx = {
+                'question_text': q.get('question_text') or q.get('text'),
+                'options': q.get('options', []),
+                'correct_indices': correct_indices,
+                'selected_indices': selected_indices,
+                'is_correct': sorted(selected_indices) == sorted(correct_indices),
+                'follow_up': {
+                    'message': message,
+                    'step_key': step_key,
+                },
+                'history': context.history,
+                'summary': context.summary,
+                'explanation_text': context.explanation,
+            }
+            reply = get_llm().generate_followup(ctx)
+            followups.record(question_id, step_key, selected_indices, message, reply)
 
         assistant_reply = reply
 
@@ -616,11 +582,12 @@ def explain_chat():
                 'question_id': ObjectId(question_id),
                 'created_at': datetime.utcnow(),
             },
-             '$set': {'updated_at': datetime.utcnow(), 'step_key': step_key},
+             '$set': {'updated_at': datetime.utcnow(), 'step_key': step_key,
+                      'selected_indices': selection_key(selected_indices), **(summary_update or {})},
              '$push': {
                  'messages': {
                      '$each': [
-                         {'role': 'user', 'content': message, 'ts': datetime.utcnow()},
+                         {'role': 'user', 'content': message, 'step_key': step_key, 'ts': datetime.utcnow()},
                          {'role': 'assistant', 'content': assistant_reply, 'ts': datetime.utcnow()},
                      ]
                  }
@@ -1,50 +1,66 @@
-from flask import Blueprint, jsonify, current_app
-from utils.database import get_db
+from flask import Blueprint, jsonify, current_app, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.skill_taxonomy import SkillTaxonomy
 
 skills_bp = Blueprint('skills', __name__)
 
+DEFAULT_CATEGORIES = ['arithmetic', 'algebra', 'geometry', 'trigonometry', 'calculus']
+
+def _conditional(payload, version):
+    """JSON response tagged with the taxonomy version; 304 if the client already has it."""
+    response = jsonify(payload)
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 @skills_bp.route('/categories', methods=['GET'])
 @jwt_required()
 def get_categories():
-    """Get all unique categories from questions collection"""
+    """Get all unique categories (from the cached skill taxonomy)"""
     try:
         user_id = get_jwt_identity()
         current_app.logger.info(f"Fetching categories for user {user_id}")
         
-        db = get_db()
-        
-        # Try both field names and merge results
-        categories_by_category = db.questions.distinct('category')
-        categories_by_skill = db.questions.distinct('skill_category')
-        
-        # Combine and deduplicate categories
-        all_categories = list(set([c.lower() for c in categories_by_category + categories_by_skill if c]))
+        taxonomy = SkillTaxonomy.get()
+        all_categories = [category['name'] for category in taxonomy['categories']]
         
         current_app.logger.info(f"Found categories: {all_categories}")
         
         if not all_categories:
             # Return default categories if none found in database
-            default_categories = ['arithmetic', 'algebra', 'geometry', 'trigonometry', 'calculus']
             current_app.logger.warning("No categories found in DB, using defaults")
-            return jsonify({
+            return _conditional({
                 'success': True,
-                'categories': default_categories,
+                'categories': DEFAULT_CATEGORIES,
                 'is_default': True
-            })
+            }, taxonomy['version'])
             
-        return jsonify({
+        return _conditional({
             'success': True,
-            'categories': sorted(all_categories),
+            'categories': all_categories,
             'is_default': False
-        })
+        }, taxonomy['version'])
     except Exception as e:
         current_app.logger.error(f"Error fetching categories: {str(e)}", exc_info=True)
         # Return default categories on error
-        default_categories = ['arithmetic', 'algebra', 'geometry', 'trigonometry', 'calculus']
         return jsonify({
             'success': True,
-            'categories': default_categories,
+            'categories': DEFAULT_CATEGORIES,
             'is_default': True,
             'error': str(e)
         })
+
+@skills_bp.route('/taxonomy', methods=['GET'])
+@jwt_required()
+def get_taxonomy():
+    """Category -> sub_topic -> tag tree with question counts and difficulty histograms"""
+    try:
+        taxonomy = SkillTaxonomy.get()
+        return _conditional({
+            'version': taxonomy['version'],
+            'total': taxonomy['total'],
+            'categories': taxonomy['categories']
+        }, taxonomy['version'])
+    except Exception as e:
+        current_app.logger.error(f"Error fetching skill taxonomy: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
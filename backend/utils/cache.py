@@ -1,25 +1,257 @@
-# Redis cache manager stub for questions (backend/utils/cache.py)
-# For future implementation
-import redis
-import pickle
+"""
+Shared read-through cache for data served from MongoDB.
+
+CacheManager stores values in Redis when REDIS_URL is configured and in a
+bounded in-process stand-in otherwise, so callers never need to check which
+one is active:
+
+- Values are serialized as JSON (bson.json_util, so ObjectId/datetime round
+  trip) or msgpack (CACHE_SERIALIZER=msgpack, if the package is installed),
+  never pickle.
+- Keys are `<prefix>:<namespace>:v<version>:<key>`; bumping a namespace's
+  version in code orphans all of its old entries when the cached shape changes.
+- get_many/set_many batch keys into one MGET / pipelined SETs.
+- TTLs get +/- CACHE_TTL_JITTER so entries written together do not expire together.
+- Hits, misses, sets and backend errors are counted per namespace
+  (GET /api/health/cache). Backend errors are logged and treated as misses so
+  the cache can never fail a request.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+from flask import current_app
+from bson import ObjectId, json_util
+import threading
+import logging
+import random
+import time
+import os
+
+try:
+    import msgpack
+except ImportError:  # optional; JSON is used without it
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL_SECONDS', 3600))
+TTL_JITTER = float(os.environ.get('CACHE_TTL_JITTER', 0.1))
+LOCAL_MAX_ENTRIES = int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 10000))
+
+# Code-level versions per namespace; bump when the cached value's shape changes
+NAMESPACE_VERSIONS = {
+    'question': 1,
+    'taxonomy': 1,
+    'explanation': 1,
+    'followup': 1,
+}
+
+class JSONSerializer:
+    name = 'json'
+
+    def dumps(self, value) -> bytes:
+        return json_util.dumps(value).encode('utf-8')
+
+    def loads(self, data: bytes):
+        return json_util.loads(data)
+
+class MsgpackSerializer:
+    name = 'msgpack'
+    _OBJECT_ID = 1
+    _DATETIME = 2
+
+    def _default(self, value):
+        if isinstance(value, ObjectId):
+            return msgpack.ExtType(self._OBJECT_ID, value.binary)
+        if isinstance(value, datetime):
+            return msgpack.ExtType(self._DATETIME, json_util.dumps(value).encode('utf-8'))
+        raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+    def _ext_hook(self, code, data):
+        if code == self._OBJECT_ID:
+            return ObjectId(data)
+        if code == self._DATETIME:
+            return json_util.loads(data)
+        return msgpack.ExtType(code, data)
+
+    def dumps(self, value) -> bytes:
+        return msgpack.packb(value, default=self._default, use_bin_type=True)
+
+    def loads(self, data: bytes):
+        return msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False)
+
+def make_serializer(name: Optional[str] = None):
+    name = (name or os.environ.get('CACHE_SERIALIZER', 'json')).lower()
+    if name == 'msgpack':
+        if msgpack is not None:
+            return MsgpackSerializer()
+        logger.warning("CACHE_SERIALIZER=msgpack but msgpack is not installed; using JSON")
+    return JSONSerializer()
+
+class LocalCacheBackend:
+    """In-process stand-in for Redis: bounded LRU of raw bytes with expiry."""
+
+    name = 'local'
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mget(self, keys):
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[1] <= now:
+                    self._entries.pop(key, None)
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    values.append(entry[0])
+        return values
+
+    def mset(self, items: Dict[str, bytes], ttls: Dict[str, int]):
+        now = time.monotonic()
+        with self._lock:
+            for key, data in items.items():
+                self._entries[key] = (data, now + ttls[key])
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisCacheBackend:
+    name = 'redis'
+
+    def __init__(self, client):
+        self.client = client
+
+    def mget(self, keys):
+        return self.client.mget(keys)
+
+    def mset(self, items: Dict[str, bytes], ttls: Dict[str, int]):
+        pipe = self.client.pipeline(transaction=False)
+        for key, data in items.items():
+            pipe.set(key, data, ex=ttls[key])
+        pipe.execute()
+
+    def delete(self, keys):
+        self.client.delete(*keys)
 
 class CacheManager:
-    def __init__(self, host='localhost', port=6379, db=0):
-        self.client = redis.Redis(host=host, port=port, db=db)
+    def __init__(self, backend, serializer=None, prefix: str = 'lw',
+                 default_ttl: int = DEFAULT_TTL, jitter: float = TTL_JITTER):
+        self.backend = backend
+        self.serializer = serializer or JSONSerializer()
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.jitter = jitter
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def for_app(cls, app) -> 'CacheManager':
+        client = getattr(app, 'redis', None)
+        backend = RedisCacheBackend(client) if client is not None else LocalCacheBackend()
+        return cls(backend, make_serializer(), prefix=os.environ.get('CACHE_PREFIX', 'lw'))
+
+    def key(self, namespace: str, key) -> str:
+        return f"{self.prefix}:{namespace}:v{NAMESPACE_VERSIONS.get(namespace, 1)}:{key}"
+
+    def _ttl(self, ttl: Optional[int]) -> int:
+        ttl = ttl or self.default_ttl
+        if self.jitter:
+            ttl = ttl * (1 + random.uniform(-self.jitter, self.jitter))
+        return max(1, int(ttl))
+
+    def _count(self, namespace: str, field: str, amount: int = 1):
+        with self._stats_lock:
+            counters = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'sets': 0, 'errors': 0})
+            counters[field] += amount
+
+    def get_many(self, namespace: str, keys: Iterable) -> Dict:
+        """Cached values for `keys`; missing keys are left out of the result."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            raw = self.backend.mget([self.key(namespace, key) for key in keys])
+        except Exception as e:
+            logger.warning(f"Cache read failed for {namespace}: {e}")
+            self._count(namespace, 'errors')
+            self._count(namespace, 'misses', len(keys))
+            return {}
+        found = {}
+        for key, data in zip(keys, raw):
+            if data is None:
+                continue
+            try:
+                found[key] = self.serializer.loads(data)
+            except Exception as e:
+                logger.warning(f"Dropping undecodable cache entry {namespace}:{key}: {e}")
+        self._count(namespace, 'hits', len(found))
+        self._count(namespace, 'misses', len(keys) - len(found))
+        return found
+
+    def get(self, namespace: str, key, default=None):
+        return self.get_many(namespace, [key]).get(key, default)
+
+    def set_many(self, namespace: str, values: Dict, ttl: Optional[int] = None):
+        if not values:
+            return
+        try:
+            items = {self.key(namespace, key): self.serializer.dumps(value) for key, value in values.items()}
+            self.backend.mset(items, {full_key: self._ttl(ttl) for full_key in items})
+            self._count(namespace, 'sets', len(items))
+        except Exception as e:
+            logger.warning(f"Cache write failed for {namespace}: {e}")
+            self._count(namespace, 'errors')
+
+    def set(self, namespace: str, key, value, ttl: Optional[int] = None):
+        self.set_many(namespace, {key: value}, ttl)
 
-    def cache_questions(self, skill_ids, questions, ttl=3600):
-        key = self._get_questions_key(skill_ids)
-        self.client.setex(key, ttl, pickle.dumps(questions))
+    def delete(self, namespace: str, *keys):
+        try:
+            self.backend.delete([self.key(namespace, key) for key in keys])
+        except Exception as e:
+            logger.warning(f"Cache delete failed for {namespace}: {e}")
+            self._count(namespace, 'errors')
 
-    def get_cached_questions(self, skill_ids):
-        key = self._get_questions_key(skill_ids)
-        cached = self.client.get(key)
-        return pickle.loads(cached) if cached else None
+    def get_or_load(self, namespace: str, key, loader: Callable, ttl: Optional[int] = None):
+        """Cached value, or loader() stored on a miss (None results are not cached)."""
+        value = self.get(namespace, key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(namespace, key, value, ttl)
+        return value
 
-    def _get_questions_key(self, skill_ids):
-        return 'questions:' + ':'.join(sorted(skill_ids))
+    def stats(self) -> dict:
+        with self._stats_lock:
+            namespaces = {name: dict(counters) for name, counters in self._stats.items()}
+        for counters in namespaces.values():
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        return {
+            'backend': self.backend.name,
+            'serializer': self.serializer.name,
+            'namespaces': namespaces
+        }
 
-# Usage (future):
-# cache = CacheManager()
-# cache.cache_questions(['Algebra'], questions)
-# questions = cache.get_cached_questions(['Algebra'])
+def get_cache() -> CacheManager:
+    """The app's CacheManager (created on first use if the app factory did not set one)."""
+    app = current_app._get_current_object()
+    cache = getattr(app, 'cache', None)
+    if cache is None:
+        cache = app.cache = CacheManager.for_app(app)
+    return cache
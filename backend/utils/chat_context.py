@@ -0,0 +1,158 @@
+"""
+Token-budgeted prompt context for /api/lessons/explain/chat.
+
+The server already stores every follow-up turn in explanation_threads and the
+explanation in the explanation caches, so clients only send the new message.
+build_chat_context turns the stored thread into prompt context of a
+predictable size:
+
+- the explanation, cut at a line boundary to CHAT_EXPLANATION_TOKENS
+- the most recent turns that fit in CHAT_HISTORY_TOKENS
+- a running summary of older turns, capped at CHAT_SUMMARY_TOKENS. Turns are
+  summarized once, when they leave the recent window: the summary and the
+  timestamp of the last summarized message (summary_until) are saved on the
+  thread and extended on later turns.
+
+Sizes come from estimate_tokens, a local estimate (one token per CJK
+character, one per four other characters) that needs no tokenizer download.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, List, Optional
+import math
+import os
+import re
+
+EXPLANATION_TOKENS = int(os.environ.get('CHAT_EXPLANATION_TOKENS', 700))
+HISTORY_TOKENS = int(os.environ.get('CHAT_HISTORY_TOKENS', 600))
+SUMMARY_TOKENS = int(os.environ.get('CHAT_SUMMARY_TOKENS', 200))
+MAX_LOADED_MESSAGES = 40
+SUMMARY_SNIPPET_TOKENS = 40  # per side of a summarized turn
+
+TRUNCATED_MARK = '...（已截斷）'
+
+# Fields explain_chat needs to rebuild context from a stored thread
+THREAD_CONTEXT_PROJECTION = {
+    'messages': {'$slice': -MAX_LOADED_MESSAGES},
+    'summary': 1,
+    'summary_until': 1,
+}
+
+_CJK = re.compile(r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+_SENTENCE_END = re.compile(r'[。！？!?\n]')
+
+ChatContext = namedtuple('ChatContext', ['explanation', 'history', 'summary', 'summary_update'])
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """`text` cut at a line (or, for one long line, character) boundary to fit `budget` tokens."""
+    text = (text or '').strip()
+    if estimate_tokens(text) <= budget:
+        return text
+    budget -= estimate_tokens(TRUNCATED_MARK)
+    kept: List[str] = []
+    used = 0
+    for line in text.split('\n'):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            if not kept:
+                # Long first line: keep as many characters as fit
+                for end in range(len(line), 0, -1):
+                    if estimate_tokens(line[:end]) <= budget:
+                        kept.append(line[:end])
+                        break
+            break
+        kept.append(line)
+        used += cost
+    return '\n'.join(kept).rstrip() + '\n' + TRUNCATED_MARK
+
+def _summarize_turn(question: str, answer: str) -> str:
+    """One summary line: the question and the answer's first sentence, both clipped."""
+    question = ' '.join((question or '').split())
+    match = _SENTENCE_END.search((answer or '').strip())
+    first = (answer or '').strip()[:match.end()] if match else (answer or '').strip()
+    first = ' '.join(first.split())
+    return (f"- 學生問：{truncate_to_tokens(question, SUMMARY_SNIPPET_TOKENS).replace(chr(10), ' ')}；"
+            f"回覆要點：{truncate_to_tokens(first, SUMMARY_SNIPPET_TOKENS).replace(chr(10), ' ')}")
+
+def _cap_summary(summary: str, budget: int) -> str:
+    """Drop the oldest summary lines until the summary fits `budget`."""
+    lines = [line for line in (summary or '').split('\n') if line]
+    while lines and estimate_tokens('\n'.join(lines)) > budget:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+def _turns(messages: List[Dict]) -> List[List[Dict]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: List[List[Dict]] = []
+    for message in messages:
+        if message.get('role') == 'user' or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+def build_chat_context(thread: Optional[Dict], explanation: Optional[str],
+                       fallback_history: Optional[List[Dict]] = None,
+                       explanation_tokens: int = EXPLANATION_TOKENS,
+                       history_tokens: int = HISTORY_TOKENS,
+                       summary_tokens: int = SUMMARY_TOKENS) -> ChatContext:
+    """Prompt context for the next follow-up in `thread`.
+
+    `fallback_history` (client-sent turns) is only used when there is no stored
+    thread yet. `summary_update` is the $set to persist on the thread when older
+    turns were summarized in this call, else None.
+    """
+    if thread:
+        messages = thread.get('messages') or []
+        summary = thread.get('summary') or ''
+        summary_until = thread.get('summary_until')
+    else:
+        messages = [m for m in (fallback_history or []) if isinstance(m, dict)]
+        summary, summary_until = '', None
+
+    if summary_until is not None:
+        messages = [m for m in messages if not (m.get('ts') and m['ts'] <= summary_until)]
+
+    # Newest turns first, while they fit the history budget
+    turns = _turns(messages)
+    recent: List[List[Dict]] = []
+    used = 0
+    for turn in reversed(turns):
+        cost = sum(estimate_tokens(m.get('content') or '') + 4 for m in turn)
+        if recent and used + cost > history_tokens:
+            break
+        recent.insert(0, turn)
+        used += cost
+    older = turns[:len(turns) - len(recent)]
+
+    summary_update = None
+    if older:
+        lines = [summary] if summary else []
+        for turn in older:
+            question = next((m.get('content') for m in turn if m.get('role') == 'user'), '')
+            answer = next((m.get('content') for m in turn if m.get('role') == 'assistant'), '')
+            lines.append(_summarize_turn(question, answer))
+        summary = _cap_summary('\n'.join(lines), summary_tokens)
+        last_ts = max((m['ts'] for turn in older for m in turn if isinstance(m.get('ts'), datetime)), default=None)
+        if thread and last_ts is not None:
+            summary_update = {'summary': summary, 'summary_until': last_ts}
+
+    # A single oversized turn is clipped rather than dropped
+    message_tokens = max(1, history_tokens // 2)
+    history = [
+        {'role': m.get('role', 'user'), 'content': truncate_to_tokens(m.get('content') or '', message_tokens)}
+        for turn in recent for m in turn
+    ]
+    return ChatContext(
+        explanation=truncate_to_tokens(explanation or '', explanation_tokens),
+        history=history,
+        summary=summary,
+        summary_update=summary_update,
+    )
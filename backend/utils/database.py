@@ -1,7 +1,10 @@
 from flask import current_app, request, jsonify
+from pymongo import MongoClient, monitoring
 import logging
 from functools import wraps
 import os
+import threading
+import time
 from urllib.parse import urlparse
 
 # Configure logging
@@ -15,6 +18,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DEFAULT_DB_NAME = 'learnwise-demo'
+
 def log_errors(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -25,33 +30,126 @@ def log_errors(f):
             return jsonify({'error': 'Internal server error'}), 500
     return decorated_function
 
-def get_db():
-    """Get database connection with proper parsing of MongoDB URI"""
-    DEFAULT_DB_NAME = 'learnwise-demo'  # Changed default database name
-    
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection checkout counters for one MongoClient, fed by pymongo's pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()  # checkout start time of the current thread
+        self._stats = {'checkouts': 0, 'checkout_failures': 0, 'in_use': 0, 'max_in_use': 0,
+                       'open': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'started', None)
+        wait_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        with self._lock:
+            stats = self._stats
+            stats['checkouts'] += 1
+            stats['in_use'] += 1
+            stats['max_in_use'] = max(stats['max_in_use'], stats['in_use'])
+            stats['wait_ms_total'] += wait_ms
+            stats['wait_ms_max'] = max(stats['wait_ms_max'], wait_ms)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._stats['checkout_failures'] += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._stats['in_use'] -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self._stats['open'] += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._stats['open'] -= 1
+
+    # Pool lifecycle events are not counted
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['wait_ms_avg'] = round(stats['wait_ms_total'] / stats['checkouts'], 3) if stats['checkouts'] else 0.0
+        return stats
+
+def _database_name(mongodb_uri: str) -> str:
+    """Database named in the URI path, else MONGODB_DATABASE, else the default"""
     try:
-        mongodb_uri = current_app.config['MONGODB_URI']
-        # Parse the URI to extract the path component
-        parsed_uri = urlparse(mongodb_uri)
-        
-        # Extract database name from path, removing any query parameters
-        path = parsed_uri.path.lstrip('/')
-        db_name = path.split('?')[0] if '?' in path else path
-        
-        # If no database in URI, check environment variable or use default
-        if not db_name:
-            db_name = os.getenv('MONGODB_DATABASE', DEFAULT_DB_NAME)
-            
-        logger.info(f"Connecting to database: {db_name}")
-        
-        if not db_name:
-            logger.warning("No database name found in URI or environment, using default")
-            db_name = DEFAULT_DB_NAME
-            
-        return current_app.mongo.get_database(db_name)
-        
+        db_name = urlparse(mongodb_uri).path.lstrip('/').split('?')[0]
     except Exception as e:
-        logger.error(f"Error getting database connection: {str(e)}")
-        # If there's an error, try the default database as fallback
-        logger.info(f"Attempting fallback to default database: {DEFAULT_DB_NAME}")
-        return current_app.mongo.get_database(DEFAULT_DB_NAME)
+        logger.error(f"Error parsing MONGODB_URI: {str(e)}")
+        db_name = ''
+    return db_name or os.getenv('MONGODB_DATABASE') or DEFAULT_DB_NAME
+
+def mongo_client_options(config) -> dict:
+    """MongoClient keyword arguments from the app config (MONGO_* keys, see create_app)"""
+    options = {
+        'serverSelectionTimeoutMS': 5000,
+        'maxPoolSize': int(config.get('MONGO_MAX_POOL_SIZE', 50)),
+        'minPoolSize': int(config.get('MONGO_MIN_POOL_SIZE', 0)),
+        'maxIdleTimeMS': int(config.get('MONGO_MAX_IDLE_TIME_MS', 60000)),
+        'readPreference': config.get('MONGO_READ_PREFERENCE') or 'primary',
+    }
+    if config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'):
+        options['waitQueueTimeoutMS'] = int(config['MONGO_WAIT_QUEUE_TIMEOUT_MS'])
+    if config.get('MONGO_COMPRESSORS'):
+        options['compressors'] = config['MONGO_COMPRESSORS']
+    w = config.get('MONGO_WRITE_CONCERN')
+    if w:
+        options['w'] = int(w) if str(w).isdigit() else w
+    return options
+
+def init_mongo(app, verify=True):
+    """Create the app's MongoClient and cache its Database; also called in each gunicorn worker after fork"""
+    app.mongo_pool_stats = PoolStats()
+    app.mongo = MongoClient(
+        app.config['MONGODB_URI'],
+        event_listeners=[app.mongo_pool_stats],
+        **mongo_client_options(app.config)
+    )
+    app.mongo_pid = os.getpid()
+    db_name = _database_name(app.config['MONGODB_URI'])
+    app.mongo_db = app.mongo.get_database(db_name)
+    logger.info(f"Using database {db_name} (pid {app.mongo_pid})")
+    if verify:
+        # Verify connection
+        app.mongo.server_info()
+    return app.mongo
+
+def get_db():
+    """The app's Database handle, resolved once per process"""
+    app = current_app._get_current_object()
+    db = getattr(app, 'mongo_db', None)
+    # A client inherited across fork is not safe to use; open one for this process
+    if db is None or getattr(app, 'mongo_pid', None) != os.getpid():
+        init_mongo(app, verify=False)
+        db = app.mongo_db
+    return db
+
+def get_pool_stats() -> dict:
+    """Checkout waits and connections in use for this worker's MongoClient"""
+    stats = getattr(current_app, 'mongo_pool_stats', None)
+    return stats.stats() if stats is not None else {}
+
+def get_redis():
+    """Get the shared Redis client, or None when REDIS_URL is not configured"""
+    return getattr(current_app, 'redis', None)
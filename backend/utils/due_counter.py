@@ -0,0 +1,194 @@
+"""
+Per-user due counters for GET /api/lessons/due-count.
+
+The dashboard polls the due count. With Redis, DueCounter keeps each user's
+card due timestamps in a sorted structure, so the count is a rank query
+instead of an fsrs_cards index range scan on every poll:
+
+- Redis (REDIS_URL set): sorted set `due:<user_id>`, member = card id,
+  score = due timestamp; the count is ZCOUNT -inf..now. A sentinel member with
+  score +inf marks the set as hydrated so a user without cards is not
+  reloaded on every poll. Keys expire after DUE_COUNTER_TTL_SECONDS of
+  inactivity. While a count loads a user from fsrs_cards, a short-lived
+  `due:<user_id>:loading` marker makes record() keep its moves in the set;
+  hydration then only adds cards the set does not hold yet (ZADD NX), so a
+  move saved during the load is not overwritten by the older due date.
+- Without Redis: fsrs_cards.count_documents({'user_id', 'due_date': {'$lte': now}})
+  on the (user_id, due_date) index. A per-worker copy could not see other
+  workers' writes and reloading every user's due dates to stay fresh would
+  read more than the count itself, so nothing is kept in process.
+
+FSRSCard.save calls record() with the new due date. Writes only touch users
+that are already hydrated; a missing set is (re)built from fsrs_cards on the
+next count. scripts/reconcile_due_counters.py rebuilds the Redis sets from
+fsrs_cards in batches if they drift (bulk deletes, writes that bypass save()).
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Tuple
+from utils.database import get_db, get_redis
+from bson import ObjectId
+from bson.errors import InvalidId
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'due:'
+READY_MEMBER = '__ready__'
+LOADING_SUFFIX = ':loading'
+LOADING_TTL_SECONDS = 60  # longest a hydration's fsrs_cards read is expected to take
+REDIS_TTL_SECONDS = int(os.environ.get('DUE_COUNTER_TTL_SECONDS', 7 * 24 * 3600))
+
+# Update a hydrated set, or one a count is loading (KEYS[2] marker): the load
+# merges around the moves recorded meanwhile. Otherwise a lone member would
+# make a partial set look complete, so nothing is written.
+_RECORD_SCRIPT = """
+local hydrated = redis.call('ZSCORE', KEYS[1], ARGV[4])
+if not hydrated and redis.call('EXISTS', KEYS[2]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+if hydrated then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+else
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+end
+return 1
+"""
+
+# Merge loaded (member, score) pairs from ARGV[4..] without overwriting moves
+# recorded during the load, mark the set hydrated and count up to ARGV[3]
+_HYDRATE_SCRIPT = """
+for i = 4, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], 'NX', ARGV[i + 1], ARGV[i])
+end
+redis.call('ZADD', KEYS[1], '+inf', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('DEL', KEYS[2])
+return redis.call('ZCOUNT', KEYS[1], '-inf', ARGV[3])
+"""
+
+def due_score(value: datetime) -> float:
+    """Epoch seconds for a due date; naive datetimes are treated as UTC like FSRSCard."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def counter_key(user_id) -> str:
+    return f'{KEY_PREFIX}{user_id}'
+
+def loading_key(user_id) -> str:
+    return f'{KEY_PREFIX}{user_id}{LOADING_SUFFIX}'
+
+def load_due_scores(db, user_oid: ObjectId) -> Iterable[Tuple[str, float]]:
+    """(card_id, due score) for every card of a user, read from fsrs_cards."""
+    cursor = db.fsrs_cards.find({'user_id': user_oid}, {'_id': 1, 'due_date': 1})
+    for doc in cursor:
+        if doc.get('due_date'):
+            yield str(doc['_id']), due_score(doc['due_date'])
+
+def _user_oid(user_id) -> Optional[ObjectId]:
+    if isinstance(user_id, ObjectId):
+        return user_id
+    try:
+        return ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return None
+
+class RedisDueCounter:
+    def __init__(self, client):
+        self.client = client
+        self._record = client.register_script(_RECORD_SCRIPT)
+        self._hydrate = client.register_script(_HYDRATE_SCRIPT)
+
+    def record(self, user_oid: ObjectId, card_id: str, due: datetime):
+        self._record(keys=[counter_key(user_oid), loading_key(user_oid)],
+                     args=[card_id, due_score(due), REDIS_TTL_SECONDS, READY_MEMBER, LOADING_TTL_SECONDS])
+
+    def count(self, user_oid: ObjectId, now: datetime, db) -> int:
+        key = counter_key(user_oid)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zscore(key, READY_MEMBER)
+        pipe.zcount(key, '-inf', due_score(now))
+        ready, count = pipe.execute()
+        if ready is not None:
+            return int(count)
+        # Mark the load before reading Mongo so saves that land meanwhile are kept
+        self.client.set(loading_key(user_oid), 1, ex=LOADING_TTL_SECONDS)
+        return self.hydrate(user_oid, load_due_scores(db, user_oid), now)
+
+    def hydrate(self, user_oid: ObjectId, scores: Iterable[Tuple[str, float]], now: datetime) -> int:
+        """Merge `scores` into the user's set (cards already in it keep their newer
+        score), mark it hydrated and return the count due at `now`."""
+        args = [READY_MEMBER, REDIS_TTL_SECONDS, due_score(now)]
+        for member, score in scores:
+            args.extend((member, score))
+        return int(self._hydrate(keys=[counter_key(user_oid), loading_key(user_oid)], args=args))
+
+    def invalidate(self, user_oid: ObjectId):
+        self.client.delete(counter_key(user_oid), loading_key(user_oid))
+
+class MongoDueCounter:
+    """Counts in fsrs_cards directly; used when Redis is not configured."""
+
+    def record(self, user_oid: ObjectId, card_id: str, due: datetime):
+        pass  # the count always reads the cards themselves
+
+    def count(self, user_oid: ObjectId, now: datetime, db) -> int:
+        return db.fsrs_cards.count_documents({'user_id': user_oid, 'due_date': {'$lte': now}})
+
+    def invalidate(self, user_oid: ObjectId):
+        pass
+
+mongo_due_counter = MongoDueCounter()
+_redis_due_counter = None
+
+class DueCounter:
+    @staticmethod
+    def _backend():
+        global _redis_due_counter
+        client = get_redis()
+        if client is None:
+            return mongo_due_counter
+        if _redis_due_counter is None or _redis_due_counter.client is not client:
+            _redis_due_counter = RedisDueCounter(client)
+        return _redis_due_counter
+
+    @classmethod
+    def record(cls, user_id, card_id, due: Optional[datetime]):
+        """Move a card to its new due timestamp; failures only cost freshness."""
+        user_oid = _user_oid(user_id)
+        if user_oid is None or card_id is None or due is None:
+            return
+        try:
+            cls._backend().record(user_oid, str(card_id), due)
+        except Exception as e:
+            # Drop the set so the next count rebuilds it from Mongo
+            logger.warning(f"Failed to update due counter for user {user_oid}: {e}")
+            cls.invalidate(user_oid)
+
+    @classmethod
+    def count_due(cls, user_id, now: Optional[datetime] = None, db=None) -> int:
+        """Number of the user's cards with due_date <= now."""
+        now = now or datetime.now(timezone.utc)
+        db = db if db is not None else get_db()
+        user_oid = _user_oid(user_id)
+        if user_oid is None:
+            return 0
+        try:
+            return cls._backend().count(user_oid, now, db)
+        except Exception as e:
+            logger.warning(f"Due counter unavailable, counting in MongoDB: {e}")
+            return mongo_due_counter.count(user_oid, now, db)
+
+    @classmethod
+    def invalidate(cls, user_id):
+        """Forget a user's counter (e.g. after bulk card changes); it is rebuilt on the next count."""
+        user_oid = _user_oid(user_id)
+        if user_oid is None:
+            return
+        try:
+            cls._backend().invalidate(user_oid)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate due counter for user {user_oid}: {e}")
@@ -0,0 +1,199 @@
+"""
+Two-level cache for generated explanations.
+
+/explain, /explain/stream and /explain/chat look explanations up in order:
+
+1. ExplanationLRU, per worker: a bounded LRU accounted in bytes
+   (EXPLANATION_LRU_MAX_BYTES) whose entries expire after
+   EXPLANATION_LRU_TTL_SECONDS. Hot explanations never leave the process.
+2. The shared cache (namespace `explanation`, a day).
+3. The explanation_cache collection, the 30-day store of record. Expiry is
+   left to its TTL index on created_at (scripts/init_db.py).
+
+Entries are keyed by the question's content version (question_version: a
+hash of the text, options and answer the prompt is built from), so editing a
+question invalidates its explanations: the new version misses every level,
+stored documents with another question_version are ignored, and the LRU drops
+the question's entries for older versions the first time the new one is seen.
+Documents written before versions were recorded are accepted as they are.
+
+Lookups per level and LRU evictions are counted for GET /api/health/explanations.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+from flask import current_app
+from utils.cache import get_cache
+import threading
+import hashlib
+import json
+import sys
+import time
+import os
+
+LRU_MAX_BYTES = int(os.environ.get('EXPLANATION_LRU_MAX_BYTES', 32 * 1024 * 1024))
+LRU_TTL = float(os.environ.get('EXPLANATION_LRU_TTL_SECONDS', 3600))
+SHARED_TTL = 86400  # seconds; explanation_cache in MongoDB stays the 30-day store of record
+
+def question_version(question: dict) -> str:
+    """Hash of the question fields an explanation depends on."""
+    content = [
+        question.get('question_text') or question.get('text'),
+        question.get('options', []),
+        question.get('correct_answer'),
+    ]
+    canonical = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+class ExplanationLRU:
+    """In-process LRU of explanations bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int = LRU_MAX_BYTES, ttl: float = LRU_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries = OrderedDict()  # (cache_key, version) -> (explanation, size, expires_at, question_id)
+        self._versions = {}            # question_id -> version last seen
+        self._keys = {}                # question_id -> set of entry keys
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _size(key: tuple, explanation: str) -> int:
+        return sys.getsizeof(explanation) + sys.getsizeof(key[0]) + sys.getsizeof(key[1])
+
+    def _remove(self, key: tuple):
+        _, size, _, question_id = self._entries.pop(key)
+        self.bytes -= size
+        keys = self._keys.get(question_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[question_id]
+
+    def _check_version(self, question_id: str, version: str):
+        """Drop the question's entries for other versions once a new version shows up."""
+        previous = self._versions.get(question_id)
+        if previous == version:
+            return
+        self._versions[question_id] = version
+        if previous is None:
+            return
+        for key in list(self._keys.get(question_id, ())):
+            if key[1] != version:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def get(self, question_id: str, cache_key: str, version: str) -> Optional[str]:
+        key = (cache_key, version)
+        with self._lock:
+            self._check_version(question_id, version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, question_id: str, cache_key: str, version: str, explanation: str):
+        key = (cache_key, version)
+        size = self._size(key, explanation)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(question_id, version)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (explanation, size, time.monotonic() + self.ttl, question_id)
+            self._keys.setdefault(question_id, set()).add(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self.bytes, max_bytes=self.max_bytes)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+class ExplanationCache:
+    def __init__(self, lru: Optional[ExplanationLRU] = None, shared_ttl: int = SHARED_TTL):
+        self.lru = lru or ExplanationLRU()
+        self.shared_ttl = shared_ttl
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'store_hits': 0, 'stale': 0, 'misses': 0}
+
+    def _count(self, field: str):
+        with self._lock:
+            self._stats[field] += 1
+
+    def get(self, db, question_id: str, cache_key: str, version: str) -> Optional[str]:
+        """Explanation for this key and question version from the nearest level that has it."""
+        explanation = self.lru.get(question_id, cache_key, version)
+        if explanation:
+            self._count('local_hits')
+            return explanation
+        shared = get_cache()
+        explanation = shared.get('explanation', f"{cache_key}:{version}")
+        if explanation:
+            self._count('shared_hits')
+            self.lru.put(question_id, cache_key, version, explanation)
+            return explanation
+        cached = db.explanation_cache.find_one({'key': cache_key}, {'explanation': 1, 'question_version': 1})
+        if cached and cached.get('explanation'):
+            if cached.get('question_version', version) != version:
+                self._count('stale')
+                return None
+            self._count('store_hits')
+            explanation = cached['explanation']
+            shared.set('explanation', f"{cache_key}:{version}", explanation, ttl=self.shared_ttl)
+            self.lru.put(question_id, cache_key, version, explanation)
+            return explanation
+        self._count('misses')
+        return None
+
+    def put(self, db, question_id: str, cache_key: str, version: str, selected_indices, explanation: str):
+        """Store a generated explanation in every level (idempotent)."""
+        db.explanation_cache.update_one(
+            {'key': cache_key},
+            {'$set': {
+                'key': cache_key,
+                'explanation': explanation,
+                'created_at': datetime.now(timezone.utc),
+                'question_id': question_id,
+                'question_version': version,
+                'selected_indices': selected_indices
+            }},
+            upsert=True
+        )
+        get_cache().set('explanation', f"{cache_key}:{version}", explanation, ttl=self.shared_ttl)
+        self.lru.put(question_id, cache_key, version, explanation)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = sum(stats.values())
+        hits = stats['local_hits'] + stats['shared_hits'] + stats['store_hits']
+        stats['hit_ratio'] = round(hits / lookups, 4) if lookups else 0.0
+        stats['local_hit_ratio'] = round(stats['local_hits'] / lookups, 4) if lookups else 0.0
+        stats['lru'] = self.lru.stats()
+        return stats
+
+def get_explanation_cache() -> ExplanationCache:
+    """The app's ExplanationCache (created on first use if the app factory did not set one)."""
+    app = current_app._get_current_object()
+    explanations = getattr(app, 'explanation_cache', None)
+    if explanations is None:
+        explanations = app.explanation_cache = ExplanationCache()
+    return explanations
@@ -0,0 +1,185 @@
+"""
+Incremental formatter for model explanations and follow-up replies.
+
+The model is asked for inline math and blank-line separated step headers, but
+still emits display environments, `$$`/`\\[...\\]` blocks and uneven spacing.
+ExplanationFormatter normalizes that output line by line as chunks arrive:
+
+- display environments (align/aligned/equation/gather/multline/split/array)
+  become bullet lists with inline math
+- `$$`, `\\[` and `\\]` become `$`
+- **步驟...** headers get exactly one blank line before and after
+- runs of blank lines collapse to one; leading/trailing blank lines are dropped
+
+Lines outside a display environment are formatted as soon as their newline
+arrives. Lines from a `\\begin{...}` to its matching `\\end{...}` are held and
+converted together, so the joined output is identical to formatting the
+complete text at once (tests/data/explanation_corpus.json records the expected
+output; scripts/bench_explanation_formatter.py times it).
+"""
+
+import re
+from typing import Iterable, Iterator, List, Set
+
+_DISPLAY_ENVS = (
+    r'align\*?', 'aligned', r'equation\*?', r'gather\*?', r'multline\*?', 'split', 'array'
+)
+# One pattern per environment, applied in this order (nested environments
+# depend on it)
+_ENV_PATTERNS = [
+    re.compile(rf"\\begin\{{({env})\}}([\s\S]*?)\\end\{{\1\}}", re.IGNORECASE)
+    for env in _DISPLAY_ENVS
+]
+_ENV_TOKEN = re.compile(rf"\\(begin|end)\{{({'|'.join(_DISPLAY_ENVS)})\}}", re.IGNORECASE)
+_ENV_LINE_BREAK = re.compile(r"\\\\\s*|\n+")
+_WHITESPACE = re.compile(r"\s+")
+
+STEP_HEADER_PREFIX = '**步驟'
+
+def _env_to_bullets(match) -> str:
+    bullets: List[str] = []
+    for part in _ENV_LINE_BREAK.split(match.group(2)):
+        s = part.strip()
+        if not s:
+            continue
+        # Drop alignment markers and collapse whitespace
+        s = _WHITESPACE.sub(' ', s.replace('&', ' ')).strip()
+        # Remove enclosing $ if mistakenly present
+        if s.startswith('$') and s.endswith('$') and len(s) > 2:
+            s = s[1:-1].strip()
+        bullets.append(f"* ${s}$")
+    return '\n'.join(bullets)
+
+def sanitize_display_envs(text: str) -> str:
+    """Convert display-mode environments into bullet lists with inline math."""
+    for pattern in _ENV_PATTERNS:
+        text = pattern.sub(_env_to_bullets, text)
+    return text
+
+class ExplanationFormatter:
+    """Stateful formatter: feed() text chunks, get back finished output lines.
+
+    The output text is '\\n'.join of every line returned by feed() and close().
+    """
+
+    def __init__(self):
+        self._buffer = ''            # text after the last newline seen
+        self._held: List[str] = []   # raw lines inside an open display environment
+        self._open: Set[str] = set() # environments begun but not yet ended
+        self._started = False        # a non-blank line has been emitted
+        self._blank = False          # a blank line is owed before the next line
+
+    def feed(self, chunk: str) -> List[str]:
+        """Add a chunk of model output; return the lines it completed."""
+        out: List[str] = []
+        if not chunk:
+            return out
+        text = self._buffer + chunk
+        end = text.rfind('\n')
+        if end < 0:
+            self._buffer = text
+            return out
+        self._buffer = text[end + 1:]
+        self._take(text[:end], True, out)
+        return out
+
+    def close(self) -> List[str]:
+        """Flush the unterminated last line and any unclosed environment."""
+        out: List[str] = []
+        if self._buffer or self._held:
+            text, self._buffer = self._buffer, ''
+            self._take(text, False, out)
+        if self._held:
+            self._flush_held(False, out)
+        return out
+
+    def _take(self, text: str, terminated: bool, out: List[str]):
+        # Fast path: no display environment open or starting in these lines
+        if not self._open and not _ENV_TOKEN.search(text):
+            self._emit_text(text, terminated, out)
+            return
+        lines = text.split('\n')
+        last = len(lines) - 1
+        for i, raw in enumerate(lines):
+            if not self._open and not _ENV_TOKEN.search(raw):
+                self._emit_text(raw, terminated or i < last, out)
+                continue
+            for match in _ENV_TOKEN.finditer(raw):
+                name = match.group(2).lower()
+                if match.group(1).lower() == 'begin':
+                    self._open.add(name)
+                else:
+                    self._open.discard(name)
+            self._held.append(raw)
+            if not self._open:
+                self._flush_held(terminated or i < last, out)
+
+    def _flush_held(self, terminated: bool, out: List[str]):
+        text = sanitize_display_envs('\n'.join(self._held))
+        self._held = []
+        self._emit_text(text, terminated, out)
+
+    def _emit_text(self, text: str, terminated: bool, out: List[str]):
+        if '\r' in text:
+            # A terminated line's trailing \r belongs to its \r\n
+            if terminated and text.endswith('\r'):
+                text = text[:-1]
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        self._format_lines(text.split('\n'), out)
+
+    def _format_lines(self, lines: List[str], out: List[str]):
+        started, blank = self._started, self._blank
+        for raw in lines:
+            line = raw.strip()
+            if not line:
+                blank = started
+                continue
+
+            # Normalize block math to inline math
+            if '$$' in line:
+                line = line.replace('$$', '$')
+            if '\\' in line:
+                line = line.replace('\\[', '$').replace('\\]', '$')
+
+            if line.startswith(STEP_HEADER_PREFIX):
+                # Step headers stand alone between blank lines
+                if started:
+                    out.append('')
+                out.append(line)
+                started = blank = True
+                continue
+
+            if blank:
+                out.append('')
+                blank = False
+            # Bullet items are kept as-is; the frontend renders lists. Elsewhere,
+            # space out inline math markers so they do not stick to CJK words.
+            if '$' in line and not (line.startswith('* ') or line.startswith('- ')):
+                line = line.replace('$(', ' $(').replace(')$', ')$ ')
+                line = ' '.join(line.replace('$', ' $ ').split())
+            out.append(line)
+            started = True
+        self._started, self._blank = started, blank
+
+def format_explanation(text: str) -> str:
+    """Format a complete explanation in one call."""
+    formatter = ExplanationFormatter()
+    lines = formatter.feed(text)
+    lines.extend(formatter.close())
+    return '\n'.join(lines)
+
+def iter_formatted(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield formatted text for a stream of chunks as lines complete.
+
+    Joined together, the pieces equal format_explanation of the joined chunks.
+    """
+    formatter = ExplanationFormatter()
+    emitted = False
+    for chunk in chunks:
+        lines = formatter.feed(str(chunk))
+        if lines:
+            yield ('\n' if emitted else '') + '\n'.join(lines)
+            emitted = True
+    lines = formatter.close()
+    if lines:
+        yield ('\n' if emitted else '') + '\n'.join(lines)
@@ -0,0 +1,274 @@
+"""
+Answers repeated follow-up questions without calling the LLM.
+
+Students ask the same things about the same step ("why is it divided by 2
+here?"), so /api/lessons/explain/chat looks for a previous answer first:
+
+1. Exact: (question_id, step_key, selection, normalized message) in the shared cache
+   (namespace `followup`) or in the step's index below. Normalizing applies
+   NFKC, casefolds and drops whitespace and punctuation, so full-width/half-width
+   and spacing variants match.
+2. Similar: FollowupIndex, a TF-IDF index over character 1-2 grams of past
+   follow-up questions for that question, step and selection, built from
+   explanation_threads. The nearest past question's answer is reused when its
+   cosine similarity reaches FOLLOWUP_SIMILARITY_THRESHOLD and it mentions the
+   same numbers and Latin tokens (variables) as the new question; "乘以3" and
+   "乘以2" are close in n-grams but need different answers.
+
+Answers are scoped to the student's selection as well as the step: the reply
+was written for a particular (wrong or right) choice ("你選的 B 錯在…"), so a
+student who picked C never gets it.
+
+Indexes live per worker in a small LRU and are reloaded after
+FOLLOWUP_INDEX_REFRESH_SECONDS; new answers are added to the loaded index and
+the shared cache right away. Messages shorter than FOLLOWUP_MIN_CHARS
+(normalized) depend on the conversation ("why?") and always go to the LLM.
+"""
+
+from collections import Counter, OrderedDict, namedtuple
+from typing import Iterable, List, Optional, Tuple
+from bson import ObjectId
+from flask import current_app
+from utils.cache import get_cache
+import unicodedata
+import re
+import threading
+import hashlib
+import logging
+import math
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = float(os.environ.get('FOLLOWUP_SIMILARITY_THRESHOLD', 0.7))
+MIN_CHARS = int(os.environ.get('FOLLOWUP_MIN_CHARS', 6))
+CACHE_TTL = int(os.environ.get('FOLLOWUP_CACHE_TTL_SECONDS', 7 * 86400))
+INDEX_REFRESH_SECONDS = int(os.environ.get('FOLLOWUP_INDEX_REFRESH_SECONDS', 300))
+MAX_INDEXES = int(os.environ.get('FOLLOWUP_MAX_INDEXES', 1000))
+MAX_DOCS_PER_INDEX = 500
+MAX_THREADS_PER_LOAD = 200
+NGRAM_SIZES = (1, 2)
+_ANCHOR = re.compile(r'[0-9a-z]+')
+
+FollowupMatch = namedtuple('FollowupMatch', ['answer', 'kind', 'score'])
+
+def normalize_message(message: str) -> str:
+    text = unicodedata.normalize('NFKC', message or '').casefold()
+    return ''.join(ch for ch in text if not (ch.isspace() or unicodedata.category(ch)[0] == 'P'))
+
+def _ngrams(text: str) -> Counter:
+    grams = Counter()
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            grams[text[i:i + n]] += 1
+    if not grams and text:
+        grams[text] = 1
+    return grams
+
+class FollowupIndex:
+    """TF-IDF (character n-gram) index of past follow-up questions and their answers."""
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]] = (), max_docs: int = MAX_DOCS_PER_INDEX):
+        self.max_docs = max_docs
+        self.exact = {}               # normalized message -> answer
+        self._docs: List[Tuple[Counter, str, Counter]] = []
+        self._df = Counter()
+        self._norms = None            # doc vector norms, recomputed after adds
+        self._postings = {}           # gram -> [(doc id, tf)]
+        self._lock = threading.Lock()
+        for message, answer in pairs:
+            self.add(message, answer)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, message: str, answer: str):
+        key = normalize_message(message)
+        if not key or not answer:
+            return
+        with self._lock:
+            self._add(key, answer)
+
+    def _add(self, key: str, answer: str):
+        if key in self.exact:
+            self.exact[key] = answer
+            return
+        if len(self._docs) >= self.max_docs:
+            return
+        self.exact[key] = answer
+        grams = _ngrams(key)
+        doc_id = len(self._docs)
+        self._docs.append((grams, answer, Counter(_ANCHOR.findall(key))))
+        for gram, tf in grams.items():
+            self._df[gram] += 1
+            self._postings.setdefault(gram, []).append((doc_id, tf))
+        self._norms = None
+
+    def _idf(self, gram: str) -> float:
+        return math.log((1 + len(self._docs)) / (1 + self._df[gram])) + 1
+
+    def _doc_norms(self) -> List[float]:
+        if self._norms is None:
+            self._norms = [
+                math.sqrt(sum((tf * self._idf(gram)) ** 2 for gram, tf in grams.items()))
+                for grams, _, _ in self._docs
+            ]
+        return self._norms
+
+    def nearest(self, message: str) -> Optional[Tuple[str, float]]:
+        """(answer, cosine similarity) of the most similar past question with the same
+        numbers and variables, if any shares n-grams."""
+        key = normalize_message(message)
+        grams = _ngrams(key)
+        if not grams:
+            return None
+        with self._lock:
+            if not self._docs:
+                return None
+            return self._nearest(grams, Counter(_ANCHOR.findall(key)))
+
+    def _nearest(self, grams: Counter, anchors: Counter) -> Optional[Tuple[str, float]]:
+        norms = self._doc_norms()
+        scores = {}
+        query_norm = 0.0
+        for gram, tf in grams.items():
+            if gram not in self._df:
+                continue
+            idf = self._idf(gram)
+            weight = tf * idf
+            query_norm += weight * weight
+            for doc_id, doc_tf in self._postings[gram]:
+                if self._docs[doc_id][2] == anchors:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * doc_tf * idf
+        if not scores:
+            return None
+        # Unknown n-grams still count towards the query's length
+        query_norm += sum((tf * self._idf(gram)) ** 2 for gram, tf in grams.items() if gram not in self._df)
+        doc_id, dot = max(scores.items(), key=lambda item: item[1] / norms[item[0]])
+        return self._docs[doc_id][1], dot / (math.sqrt(query_norm) * norms[doc_id])
+
+def selection_key(selected_indices: Optional[Iterable[int]]) -> List[int]:
+    """Canonical form of a student's selected options (stored on threads as selected_indices)."""
+    return sorted({int(i) for i in selected_indices or []})
+
+def load_thread_pairs(db, question_id: str, step_key: Optional[str],
+                      selected_indices: Optional[Iterable[int]] = None) -> List[Tuple[str, str]]:
+    """(user message, assistant reply) pairs for a question/step/selection from recent explanation_threads.
+
+    Threads stored without selected_indices cannot be attributed to a selection and are skipped.
+    """
+    step_key = step_key or ''
+    pairs = []
+    cursor = db.explanation_threads.find(
+        {'question_id': ObjectId(question_id), 'selected_indices': selection_key(selected_indices)},
+        {'step_key': 1, 'messages': 1}
+    ).sort('updated_at', -1).limit(MAX_THREADS_PER_LOAD)
+    for thread in cursor:
+        question = None
+        for message in thread.get('messages') or []:
+            if message.get('role') == 'user':
+                question = message
+            elif message.get('role') == 'assistant' and question is not None:
+                # Older messages carry no step_key of their own; use the thread's
+                step = question.get('step_key', thread.get('step_key')) or ''
+                if step == step_key:
+                    pairs.append((question.get('content') or '', message.get('content') or ''))
+                question = None
+    return pairs
+
+class FollowupCache:
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, min_chars: int = MIN_CHARS,
+                 max_indexes: int = MAX_INDEXES, refresh_seconds: int = INDEX_REFRESH_SECONDS):
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self.max_indexes = max_indexes
+        self.refresh_seconds = refresh_seconds
+        self._indexes = OrderedDict()  # (question_id, step_key, selection) -> (FollowupIndex, loaded_at)
+        self._lock = threading.Lock()
+        self._stats = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0, 'skipped': 0}
+
+    def _count(self, field: str):
+        with self._lock:
+            self._stats[field] += 1
+
+    @staticmethod
+    def _scope(question_id: str, step_key: Optional[str], selected_indices) -> tuple:
+        return question_id, step_key or '', ','.join(map(str, selection_key(selected_indices)))
+
+    @classmethod
+    def _exact_key(cls, question_id: str, step_key: Optional[str], selected_indices, normalized: str) -> str:
+        digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        return ':'.join(cls._scope(question_id, step_key, selected_indices) + (digest,))
+
+    def _index(self, db, question_id: str, step_key: Optional[str], selected_indices) -> FollowupIndex:
+        key = self._scope(question_id, step_key, selected_indices)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._indexes.get(key)
+            if entry is not None and now - entry[1] < self.refresh_seconds:
+                self._indexes.move_to_end(key)
+                return entry[0]
+        index = FollowupIndex(load_thread_pairs(db, question_id, step_key, selected_indices))
+        with self._lock:
+            self._indexes[key] = (index, now)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def lookup(self, db, question_id: str, step_key: Optional[str], selected_indices,
+               message: str) -> Optional[FollowupMatch]:
+        """A previous answer to this follow-up from a student with the same selection (exact or similar), or None."""
+        normalized = normalize_message(message)
+        if len(normalized) < self.min_chars:
+            self._count('skipped')
+            return None
+        answer = get_cache().get('followup', self._exact_key(question_id, step_key, selected_indices, normalized))
+        if answer:
+            self._count('exact_hits')
+            return FollowupMatch(answer, 'exact', 1.0)
+        try:
+            index = self._index(db, question_id, step_key, selected_indices)
+        except Exception as e:
+            logger.warning(f"Follow-up index load failed for {question_id}: {str(e)}")
+            self._count('misses')
+            return None
+        answer = index.exact.get(normalized)
+        if answer:
+            self._count('exact_hits')
+            return FollowupMatch(answer, 'exact', 1.0)
+        nearest = index.nearest(normalized)
+        if nearest and nearest[1] >= self.threshold:
+            self._count('similar_hits')
+            return FollowupMatch(nearest[0], 'similar', round(nearest[1], 4))
+        self._count('misses')
+        return None
+
+    def record(self, question_id: str, step_key: Optional[str], selected_indices, message: str, answer: str):
+        """Make a freshly generated answer available to later lookups."""
+        normalized = normalize_message(message)
+        if len(normalized) < self.min_chars or not answer:
+            return
+        get_cache().set('followup', self._exact_key(question_id, step_key, selected_indices, normalized),
+                        answer, ttl=CACHE_TTL)
+        with self._lock:
+            entry = self._indexes.get(self._scope(question_id, step_key, selected_indices))
+        if entry is not None:
+            entry[0].add(message, answer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['indexes'] = len(self._indexes)
+        lookups = stats['exact_hits'] + stats['similar_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['exact_hits'] + stats['similar_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+def get_followup_cache() -> FollowupCache:
+    """The app's FollowupCache (created on first use if the app factory did not set one)."""
+    app = current_app._get_current_object()
+    followups = getattr(app, 'followup_cache', None)
+    if followups is None:
+        followups = app.followup_cache = FollowupCache()
+    return followups
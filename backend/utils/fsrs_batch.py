@@ -0,0 +1,356 @@
+"""
+Columnar FSRS engine for computing card state over many cards at once.
+
+FSRSCard/FSRSHelper work one card at a time through fsrs.Card objects, which is
+fine for a single review but far too slow for dashboards, ranking or offline
+replays over 100k+ cards. CardBatch holds the scheduling fields as NumPy
+columns and FSRSBatchEngine evaluates the same formulas as
+fsrs.Scheduler.review_card over the whole batch:
+
+- current retrievability per card
+- for each rating (Again/Hard/Good/Easy): next stability, difficulty, state,
+  step, interval and projected due date
+
+Timestamps are stored as int64 microseconds since the Unix epoch (UTC) so that
+day arithmetic matches timedelta.days exactly. Fuzzing is random in the scalar
+scheduler, so previews are unfuzzed by default; pass fuzz=True to sample it.
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Iterable, List, Optional
+import math
+import numpy as np
+from fsrs import Rating, State, Scheduler
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+US_PER_DAY = 86_400_000_000
+NO_TIME = np.iinfo(np.int64).min  # sentinel for a missing datetime
+NO_STEP = -1                       # sentinel for step=None (Review state)
+RATINGS = (Rating.Again, Rating.Hard, Rating.Good, Rating.Easy)
+
+STABILITY_MIN = 0.001
+MIN_DIFFICULTY = 1.0
+MAX_DIFFICULTY = 10.0
+
+CARD_PROJECTION = {
+    '_id': 1, 'user_id': 1, 'question_id': 1, 'due_date': 1, 'stability': 1,
+    'difficulty': 1, 'state': 1, 'step': 1, 'last_review': 1
+}
+
+def to_us(value: Optional[datetime]) -> int:
+    """datetime -> epoch microseconds; naive datetimes are treated as UTC like FSRSCard."""
+    if value is None:
+        return NO_TIME
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+def from_us(value: int) -> Optional[datetime]:
+    if value == NO_TIME:
+        return None
+    return EPOCH + timedelta(microseconds=int(value))
+
+def _steps_us(steps) -> np.ndarray:
+    return np.array([step // timedelta(microseconds=1) for step in steps], dtype=np.int64)
+
+class CardBatch:
+    """Scheduling fields of many cards as parallel NumPy arrays."""
+
+    __slots__ = ('ids', 'user_ids', 'question_ids', 'due', 'stability',
+                 'difficulty', 'state', 'step', 'last_review')
+
+    def __init__(self, ids, user_ids, question_ids, due, stability, difficulty, state, step, last_review):
+        self.ids = ids
+        self.user_ids = user_ids
+        self.question_ids = question_ids
+        self.due = np.asarray(due, dtype=np.int64)
+        self.stability = np.asarray(stability, dtype=np.float64)
+        self.difficulty = np.asarray(difficulty, dtype=np.float64)
+        self.state = np.asarray(state, dtype=np.int8)
+        self.step = np.asarray(step, dtype=np.int16)
+        self.last_review = np.asarray(last_review, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.state)
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[dict]) -> 'CardBatch':
+        """Build a batch from raw fsrs_cards documents, normalized the way FSRSCard._from_dict does."""
+        ids, user_ids, question_ids = [], [], []
+        due, stability, difficulty, state, step, last_review = [], [], [], [], [], []
+        for doc in docs:
+            state_val = doc.get('state', State.Learning.value)
+            step_val = doc.get('step')
+            if step_val is None:
+                step_val = 0 if state_val in (State.Learning.value, State.Relearning.value) else NO_STEP
+            ids.append(doc.get('_id'))
+            user_ids.append(doc.get('user_id'))
+            question_ids.append(doc.get('question_id'))
+            due.append(to_us(doc.get('due_date')))
+            stability.append(doc.get('stability') or 2.5)
+            difficulty.append(doc.get('difficulty') or 2.5)
+            state.append(state_val)
+            step.append(step_val)
+            last_review.append(to_us(doc.get('last_review')))
+        return cls(ids, user_ids, question_ids, due, stability, difficulty, state, step, last_review)
+
+    @classmethod
+    def from_cards(cls, cards) -> 'CardBatch':
+        """Build a batch from FSRSCard objects."""
+        return cls(
+            [card.id for card in cards],
+            [card.user_id for card in cards],
+            [card.question_id for card in cards],
+            [to_us(card.due_date) for card in cards],
+            [card.stability for card in cards],
+            [card.difficulty for card in cards],
+            [card.state for card in cards],
+            [NO_STEP if card.step is None else card.step for card in cards],
+            [to_us(card.last_review) for card in cards],
+        )
+
+    @classmethod
+    def load(cls, db, query: dict, batch_size: int = 5000) -> 'CardBatch':
+        """Stream matching fsrs_cards (e.g. {'user_id': ...} or {'user_id': {'$in': cohort}}) into a batch."""
+        cursor = db.fsrs_cards.find(query, CARD_PROJECTION).batch_size(batch_size)
+        return cls.from_documents(cursor)
+
+class BatchPreview:
+    """Result of FSRSBatchEngine.preview; per-rating arrays have shape (4, n) in RATINGS order."""
+
+    __slots__ = ('retrievability', 'stability', 'difficulty', 'state', 'step', 'interval', 'due')
+
+    def __init__(self, retrievability, stability, difficulty, state, step, interval, due):
+        self.retrievability = retrievability
+        self.stability = stability
+        self.difficulty = difficulty
+        self.state = state
+        self.step = step
+        self.interval = interval  # microseconds
+        self.due = due            # epoch microseconds
+
+    @property
+    def interval_days(self) -> np.ndarray:
+        return self.interval / US_PER_DAY
+
+    def for_rating(self, rating: Rating) -> dict:
+        row = RATINGS.index(rating)
+        return {
+            'stability': self.stability[row],
+            'difficulty': self.difficulty[row],
+            'state': self.state[row],
+            'step': self.step[row],
+            'interval': self.interval[row],
+            'due': self.due[row],
+        }
+
+class FSRSBatchEngine:
+    """Vectorized counterpart of fsrs.Scheduler.review_card for a fixed scheduler."""
+
+    def __init__(self, scheduler: Scheduler):
+        self.scheduler = scheduler
+        self.w = tuple(float(w) for w in scheduler.parameters)
+        # Same scalar arithmetic as Scheduler.__init__ so results match bit for bit
+        self.decay = -self.w[20]
+        self.factor = 0.9 ** (1 / self.decay) - 1
+        self.desired_retention = scheduler.desired_retention
+        self.maximum_interval = scheduler.maximum_interval
+        self.learning_steps = _steps_us(scheduler.learning_steps)
+        self.relearning_steps = _steps_us(scheduler.relearning_steps)
+
+    # --- formulas (element-wise versions of the Scheduler private helpers) ---
+
+    def _initial_stability(self, rating: int) -> float:
+        return max(self.w[rating - 1], STABILITY_MIN)
+
+    def _initial_difficulty(self, rating: int, clamp: bool = True) -> float:
+        difficulty = self.w[4] - (math.e ** (self.w[5] * (rating - 1))) + 1
+        if clamp:
+            difficulty = min(max(difficulty, MIN_DIFFICULTY), MAX_DIFFICULTY)
+        return difficulty
+
+    def _short_term_stability(self, stability: np.ndarray, rating: int) -> np.ndarray:
+        increase = (math.e ** (self.w[17] * (rating - 3 + self.w[18]))) * np.power(stability, -self.w[19])
+        if rating != Rating.Again:
+            increase = np.maximum(increase, 1.0)
+        return np.maximum(stability * increase, STABILITY_MIN)
+
+    def _next_difficulty(self, difficulty: np.ndarray, rating: int) -> np.ndarray:
+        arg_1 = self._initial_difficulty(Rating.Easy, clamp=False)
+        delta_difficulty = -(self.w[6] * (rating - 3))
+        arg_2 = difficulty + (10.0 - difficulty) * delta_difficulty / 9.0
+        next_difficulty = self.w[7] * arg_1 + (1 - self.w[7]) * arg_2
+        return np.clip(next_difficulty, MIN_DIFFICULTY, MAX_DIFFICULTY)
+
+    def _next_stability(self, difficulty, stability, retrievability, rating: int) -> np.ndarray:
+        w = self.w
+        if rating == Rating.Again:
+            long_term = (
+                w[11]
+                * np.power(difficulty, -w[12])
+                * (np.power(stability + 1, w[13]) - 1)
+                * np.power(math.e, (1 - retrievability) * w[14])
+            )
+            short_term = stability / (math.e ** (w[17] * w[18]))
+            next_stability = np.minimum(long_term, short_term)
+        else:
+            hard_penalty = w[15] if rating == Rating.Hard else 1
+            easy_bonus = w[16] if rating == Rating.Easy else 1
+            next_stability = stability * (
+                1
+                + (math.e ** w[8])
+                * (11 - difficulty)
+                * np.power(stability, -w[9])
+                * (np.power(math.e, (1 - retrievability) * w[10]) - 1)
+                * hard_penalty
+                * easy_bonus
+            )
+        return np.maximum(next_stability, STABILITY_MIN)
+
+    def _next_interval_days(self, stability: np.ndarray) -> np.ndarray:
+        interval = (stability / self.factor) * ((self.desired_retention ** (1 / self.decay)) - 1)
+        interval = np.rint(interval)  # round-half-even, like round()
+        return np.clip(interval, 1, self.maximum_interval).astype(np.int64)
+
+    def _fuzz(self, interval_us: np.ndarray, mask: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        days = interval_us // US_PER_DAY
+        mask = mask & (days >= 3)  # fuzz is not applied to intervals under 2.5 days
+        if not mask.any():
+            return interval_us
+        delta = np.ones(days.shape, dtype=np.float64)
+        for start, end, factor in ((2.5, 7.0, 0.15), (7.0, 20.0, 0.1), (20.0, math.inf, 0.05)):
+            delta += factor * np.maximum(np.minimum(days.astype(np.float64), end) - start, 0.0)
+        min_ivl = np.maximum(2, np.rint(days - delta))
+        max_ivl = np.minimum(np.rint(days + delta), self.maximum_interval)
+        min_ivl = np.minimum(min_ivl, max_ivl)
+        fuzzed = rng.random(days.shape) * (max_ivl - min_ivl + 1) + min_ivl
+        fuzzed = np.minimum(np.rint(fuzzed), self.maximum_interval).astype(np.int64)
+        return np.where(mask, fuzzed * US_PER_DAY, interval_us)
+
+    # --- public API ---
+
+    def retrievability(self, batch: CardBatch, now: Optional[datetime] = None) -> np.ndarray:
+        """Predicted recall probability for every card at `now` (0 for never-reviewed cards)."""
+        now_us = to_us(now or datetime.now(timezone.utc))
+        return self._retrievability(batch, now_us)
+
+    def _retrievability(self, batch: CardBatch, now_us: int) -> np.ndarray:
+        reviewed = batch.last_review != NO_TIME
+        elapsed_days = np.maximum(0, (now_us - batch.last_review) // US_PER_DAY)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = np.power(1 + self.factor * elapsed_days.astype(np.float64) / batch.stability, self.decay)
+        return np.where(reviewed, result, 0.0)
+
+    def preview(self, batch: CardBatch, now: Optional[datetime] = None,
+                fuzz: bool = False, rng: Optional[np.random.Generator] = None) -> BatchPreview:
+        """Outcome of reviewing every card at `now` with each of the four ratings."""
+        now_us = to_us(now or datetime.now(timezone.utc))
+        n = len(batch)
+        retrievability = self._retrievability(batch, now_us)
+
+        reviewed = batch.last_review != NO_TIME
+        days_since = (now_us - batch.last_review) // US_PER_DAY
+        short_term = reviewed & (days_since < 1)
+        uninitialized = np.isnan(batch.stability) | np.isnan(batch.difficulty)
+
+        learning = batch.state == State.Learning.value
+        review = batch.state == State.Review.value
+        relearning = batch.state == State.Relearning.value
+        step = batch.step.astype(np.int64)
+
+        shape = (len(RATINGS), n)
+        out_stability = np.empty(shape)
+        out_difficulty = np.empty(shape)
+        out_state = np.empty(shape, dtype=np.int8)
+        out_step = np.empty(shape, dtype=np.int16)
+        out_interval = np.empty(shape, dtype=np.int64)
+
+        for row, rating in enumerate(RATINGS):
+            r = int(rating)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                stability = np.where(
+                    short_term,
+                    self._short_term_stability(batch.stability, r),
+                    self._next_stability(batch.difficulty, batch.stability, retrievability, r)
+                )
+                difficulty = self._next_difficulty(batch.difficulty, r)
+            # Learning cards without memory state start from the initial parameters
+            stability = np.where(learning & uninitialized, self._initial_stability(r), stability)
+            difficulty = np.where(learning & uninitialized, self._initial_difficulty(r), difficulty)
+
+            graduate_us = self._next_interval_days(stability) * US_PER_DAY
+            new_state = batch.state.copy()
+            new_step = step.copy()
+            interval = graduate_us.copy()
+
+            for state_mask, steps, state_value in (
+                (learning, self.learning_steps, State.Learning.value),
+                (relearning, self.relearning_steps, State.Relearning.value),
+            ):
+                if not state_mask.any():
+                    continue
+                n_steps = len(steps)
+                if n_steps == 0:
+                    graduate = state_mask
+                else:
+                    graduate = state_mask & (step >= n_steps) & (rating != Rating.Again)
+                stay = state_mask & ~graduate
+                safe_step = np.clip(step, 0, max(n_steps - 1, 0))
+                if rating == Rating.Again:
+                    stay_step = np.zeros(n, dtype=np.int64)
+                    stay_interval = np.full(n, steps[0] if n_steps else 0)
+                elif rating == Rating.Hard:
+                    stay_step = step
+                    if n_steps == 1:
+                        first = np.rint(steps[0] * 1.5)
+                    elif n_steps >= 2:
+                        first = np.rint((steps[0] + steps[1]) / 2.0)
+                    else:
+                        first = 0
+                    stay_interval = np.where(step == 0, first, steps[safe_step] if n_steps else 0)
+                elif rating == Rating.Good:
+                    last_step = stay & (step + 1 == n_steps)
+                    graduate = graduate | last_step
+                    stay = stay & ~last_step
+                    stay_step = step + 1
+                    stay_interval = steps[np.clip(step + 1, 0, max(n_steps - 1, 0))] if n_steps else np.zeros(n)
+                else:
+                    graduate = graduate | stay
+                    stay = np.zeros(n, dtype=bool)
+                    stay_step = step
+                    stay_interval = np.zeros(n)
+
+                new_state = np.where(graduate, State.Review.value, new_state)
+                new_step = np.where(graduate, NO_STEP, new_step)
+                new_state = np.where(stay, state_value, new_state)
+                new_step = np.where(stay, stay_step, new_step)
+                interval = np.where(stay, np.asarray(stay_interval, dtype=np.int64), interval)
+
+            if rating == Rating.Again and len(self.relearning_steps):
+                new_state = np.where(review, State.Relearning.value, new_state)
+                new_step = np.where(review, 0, new_step)
+                interval = np.where(review, self.relearning_steps[0], interval)
+
+            if fuzz and self.scheduler.enable_fuzzing:
+                interval = self._fuzz(interval, new_state == State.Review.value, rng or np.random.default_rng())
+
+            out_stability[row] = stability
+            out_difficulty[row] = difficulty
+            out_state[row] = new_state
+            out_step[row] = new_step
+            out_interval[row] = interval
+
+        return BatchPreview(
+            retrievability=retrievability,
+            stability=out_stability,
+            difficulty=out_difficulty,
+            state=out_state,
+            step=out_step,
+            interval=out_interval,
+            due=now_us + out_interval,
+        )
+
+    def projected_due(self, batch: CardBatch, rating: Rating, now: Optional[datetime] = None) -> List[Optional[datetime]]:
+        """Due datetimes after reviewing every card with `rating` at `now`."""
+        preview = self.preview(batch, now)
+        return [from_us(value) for value in preview.for_rating(rating)['due']]
@@ -1,47 +1,177 @@
 from fsrs import Scheduler, Card, Rating, State
 from datetime import datetime, timezone, timedelta
 from models.fsrs_card import FSRSCard
+from models.question_bank import QuestionBank
 from typing import Optional, List, Dict, Union, Tuple
 from bson.objectid import ObjectId
-from utils.database import get_db
+from collections import OrderedDict
+import threading
+import hashlib
+import json
+import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+SCHEDULER_PROFILE_KEYS = (
+    'user_level', 'desired_retention', 'learning_steps', 'relearning_steps',
+    'maximum_interval', 'enable_fuzzing', 'parameters'
+)
+USER_LEVELS = ('beginner', 'intermediate', 'advanced')
+
+def resolve_scheduler_params(profile: Optional[dict] = None) -> dict:
+    """Expand a (possibly empty) scheduler profile into Scheduler keyword arguments."""
+    params = {
+        'desired_retention': 0.85,  # Slightly lower for math learning
+        'learning_steps': [
+            timedelta(minutes=5),
+            timedelta(minutes=30),
+            timedelta(hours=4)
+        ],
+        'relearning_steps': [
+            timedelta(minutes=10),
+            timedelta(hours=1)
+        ],
+        'maximum_interval': 180,  # 6 months max for math topics
+        'enable_fuzzing': True    # Add some randomness to intervals
+    }
+    if not profile:
+        return params
+
+    # Adjust based on user level
+    level = profile.get('user_level')
+    if level == 'beginner':
+        params['desired_retention'] = 0.90
+        params['learning_steps'].append(timedelta(hours=8))
+    elif level == 'advanced':
+        params['desired_retention'] = 0.80
+        params['learning_steps'] = params['learning_steps'][:2]
+
+    # Override with any explicit parameters; stored profiles keep steps as seconds
+    for key, value in profile.items():
+        if key == 'user_level' or key not in SCHEDULER_PROFILE_KEYS:
+            continue
+        if key in ('learning_steps', 'relearning_steps'):
+            value = [step if isinstance(step, timedelta) else timedelta(seconds=step) for step in value]
+        params[key] = value
+    return params
+
+def scheduler_profile_key(params: dict) -> str:
+    """Stable hash of resolved scheduler parameters."""
+    canonical = {}
+    for key, value in params.items():
+        if key in ('learning_steps', 'relearning_steps'):
+            value = [step.total_seconds() for step in value]
+        elif key == 'parameters':
+            value = [float(w) for w in value]
+        canonical[key] = value
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+class _FrozenScheduler(Scheduler):
+    """Scheduler that rejects attribute writes after construction so one instance can be shared."""
+    _frozen = False
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        object.__setattr__(self, '_frozen', True)
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f"Cached scheduler is read-only (attempted to set '{name}')")
+        super().__setattr__(name, value)
+
+class SchedulerCache:
+    """Bounded, thread-safe LRU of immutable Scheduler instances keyed by profile hash."""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Scheduler]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, params: dict) -> Scheduler:
+        key = scheduler_profile_key(params)
+        with self._lock:
+            scheduler = self._entries.get(key)
+            if scheduler is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return scheduler
+            self.misses += 1
+
+        # Build outside the lock; if two threads race, the first insert wins
+        scheduler = _FrozenScheduler(**params)
+        with self._lock:
+            scheduler = self._entries.setdefault(key, scheduler)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return scheduler
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+scheduler_cache = SchedulerCache(maxsize=int(os.environ.get('FSRS_SCHEDULER_CACHE_SIZE', 64)))
+
 class FSRSHelper:
     def __init__(self, user_parameters: Optional[dict] = None):
-        """Initialize FSRS Scheduler with math-optimized parameters."""
-        default_params = {
-            'desired_retention': 0.85,  # Slightly lower for math learning
-            'learning_steps': [
-                timedelta(minutes=5),
-                timedelta(minutes=30),
-                timedelta(hours=4)
-            ],
-            'relearning_steps': [
-                timedelta(minutes=10),
-                timedelta(hours=1)
-            ],
-            'maximum_interval': 180,  # 6 months max for math topics
-            'enable_fuzzing': True    # Add some randomness to intervals
-        }
-        
-        # Update with user parameters if provided
-        if user_parameters:
-            # Adjust based on user level
-            if 'user_level' in user_parameters:
-                level = user_parameters['user_level']
-                if level == 'beginner':
-                    default_params['desired_retention'] = 0.90
-                    default_params['learning_steps'].append(timedelta(hours=8))
-                elif level == 'advanced':
-                    default_params['desired_retention'] = 0.80
-                    default_params['learning_steps'] = default_params['learning_steps'][:2]
-            
-            # Override with any explicit parameters
-            default_params.update(user_parameters)
-        
-        self.scheduler = Scheduler(**default_params)
+        """Initialize FSRS Scheduler with math-optimized parameters.
+
+        user_parameters is a scheduler profile (see normalize_profile); schedulers
+        are shared per distinct profile through the module-level cache.
+        """
+        self.scheduler = scheduler_cache.get(resolve_scheduler_params(user_parameters))
+
+    @staticmethod
+    def normalize_profile(profile: dict) -> dict:
+        """Validate a user-supplied scheduler profile and return its storable form.
+
+        Raises ValueError for unknown keys or out-of-range values.
+        """
+        if not isinstance(profile, dict):
+            raise ValueError('scheduler profile must be an object')
+        unknown = set(profile) - set(SCHEDULER_PROFILE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown scheduler profile fields: {', '.join(sorted(unknown))}")
+
+        normalized = {}
+        if 'user_level' in profile:
+            if profile['user_level'] not in USER_LEVELS:
+                raise ValueError(f"user_level must be one of {', '.join(USER_LEVELS)}")
+            normalized['user_level'] = profile['user_level']
+        if 'desired_retention' in profile:
+            retention = float(profile['desired_retention'])
+            if not 0.7 <= retention <= 0.97:
+                raise ValueError('desired_retention must be between 0.7 and 0.97')
+            normalized['desired_retention'] = retention
+        for key in ('learning_steps', 'relearning_steps'):
+            if key in profile:
+                steps = profile[key]
+                if not isinstance(steps, list) or len(steps) > 10:
+                    raise ValueError(f'{key} must be a list of at most 10 steps (seconds)')
+                seconds = [int(step.total_seconds()) if isinstance(step, timedelta) else int(step) for step in steps]
+                if any(step <= 0 for step in seconds):
+                    raise ValueError(f'{key} must contain positive durations')
+                normalized[key] = seconds
+        if 'maximum_interval' in profile:
+            maximum_interval = int(profile['maximum_interval'])
+            if maximum_interval < 1:
+                raise ValueError('maximum_interval must be at least 1 day')
+            normalized['maximum_interval'] = maximum_interval
+        if 'enable_fuzzing' in profile:
+            normalized['enable_fuzzing'] = bool(profile['enable_fuzzing'])
+        if 'parameters' in profile:
+            normalized['parameters'] = [float(w) for w in profile['parameters']]
+
+        # Let fsrs validate the model weights
+        scheduler_cache.get(resolve_scheduler_params(normalized))
+        return normalized
 
     @staticmethod
     def ensure_card(user_id: str, question_id: str, is_new: bool = True) -> FSRSCard:
@@ -49,6 +179,9 @@ class FSRSHelper:
         card = FSRSCard.get_by_user_and_question(user_id, question_id)
         if not card:
             card = FSRSCard(user_id=user_id, question_id=question_id)
+            question = QuestionBank.get(question_id) if ObjectId.is_valid(question_id) else None
+            if question:
+                card.denormalize_question(question)
             # For new cards, we start in Learning state
             # For review cards, we'll let FSRS handle the state transitions
             card.save()
@@ -58,24 +191,16 @@ class FSRSHelper:
     def update_card(user_id: str, question_id: str, rating: Rating) -> FSRSCard:
         """Update FSRS card state based on user rating."""
         card = FSRSHelper.ensure_card(user_id, question_id)
-        helper = FSRSHelper()
+        from models.user import User
+        helper = FSRSHelper(User.get_scheduler_profile(user_id))
         # Let FSRS handle the state transitions based on the rating
         updated_card, _ = helper.review_card(card, rating)
         return updated_card
 
     @staticmethod
     def get_due_cards(user_id: str, skills=None, limit: int = 20):
-        """Get due FSRS cards for a user, optionally filtered by skills."""
-        cards = FSRSCard.get_due_cards(user_id, limit=limit)
-        if skills:
-            db = get_db()
-            skill_set = set([s.lower() for s in skills])
-            filtered = []
-            for card in cards:
-                q = db.questions.find_one({'_id': ObjectId(card.question_id)})
-                if q and q.get('skill_category', '').lower() in skill_set:
-                    filtered.append({'question_id': card.question_id})
-            return filtered
+        """Get due FSRS cards for a user, optionally filtered by skills (card categories)."""
+        cards = FSRSCard.get_due_cards(user_id, limit=limit, categories=skills)
         return [{'question_id': card.question_id} for card in cards]
 
     def review_card(
@@ -84,7 +209,8 @@ class FSRSHelper:
         rating_value: Optional[Union[int, Rating]] = None,
         performance_data: Optional[dict] = None,
         question_data: Optional[dict] = None,
-        now: Optional[datetime] = None
+        now: Optional[datetime] = None,
+        save: bool = True
     ) -> Tuple[FSRSCard, dict]:
         """
         Review a card with enhanced performance tracking
@@ -98,6 +224,8 @@ class FSRSHelper:
                 - consecutive_correct: int (optional)
             question_data: Question details including difficulty
             now: Override current time (for testing)
+            save: Persist the card immediately; callers batching their writes
+                (e.g. the submit pipeline) pass False and save it themselves
         """
         now = now or datetime.now(timezone.utc)
         
@@ -135,7 +263,8 @@ class FSRSHelper:
         card.scheduled_days = (card.due_date - now).days
         
         # Save changes
-        card.save()
+        if save:
+            card.save()
         
         logger.debug(
             f"Reviewed card {card.id}: rating={rating.name}, "
@@ -152,35 +281,21 @@ class FSRSHelper:
         include_learning: bool = True
     ) -> List[dict]:
         """Get next cards to review with smart selection"""
+        # Skill and state filters run in the query, so `limit` cards come back without over-fetching
         cards_with_context = FSRSCard.get_cards_with_context(
             user_id=user_id,
-            limit=limit * 2  # Get extra for filtering
+            limit=limit,
+            categories=skills,
+            state=None if include_learning else State.Review.value
         )
         
-        if skills:
-            # Filter by skills
-            skill_set = {s.lower() for s in skills}
-            cards_with_context = [
-                (card, q) for card, q in cards_with_context
-                if q.get('skill_category', '').lower() in skill_set
-            ]
-        
-        # Filter by state if needed
-        if not include_learning:
-            cards_with_context = [
-                (card, q) for card, q in cards_with_context
-                if card.state == State.Review.value
-            ]
-        
-        # Take only what we need
-        cards_with_context = cards_with_context[:limit]
-        
         return [
             {
                 'question_id': card.question_id,
                 'due_in_days': card.days_until_due,
                 'state': card.state_name,
-                'difficulty': q.get('difficulty', 3)
+                # Cards not yet backfilled fall back to the question itself
+                'difficulty': card.question_difficulty or q.get('difficulty', 3)
             }
             for card, q in cards_with_context
         ]
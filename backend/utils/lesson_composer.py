@@ -0,0 +1,122 @@
+"""
+Lesson composition for POST /api/lessons/start.
+
+A lesson queue is built from three sources, in this order:
+
+1. Due cards: the user's cards in the chosen categories with due_date <= now,
+   most overdue first. One query on fsrs_cards; the category filter runs in
+   Mongo on the cards' denormalized `category`.
+2. New questions: questions the user has no card for, capped per lesson type.
+   Candidates come from QuestionBank.sample (in-memory id pools) and the ones
+   that already have a card are found with one $in query on
+   (user_id, question_id).
+3. Practice: the remaining sampled candidates fill the lesson up to its size.
+
+The chosen categories are resolved with QuestionBank.match_categories, so a
+partial name such as "algebra" selects "linear algebra" when no category is
+called "algebra".
+
+The lesson `type` selects how many due and new questions a lesson may hold
+(LESSON_MIXES); the optional difficulty stratum applies to new and practice
+questions, while due cards are always served.
+
+serve_questions turns queued ids into what /api/lessons/next returns: only
+SERVED_FIELDS of each question, plus an is_review flag for all of them from
+one $in query on the user's cards.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from bson import ObjectId
+from models.question_bank import QuestionBank
+import os
+
+LESSON_SIZE = 10  # questions per lesson
+NEW_CARDS_PER_LESSON = int(os.environ.get('LESSON_NEW_CARDS', 3))
+CANDIDATE_FACTOR = 3  # sampled candidates per lesson slot, so seen and due questions can be skipped
+
+# type -> (max due cards, max new questions); practice questions fill the rest
+LESSON_MIXES = {
+    'initial': (0, LESSON_SIZE),
+    'review': (LESSON_SIZE, 0),
+    'practice': (LESSON_SIZE // 2, NEW_CARDS_PER_LESSON),
+}
+
+LessonPlan = namedtuple('LessonPlan', ['question_ids', 'due', 'new', 'practice'])
+
+# Question fields the lesson client renders and grades with
+SERVED_FIELDS = (
+    'type', 'question_text', 'text', 'options', 'correct_answer', 'correct_indices',
+    'category', 'sub_topic', 'difficulty', 'tags',
+)
+
+def _due_question_ids(db, user_id: ObjectId, categories: List[str], limit: int, now: datetime) -> List[ObjectId]:
+    if limit <= 0:
+        return []
+    cursor = db.fsrs_cards.find(
+        {'user_id': user_id, 'category': {'$in': categories}, 'due_date': {'$lte': now}},
+        {'question_id': 1, '_id': 0}
+    ).sort('due_date', 1).limit(limit)
+    return [card['question_id'] for card in cursor]
+
+def _carded(db, user_id: ObjectId, question_ids: List[ObjectId]) -> set:
+    """Which of `question_ids` the user already has a card for."""
+    if not question_ids:
+        return set()
+    cursor = db.fsrs_cards.find(
+        {'user_id': user_id, 'question_id': {'$in': question_ids}},
+        {'question_id': 1, '_id': 0}
+    )
+    return {card['question_id'] for card in cursor}
+
+def compose_lesson(db, user_id, categories: Iterable[str], lesson_type: str,
+                   difficulties: Optional[Iterable[int]] = None, size: int = LESSON_SIZE,
+                   now: Optional[datetime] = None) -> LessonPlan:
+    """Question ids for a new lesson: due cards, then new questions, then practice."""
+    user_id = user_id if isinstance(user_id, ObjectId) else ObjectId(user_id)
+    categories = list(dict.fromkeys(c.lower() for c in categories))
+    # Whole names, else substrings of the bank's categories; cards may outlive their category
+    categories = QuestionBank.match_categories(categories, db) or categories
+    now = now or datetime.now(timezone.utc)
+    max_due, max_new = LESSON_MIXES[lesson_type]
+
+    due = _due_question_ids(db, user_id, categories, min(max_due, size), now)
+    open_slots = size - len(due)
+    if open_slots <= 0:
+        return LessonPlan(due, len(due), 0, 0)
+
+    taken = set(due)
+    candidates = [
+        oid for oid in QuestionBank.sample(categories, size * CANDIDATE_FACTOR, difficulties, db)
+        if oid not in taken
+    ]
+    new = []
+    if max_new > 0:
+        carded = _carded(db, user_id, candidates)
+        new = [oid for oid in candidates if oid not in carded][:min(max_new, open_slots)]
+        taken.update(new)
+    practice = [oid for oid in candidates if oid not in taken][:open_slots - len(new)]
+    return LessonPlan(due + new + practice, len(due), len(new), len(practice))
+
+def serve_questions(db, user_id, question_ids: List) -> List[dict]:
+    """The queued questions in order (ids that no longer exist are skipped), as served to the client."""
+    user_id = user_id if isinstance(user_id, ObjectId) else ObjectId(user_id)
+    questions = QuestionBank.get_many(question_ids, db)
+    oids = [ObjectId(qid) for qid in questions]
+    reviewed = {
+        card['question_id'] for card in db.fsrs_cards.find(
+            {'user_id': user_id, 'question_id': {'$in': oids}, 'last_review': {'$ne': None}},
+            {'question_id': 1, '_id': 0}
+        )
+    } if oids else set()
+    served = []
+    for qid in map(str, question_ids):
+        question = questions.get(qid)
+        if question is None:
+            continue
+        item = {field: question[field] for field in SERVED_FIELDS if field in question}
+        # A question counts as a review once its card has been reviewed
+        item.update({'_id': qid, 'id': qid, 'is_review': ObjectId(qid) in reviewed})
+        served.append(item)
+    return served
@@ -1,21 +1,141 @@
 import os
+import asyncio
+import threading
+import time
+import httpx
 import replicate
-import itertools
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, Optional
 import logging
 from dotenv import load_dotenv
-import re
+from flask import current_app
+from utils.explanation_formatter import ExplanationFormatter, format_explanation, iter_formatted
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'))
 
 logger = logging.getLogger(__name__)
 
+# Deadlines for Replicate calls: connect/read apply per HTTP operation (a
+# stalled stream fails after the read timeout), total bounds a whole generation
+CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT_SECONDS', 5))
+READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT_SECONDS', 30))
+TOTAL_TIMEOUT = float(os.environ.get('LLM_TOTAL_TIMEOUT_SECONDS', 90))
+MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 20))
+
+_llm_lock = threading.Lock()
+
+class LLMTimeoutError(TimeoutError):
+    """A generation did not finish within the total deadline."""
+
 class LLMHelper:
-    def __init__(self):
-        self.api_token = os.environ.get('REPLICATE_API_TOKEN')
+    """Replicate-backed explanation and follow-up generation.
+
+    One instance per worker (get_llm) keeps pooled keep-alive connections to
+    Replicate. Predictions that stop being consumed early (client disconnect,
+    deadline, task cancellation) are canceled upstream so they stop generating.
+    The async API uses its own pool and should be driven from one event loop.
+    """
+
+    def __init__(self, api_token: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: Optional[httpx.Timeout] = None, total_timeout: float = TOTAL_TIMEOUT,
+                 max_connections: int = MAX_CONNECTIONS):
+        self.api_token = api_token or os.environ.get('REPLICATE_API_TOKEN')
         if not self.api_token:
             raise ValueError("REPLICATE_API_TOKEN environment variable is not set")
+        self.base_url = base_url
+        self.timeout = timeout or httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+        self.total_timeout = total_timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> replicate.Client:
+        """Replicate client over a pooled httpx.Client, built on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    client = replicate.Client(self.api_token, base_url=self.base_url, timeout=self.timeout,
+                                              transport=httpx.HTTPTransport(limits=self.limits))
+                    client._client  # open the pool here rather than racing in request threads
+                    self._client = client
+        return self._client
+
+    @property
+    def async_client(self) -> replicate.Client:
+        """Replicate client over a pooled httpx.AsyncClient, built on first use."""
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = replicate.Client(self.api_token, base_url=self.base_url, timeout=self.timeout,
+                                                          transport=httpx.AsyncHTTPTransport(limits=self.limits))
+        return self._async_client
+
+    def close(self):
+        if self._client is not None:
+            self._client._client.close()
+            self._client = None
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client._async_client.aclose()
+            self._async_client = None
+
+    def _stream(self, model: str, input: Dict[str, Any]) -> Iterator[str]:
+        """Output text of a streamed prediction, canceled upstream if not read to the end."""
+        deadline = time.monotonic() + self.total_timeout
+        prediction = self.client.models.predictions.create(model=model, input=input, stream=True)
+        finished = False
+        try:
+            for event in prediction.stream():
+                if time.monotonic() > deadline:
+                    raise LLMTimeoutError(f"{model} did not finish within {self.total_timeout}s")
+                text = str(event)
+                if text:
+                    yield text
+            finished = True
+        finally:
+            if not finished:
+                self._cancel(prediction)
+
+    def _cancel(self, prediction):
+        try:
+            prediction.cancel()
+        except Exception as e:
+            logger.warning(f"Failed to cancel prediction {prediction.id}: {str(e)}")
+
+    async def _astream(self, model: str, input: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async _stream; cancelling the consuming task cancels the prediction."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.total_timeout
+        try:
+            prediction = await asyncio.wait_for(
+                self.async_client.models.predictions.async_create(model=model, input=input, stream=True),
+                self.total_timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"{model} did not start within {self.total_timeout}s")
+        events = prediction.async_stream().__aiter__()
+        finished = False
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise LLMTimeoutError(f"{model} did not finish within {self.total_timeout}s")
+                text = str(event)
+                if text:
+                    yield text
+            finished = True
+        finally:
+            await events.aclose()
+            if not finished:
+                try:
+                    await prediction.async_cancel()
+                except Exception as e:
+                    logger.warning(f"Failed to cancel prediction {prediction.id}: {str(e)}")
 
     def generate_explanation(self, question_data: Dict[str, Any]) -> str:
         """Generate explanation for a math question using Replicate's Llama model."""
@@ -25,15 +145,62 @@ class LLMHelper:
             
             # Call Replicate API
             output = ""
-            for event in replicate.stream(
-                "openai/gpt-4o-mini",
-                input={
-                    "top_k": 0,
-                    "top_p": 0.9,
-                    "prompt": prompt,
-                    "max_tokens": 1024,
-                    "temperature": 0.7,
-                    "system_prompt": """你是一位專業的數學老師，負責指導學生理解他們的錯誤並提供詳細的解釋。
+            for event in self._explanation_events(prompt):
+                output += event
+            
+            # Post-process the output to ensure proper formatting
+            processed_output = self._process_explanation(output.strip())
+            return processed_output
+        except Exception as e:
+            logger.error(f"Error generating explanation: {str(e)}")
+            raise
+
+    def stream_explanation(self, question_data: Dict[str, Any]) -> Iterator[str]:
+        """Yield the formatted explanation piece by piece as the model produces it.
+
+        Joined together, the pieces equal generate_explanation's result.
+        """
+        try:
+            prompt = self._create_prompt(question_data)
+            yield from self._format_stream(self._explanation_events(prompt))
+        except Exception as e:
+            logger.error(f"Error streaming explanation: {str(e)}")
+            raise
+
+    async def astream_explanation(self, question_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async stream_explanation: the same pieces, from the async pool."""
+        try:
+            prompt = self._create_prompt(question_data)
+            formatter = ExplanationFormatter()
+            emitted = False
+            async for event in self._astream("openai/gpt-4o-mini", self._explanation_input(prompt)):
+                lines = formatter.feed(event)
+                if lines:
+                    yield ('\n' if emitted else '') + '\n'.join(lines)
+                    emitted = True
+            lines = formatter.close()
+            if lines:
+                yield ('\n' if emitted else '') + '\n'.join(lines)
+        except Exception as e:
+            logger.error(f"Error streaming explanation: {str(e)}")
+            raise
+
+    def _format_stream(self, events: Iterable) -> Iterator[str]:
+        """Format streamed output line by line; see utils.explanation_formatter."""
+        return iter_formatted(events)
+
+    def _explanation_events(self, prompt: str) -> Iterator[str]:
+        """Raw output events for an explanation prompt."""
+        return self._stream("openai/gpt-4o-mini", self._explanation_input(prompt))
+
+    def _explanation_input(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "top_k": 0,
+            "top_p": 0.9,
+            "prompt": prompt,
+            "max_tokens": 1024,
+            "temperature": 0.7,
+            "system_prompt": """你是一位專業的數學老師，負責指導學生理解他們的錯誤並提供詳細的解釋。
 
 請嚴格遵循以下排版與數學格式規範：
 
@@ -89,24 +256,15 @@ class LLMHelper:
 * 類題提示（條列）。
 
 請嚴格按照以上格式要求撰寫解答，切勿使用雙 $$ 或 \\[...\\] 格式，亦不得使用需要顯示模式的環境。每段文字與每個步驟標題前後都必須有空行。""",
-                    "presence_penalty": 1.15,
-                }
-            ):
-                output += str(event)
-            
-            # Post-process the output to ensure proper formatting
-            processed_output = self._process_explanation(output.strip())
-            return processed_output
-        except Exception as e:
-            logger.error(f"Error generating explanation: {str(e)}")
-            raise
+            "presence_penalty": 1.15,
+        }
 
     def generate_followup(self, ctx: Dict[str, Any]) -> str:
         """Generate a concise, step-focused follow-up reply based on prior explanation and user question."""
         try:
             prompt = self._create_followup_prompt(ctx)
             output = ""
-            for event in replicate.stream(
+            for event in self._stream(
                 "meta/meta-llama-3-70b-instruct",
                 input={
                     "top_k": 0,
@@ -127,7 +285,7 @@ class LLMHelper:
                     "presence_penalty": 1.0,
                 }
             ):
-                output += str(event)
+                output += event
 
             # Reuse formatting cleanup (lists, inline math normalization)
             processed = self._process_explanation(output.strip())
@@ -136,84 +294,9 @@ class LLMHelper:
             logger.error(f"Error generating follow-up: {str(e)}")
             raise
 
-    def _sanitize_display_envs(self, text: str) -> str:
-        """Convert display-mode environments (align/equation/etc.) into bullet lists with inline math."""
-        def replace_env(match):
-            env = match.group(1)
-            body = match.group(2)
-            # Split by LaTeX line breaks \\ and newlines
-            parts = re.split(r"\\\\\s*|\n+", body)
-            bullets: List[str] = []
-            for p in parts:
-                s = p.strip()
-                if not s:
-                    continue
-                # Remove alignment markers like & and trailing commas
-                s = s.replace('&', ' ')
-                s = re.sub(r"\s+", " ", s).strip()
-                # Remove enclosing $ if mistakenly present
-                if s.startswith('$') and s.endswith('$') and len(s) > 2:
-                    s = s[1:-1].strip()
-                bullets.append(f"* ${s}$")
-            return "\n".join(bullets) if bullets else ''
-
-        # Handle a set of common display environments
-        envs = [
-            'align\*?', 'aligned', 'equation\*?', 'gather\*?', 'multline\*?', 'split', 'array'
-        ]
-        for env in envs:
-            pattern = re.compile(rf"\\begin\{{({env})\}}([\s\S]*?)\\end\{{\1\}}", re.IGNORECASE)
-            text = pattern.sub(replace_env, text)
-        return text
-
     def _process_explanation(self, text: str) -> str:
         """Process the explanation to ensure proper formatting."""
-        # First, sanitize display-mode environments
-        text = self._sanitize_display_envs(text)
-        # Normalize newlines and strip trailing spaces
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
-        lines = text.split('\n')
-        processed_lines: List[str] = []
-
-        for i, raw in enumerate(lines):
-            line = raw.strip()
-
-            # Normalize block math to inline math
-            if '$$' in line:
-                line = line.replace('$$', '$')
-            if '\\[' in line or '\\]' in line:
-                line = line.replace('\\[', '$').replace('\\]', '$')
-
-            # Insert blank line before step headers (if previous non-empty exists)
-            if line.startswith('**步驟'):
-                if processed_lines and processed_lines[-1] != '':
-                    processed_lines.append('')
-                processed_lines.append(line)
-                # Ensure a blank line after the header as well
-                processed_lines.append('')
-                continue
-
-            # Convert lines starting with bullets to bullet items (keep as-is; frontend renders lists)
-            if line.startswith('* ') or line.startswith('- '):
-                processed_lines.append(line)
-                continue
-
-            # Add spaces around inline math markers to avoid sticking to CJK words
-            if '$' in line:
-                line = line.replace('$(', ' $(').replace(')$', ')$ ')
-                line = line.replace('$', ' $ ')  # simple spacing
-                line = ' '.join(line.split())
-
-            processed_lines.append(line)
-
-        # Collapse multiple blank lines to single
-        compact: List[str] = []
-        for s in processed_lines:
-            if s == '' and (not compact or compact[-1] == ''):
-                continue
-            compact.append(s)
-
-        return '\n'.join(compact).strip()
+        return format_explanation(text)
 
     def _create_prompt(self, data: Dict[str, Any]) -> str:
         """Create a structured prompt for the LLM."""
@@ -278,19 +361,17 @@ class LLMHelper:
         is_correct = ctx.get('is_correct', False)
         step_key = (ctx.get('follow_up') or {}).get('step_key')
         user_msg = (ctx.get('follow_up') or {}).get('message') or ''
-        explanation_text = (ctx.get('explanation_text') or '')
+        # Explanation, history and summary arrive already fitted to the token
+        # budget (utils/chat_context.py)
+        expl_snippet = (ctx.get('explanation_text') or '').strip()
         history = ctx.get('history') or []
-
-        # Keep explanation short in prompt to save tokens
-        expl_snippet = explanation_text.strip()
-        if len(expl_snippet) > 1800:
-            expl_snippet = expl_snippet[:1800] + "\n...（已截斷）"
+        summary = (ctx.get('summary') or '').strip()
 
         def fmt_msg(m):
             role = m.get('role', 'user')
             content = (m.get('content') or '').strip()
             return f"[{role}] {content}"
-        history_block = "\n".join(fmt_msg(m) for m in history[-6:])  # last 6 turns
+        history_block = "\n".join(fmt_msg(m) for m in history)
 
         def opt_str(indices):
             return ", ".join(options[i] for i in indices if i < len(options))
@@ -306,7 +387,10 @@ class LLMHelper:
 是否答對：{'是' if is_correct else '否'}
 
 原先的解釋（供參考）：
-{expl_snippet}
+{expl_snippet if expl_snippet else '（無）'}
+
+較早對話摘要：
+{summary if summary else '（無）'}
 
 對話歷史（近幾輪）：
 {history_block if history_block else '（無）'}
@@ -321,3 +405,14 @@ class LLMHelper:
 - 最後以一行「下一步建議：...」結尾。
 """
         return prompt
+
+def get_llm() -> LLMHelper:
+    """The worker's shared LLMHelper, created on first use (after fork, so each worker has its own pool)."""
+    app = current_app._get_current_object()
+    llm = getattr(app, 'llm', None)
+    if llm is None:
+        with _llm_lock:
+            llm = getattr(app, 'llm', None)
+            if llm is None:
+                llm = app.llm = LLMHelper()
+    return llm
@@ -1,19 +1,145 @@
 import bcrypt
-from flask import jsonify, request
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from collections import OrderedDict
+from flask import jsonify, request, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
 from functools import wraps
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import logging
+import multiprocessing
+import threading
+import time
 from cryptography.fernet import Fernet
 import os
 
+# bcrypt cost for new hashes; stored hashes with another cost are rehashed at login
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+# Processes per web worker that run bcrypt (0 = hash on the request thread)
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+# Hashes a web worker may have queued or running; further requests wait for a slot
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 60))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('PRINCIPAL_CACHE_MAX_ENTRIES', 10000))
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+def _get_pool():
+    """Per-process hashing pool, created on first use (after gunicorn has forked the worker)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                # forkserver: forking a threaded worker directly could copy held locks
+                _pool = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context('forkserver')
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+def _run(fn, *args):
+    global _pool
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    with _pending:
+        try:
+            return _get_pool().submit(fn, *args).result()
+        except BrokenProcessPool:
+            logging.error("Password hashing pool broke; hashing on the request thread", exc_info=True)
+            _pool = None
+            return fn(*args)
+
 class PasswordManager:
     @staticmethod
-    def hash_password(password):
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    def hash_password(password, rounds=None):
+        return _run(_hash, password, rounds or BCRYPT_ROUNDS)
     @staticmethod
     def verify_password(password, hashed):
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        return _run(_verify, password, hashed)
+    @staticmethod
+    def needs_rehash(hashed):
+        """Whether a stored hash was made with a cost other than BCRYPT_ROUNDS."""
+        try:
+            return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+def access_token_claims(user):
+    """Claims embedded at login so require_role can authorize from the token."""
+    return {'role': user.role, 'ver': user.auth_version}
+
+class PrincipalCache:
+    """Per-worker TTL cache of user_id -> (role, auth_version) as stored in the database.
+
+    An entry answers for tokens carrying its version stamp or an older one
+    (which require_role then rejects without a database read); a token issued
+    after a role change carries a newer stamp and bypasses it at once.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (role, version, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, user_id: str, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < version or entry[2] <= time.monotonic():
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._stats['hits'] += 1
+            return entry
+
+    def put(self, user_id: str, role, version):
+        with self._lock:
+            self._entries[user_id] = (role, version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+def get_principal_cache() -> PrincipalCache:
+    """The app's PrincipalCache (created on first use if the app factory did not set one)."""
+    app = current_app._get_current_object()
+    principals = getattr(app, 'principal_cache', None)
+    if principals is None:
+        principals = app.principal_cache = PrincipalCache()
+    return principals
+
+def _principal(user_id: str, claims: dict):
+    """(role, auth_version) for the token's user; no database read while a cache entry
+    at least as new as the token is fresh."""
+    principals = get_principal_cache()
+    version = claims.get('ver', 0)
+    entry = principals.get(user_id, version)
+    if entry is not None:
+        return entry[0], entry[1]
+    from models.user import User
+    user = User.get_by_id(user_id, view='role')
+    if not user:
+        principals.invalidate(user_id)
+        return None, None
+    principals.put(user_id, user.role, user.auth_version)
+    return user.role, user.auth_version
 
 # Role-based access control
 def require_role(required_role):
@@ -21,10 +147,14 @@ def require_role(required_role):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            from models.user import User
-            user = User.get_by_id(user_id)
-            if not user or user.role != required_role:
+            claims = get_jwt()
+            # Any role change bumps the version, so a token can at most authorize
+            # the role it was minted with: reject others before any lookup
+            if 'role' in claims and claims['role'] != required_role:
+                return jsonify({'error': 'Insufficient permissions'}), 403
+            role, version = _principal(get_jwt_identity(), claims)
+            # A token minted before the user's last role change no longer authorizes
+            if role != required_role or version != claims.get('ver', 0):
                 return jsonify({'error': 'Insufficient permissions'}), 403
             return f(*args, **kwargs)
         return decorated_function
@@ -0,0 +1,236 @@
+"""
+Lesson session state for /api/lessons/start, /next and /submit.
+
+A session is an immutable question queue plus an integer cursor, so no step
+grows a document with the length of the lesson:
+
+- create() writes the queue once.
+- next() moves the cursor past up to K questions, returns only their ids and
+  sets completed once the cursor reaches the end of the queue; the session's
+  user is part of the match, so a session can only be advanced by its owner.
+- record_answer() appends to a separate list capped at LESSON_SESSION_MAX_ANSWERS
+  and sets last_answer_time/last_answer_correct.
+
+Backends (LESSON_SESSION_STORE=mongo|redis, default mongo; redis needs REDIS_URL):
+
+- MongoSessionStore: lesson_sessions documents
+  {session_id, user_id, selected_categories, type, questions, cursor, total,
+  completed, created_at, updated_at}; answers live in lesson_session_answers
+  {_id: session_id, answers, last_answer_time, last_answer_correct}. Sessions
+  stored in the old layout (available_questions/used_questions) are converted
+  on their next step. next() reads the cursor, then moves it with an update
+  conditional on that cursor whose projection `$slice`s just the served ids
+  out of the queue (retried if another request moved the cursor first).
+- RedisSessionStore: hash `lw:lesson:<id>` (metadata and cursor) and lists
+  `lw:lesson:<id>:queue` / `lw:lesson:<id>:answers`, expiring after
+  LESSON_SESSION_TTL_SECONDS of inactivity. A Lua script advances the cursor.
+
+Answers are also written to lesson_reports by the submit pipeline, which stays
+the permanent record.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import List, Optional
+from flask import current_app
+from pymongo import ReturnDocument
+from bson import json_util
+from utils.database import get_db
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MAX_ANSWERS = int(os.environ.get('LESSON_SESSION_MAX_ANSWERS', 50))
+REDIS_TTL_SECONDS = int(os.environ.get('LESSON_SESSION_TTL_SECONDS', 86400))
+
+SessionStep = namedtuple('SessionStep', ['question_ids', 'remaining'])
+
+class MongoSessionStore:
+    name = 'mongo'
+
+    def __init__(self, sessions: str = 'lesson_sessions', answers: str = 'lesson_session_answers'):
+        self.sessions_name = sessions
+        self.answers_name = answers
+
+    def _sessions(self):
+        return get_db()[self.sessions_name]
+
+    def _answers(self):
+        return get_db()[self.answers_name]
+
+    def create(self, session_id: str, user_id: str, question_ids: List[str], **meta):
+        now = datetime.now(timezone.utc)
+        self._sessions().insert_one({
+            'session_id': session_id,
+            'user_id': user_id,
+            **meta,
+            'questions': list(question_ids),
+            'cursor': 0,
+            'total': len(question_ids),
+            'completed': not question_ids,
+            'created_at': now,
+            'updated_at': now
+        })
+
+    def get(self, session_id: str) -> Optional[dict]:
+        """Session metadata without the queue."""
+        return self._sessions().find_one({'session_id': session_id}, {'questions': 0, '_id': 0})
+
+    def next(self, session_id: str, user_id: str, count: int) -> Optional[SessionStep]:
+        """Advance past up to `count` questions; None if the user has no such session."""
+        match = {'session_id': session_id, 'user_id': user_id, 'questions': {'$exists': True}}
+        while True:
+            state = self._sessions().find_one(match, {'cursor': 1, 'total': 1})
+            if state is None:
+                if not self._upgrade(session_id, user_id):
+                    return None
+                continue
+            cursor, total = state['cursor'], state['total']
+            stop = max(cursor, min(cursor + count, total))
+            projection = {'cursor': 1}
+            if stop > cursor:
+                projection['questions'] = {'$slice': [cursor, stop - cursor]}
+            served = self._sessions().find_one_and_update(
+                {'_id': state['_id'], 'cursor': cursor},
+                {'$set': {'cursor': stop, 'completed': stop >= total,
+                          'updated_at': datetime.now(timezone.utc)}},
+                projection=projection,
+                return_document=ReturnDocument.AFTER
+            )
+            if served is not None:
+                return SessionStep(served.get('questions', []), max(0, total - stop))
+            # Another request moved the cursor in between; serve from where it left it
+
+    def _upgrade(self, session_id: str, user_id: str) -> bool:
+        """Convert a session stored as available_questions/used_questions to queue + cursor."""
+        legacy = self._sessions().find_one(
+            {'session_id': session_id, 'user_id': user_id, 'questions': {'$exists': False}},
+            {'available_questions': 1}
+        )
+        if legacy is None:
+            return False
+        remaining = legacy.get('available_questions') or []
+        self._sessions().update_one(
+            {'_id': legacy['_id'], 'questions': {'$exists': False}},
+            {'$set': {'questions': remaining, 'cursor': 0, 'total': len(remaining),
+                      'completed': not remaining},
+             '$unset': {'available_questions': '', 'used_questions': '', 'answers': ''}}
+        )
+        return True
+
+    def record_answer(self, session_id: str, answer: dict):
+        self._answers().update_one(
+            {'_id': session_id},
+            {'$push': {'answers': {'$each': [answer], '$slice': -MAX_ANSWERS}},
+             '$set': {'last_answer_time': answer['timestamp'], 'last_answer_correct': answer['correct']}},
+            upsert=True
+        )
+
+    def answers(self, session_id: str) -> List[dict]:
+        doc = self._answers().find_one({'_id': session_id}, {'answers': 1})
+        return (doc or {}).get('answers', [])
+
+# Advance the cursor of KEYS[1] (hash) over KEYS[2] (queue) if ARGV[1] owns it
+_NEXT_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'user_id') ~= ARGV[1] then
+    return false
+end
+local cursor = tonumber(redis.call('HGET', KEYS[1], 'cursor'))
+local total = redis.call('LLEN', KEYS[2])
+local stop = math.min(cursor + tonumber(ARGV[2]), total)
+redis.call('HSET', KEYS[1], 'cursor', stop, 'completed', stop >= total and 1 or 0)
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], ARGV[3])
+end
+local ids = {}
+if stop > cursor then
+    ids = redis.call('LRANGE', KEYS[2], cursor, stop - 1)
+end
+return {total - stop, ids}
+"""
+
+class RedisSessionStore:
+    name = 'redis'
+
+    def __init__(self, client, prefix: str = 'lw:lesson', ttl: int = REDIS_TTL_SECONDS):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._next = client.register_script(_NEXT_SCRIPT)
+
+    def _keys(self, session_id: str):
+        base = f"{self.prefix}:{session_id}"
+        return base, f"{base}:queue", f"{base}:answers"
+
+    def create(self, session_id: str, user_id: str, question_ids: List[str], **meta):
+        meta_key, queue_key, _ = self._keys(session_id)
+        now = datetime.now(timezone.utc)
+        fields = {
+            'user_id': user_id,
+            'cursor': 0,
+            'total': len(question_ids),
+            'completed': int(not question_ids),
+            'meta': json_util.dumps({**meta, 'created_at': now}),
+        }
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(meta_key, mapping=fields)
+        if question_ids:
+            pipe.rpush(queue_key, *question_ids)
+        pipe.expire(meta_key, self.ttl)
+        pipe.expire(queue_key, self.ttl)
+        pipe.execute()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        fields = self.client.hgetall(self._keys(session_id)[0])
+        if not fields:
+            return None
+        fields = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+                  for k, v in fields.items()}
+        return {
+            'session_id': session_id,
+            'user_id': fields['user_id'],
+            'cursor': int(fields['cursor']),
+            'total': int(fields['total']),
+            **json_util.loads(fields.get('meta') or '{}'),
+            'completed': fields.get('completed') == '1'
+        }
+
+    def next(self, session_id: str, user_id: str, count: int) -> Optional[SessionStep]:
+        result = self._next(keys=list(self._keys(session_id)), args=[user_id, count, self.ttl])
+        if not result:
+            return None
+        remaining, ids = result
+        return SessionStep([i.decode() if isinstance(i, bytes) else i for i in ids], int(remaining))
+
+    def record_answer(self, session_id: str, answer: dict):
+        meta_key, _, answers_key = self._keys(session_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(answers_key, json_util.dumps(answer))
+        pipe.ltrim(answers_key, -MAX_ANSWERS, -1)
+        pipe.expire(answers_key, self.ttl)
+        pipe.hset(meta_key, mapping={
+            'last_answer_time': answer['timestamp'].isoformat(),
+            'last_answer_correct': int(answer['correct'])
+        })
+        pipe.execute()
+
+    def answers(self, session_id: str) -> List[dict]:
+        return [json_util.loads(item) for item in self.client.lrange(self._keys(session_id)[2], 0, -1)]
+
+def make_session_store(app):
+    backend = os.environ.get('LESSON_SESSION_STORE', 'mongo').lower()
+    client = getattr(app, 'redis', None)
+    if backend == 'redis':
+        if client is not None:
+            return RedisSessionStore(client)
+        logger.warning("LESSON_SESSION_STORE=redis but REDIS_URL is not set; using MongoDB")
+    return MongoSessionStore()
+
+def get_session_store():
+    """The app's session store (created on first use if the app factory did not set one)."""
+    app = current_app._get_current_object()
+    store = getattr(app, 'session_store', None)
+    if store is None:
+        store = app.session_store = make_session_store(app)
+    return store
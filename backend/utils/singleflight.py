@@ -0,0 +1,232 @@
+"""
+Request coalescing ("singleflight") for expensive, cacheable work.
+
+When a class gets the same question wrong at once, every student asks
+/api/lessons/explain for the same explanation cache key. SingleFlight lets one
+request per key generate while the others wait for its result:
+
+- Within a worker, followers wait on the leader's in-memory flight and get its
+  result directly.
+- Across workers, the leader holds a lease per key: `SET NX EX` in Redis when
+  REDIS_URL is set, otherwise a document in the flight_leases collection
+  (unique _id, TTL index on expires_at). Followers in other workers poll a
+  lookup (the explanation caches) until the result appears or the lease goes
+  away.
+- Leases expire after SINGLEFLIGHT_LEASE_SECONDS, so a crashed leader only
+  delays the others. Followers give up after SINGLEFLIGHT_WAIT_SECONDS and do
+  the work themselves; lease store errors are logged and treated as acquired,
+  so coalescing can never fail a request.
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from flask import current_app
+from pymongo.errors import DuplicateKeyError
+from utils.database import get_db
+import threading
+import logging
+import time
+import uuid
+import os
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = int(os.environ.get('SINGLEFLIGHT_LEASE_SECONDS', 90))
+WAIT_SECONDS = float(os.environ.get('SINGLEFLIGHT_WAIT_SECONDS', 60))
+POLL_INTERVAL = 0.2      # first poll delay for remote followers, doubled up to
+MAX_POLL_INTERVAL = 1.0  # this cap
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class RedisLeaseStore:
+    name = 'redis'
+
+    def __init__(self, client, prefix: str = 'lw:lease'):
+        self.client = client
+        self.prefix = prefix
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def acquire(self, key: str, token: str, ttl: int) -> bool:
+        return bool(self.client.set(f"{self.prefix}:{key}", token, nx=True, ex=ttl))
+
+    def held(self, key: str) -> bool:
+        return bool(self.client.exists(f"{self.prefix}:{key}"))
+
+    def release(self, key: str, token: str):
+        self._release(keys=[f"{self.prefix}:{key}"], args=[token])
+
+class MongoLeaseStore:
+    """Lease documents {_id: key, token, expires_at}; expired leases can be taken over."""
+
+    name = 'mongo'
+
+    def __init__(self, collection_name: str = 'flight_leases'):
+        self.collection_name = collection_name
+
+    def _collection(self):
+        return get_db()[self.collection_name]
+
+    def acquire(self, key: str, token: str, ttl: int) -> bool:
+        now = datetime.utcnow()
+        lease = {'token': token, 'expires_at': now + timedelta(seconds=ttl)}
+        collection = self._collection()
+        try:
+            collection.insert_one({'_id': key, **lease})
+            return True
+        except DuplicateKeyError:
+            result = collection.update_one({'_id': key, 'expires_at': {'$lte': now}}, {'$set': lease})
+            return result.modified_count == 1
+
+    def held(self, key: str) -> bool:
+        return self._collection().count_documents(
+            {'_id': key, 'expires_at': {'$gt': datetime.utcnow()}}, limit=1) > 0
+
+    def release(self, key: str, token: str):
+        self._collection().delete_one({'_id': key, 'token': token})
+
+class Flight:
+    """A leader's claim on a key; set `result` before release() to hand it to local followers."""
+
+    def __init__(self, group: 'SingleFlight', key: str, token: Optional[str]):
+        self.group = group
+        self.key = key
+        self.token = token
+        self.result = None
+        self.done = threading.Event()
+
+    def release(self):
+        self.group._finish(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+class SingleFlight:
+    def __init__(self, store, lease_seconds: int = LEASE_SECONDS, wait_seconds: float = WAIT_SECONDS):
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {'leads': 0, 'local_waits': 0, 'remote_waits': 0, 'coalesced': 0, 'errors': 0}
+
+    @classmethod
+    def for_app(cls, app) -> 'SingleFlight':
+        client = getattr(app, 'redis', None)
+        return cls(RedisLeaseStore(client) if client is not None else MongoLeaseStore())
+
+    def _count(self, field: str):
+        with self._lock:
+            self._stats[field] += 1
+
+    def try_lead(self, key: str) -> Optional[Flight]:
+        """A Flight if this request should do the work for `key`, or None if another is."""
+        with self._lock:
+            if key in self._flights:
+                return None
+            flight = self._flights[key] = Flight(self, key, uuid.uuid4().hex)
+        try:
+            acquired = self.store.acquire(key, flight.token, self.lease_seconds)
+        except Exception as e:
+            logger.warning(f"Lease acquire failed for {key}: {e}")
+            self._count('errors')
+            flight.token = None
+            acquired = True
+        if not acquired:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+            return None
+        self._count('leads')
+        return flight
+
+    def _finish(self, flight: Flight):
+        if flight.done.is_set():
+            return
+        if flight.token is not None:
+            try:
+                self.store.release(flight.key, flight.token)
+            except Exception as e:
+                logger.warning(f"Lease release failed for {flight.key}: {e}")
+                self._count('errors')
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.done.set()
+
+    def wait(self, key: str, lookup: Callable, timeout: Optional[float] = None):
+        """Wait for the current leader of `key`; its result, or None if it finished without one."""
+        deadline = time.monotonic() + (self.wait_seconds if timeout is None else timeout)
+        with self._lock:
+            flight = self._flights.get(key)
+        if flight is not None:
+            self._count('local_waits')
+            flight.done.wait(max(0.0, deadline - time.monotonic()))
+            result = flight.result if flight.result is not None else lookup()
+        else:
+            self._count('remote_waits')
+            result = self._poll(key, lookup, deadline)
+        if result is not None:
+            self._count('coalesced')
+        return result
+
+    def _poll(self, key: str, lookup: Callable, deadline: float):
+        interval = POLL_INTERVAL
+        while True:
+            result = lookup()
+            if result is not None:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                if not self.store.held(key):
+                    return lookup()
+            except Exception as e:
+                logger.warning(f"Lease check failed for {key}: {e}")
+                self._count('errors')
+                return None
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    def do(self, key: str, fn: Callable, lookup: Callable):
+        """fn() for `key`, unless a concurrent call's result can be shared.
+
+        `lookup` returns the stored result (or None) and is how followers in other
+        workers see the leader's result, so fn must store what it returns.
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            flight = self.try_lead(key)
+            if flight is not None:
+                with flight:
+                    flight.result = fn()
+                return flight.result
+            result = self.wait(key, lookup, deadline - time.monotonic())
+            if result is not None:
+                return result
+        logger.warning(f"Gave up waiting for {key}; running uncoalesced")
+        return fn()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+        stats['store'] = self.store.name
+        return stats
+
+def get_singleflight() -> SingleFlight:
+    """The app's SingleFlight (created on first use if the app factory did not set one)."""
+    app = current_app._get_current_object()
+    flights = getattr(app, 'singleflight', None)
+    if flights is None:
+        flights = app.singleflight = SingleFlight.for_app(app)
+    return flights
@@ -0,0 +1,174 @@
+"""
+Answer submission pipeline for POST /api/lessons/submit.
+
+The route used to issue its Mongo calls one after another (question, session,
+card find + insert, user stats, card save, session push, report insert and two
+user updates). The pipeline groups them into two stages:
+
+1. load():   question, session, FSRS card and user stats are read concurrently
+2. commit(): the card save, the session's answer, the lesson_reports row and
+             the user stats update are issued concurrently
+
+The longest of the commit writes is the card save, which runs its follow-up
+writes one after another: the card's find_one_and_update, the due histogram
+move (plus an $unset when a day empties), the Redis due counter when
+configured and one user_progress upsert per touched category. A submission
+therefore waits for the load round plus that chain, roughly four to five
+sequential hops, instead of the nine or ten of the old route.
+Multi-document transactions would need a replica set, which the dev setup
+does not have, so the writes stay independent and idempotent where possible.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+from flask import current_app
+from bson import ObjectId
+from models.fsrs_card import FSRSCard, _normalize_id
+from models.question_bank import QuestionBank
+from utils.session_store import get_session_store
+import threading
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Lazily create the per-process I/O pool (after gunicorn has forked)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get('SUBMIT_IO_THREADS', 8)),
+                    thread_name_prefix='submit-io'
+                )
+    return _executor
+
+@dataclass
+class SubmitContext:
+    user_id: str
+    session_id: str
+    question_id: str
+    question: Optional[dict]
+    session: Optional[dict]
+    card: FSRSCard
+    user_stats: dict
+    scheduler_profile: dict
+
+class SubmitPipeline:
+    def __init__(self, db):
+        self.db = db
+        self.app = current_app._get_current_object()
+        self.sessions = get_session_store()
+
+    def _submit(self, fn, *args, **kwargs):
+        app = self.app
+
+        def run():
+            # Model helpers call get_db(), which needs an app context in the worker thread
+            with app.app_context():
+                return fn(*args, **kwargs)
+        return _get_executor().submit(run)
+
+    def load(self, user_id: str, session_id: str, question_id: str) -> SubmitContext:
+        """Fetch everything the submission needs in one concurrent round."""
+        db = self.db
+        futures = {
+            'question': self._submit(QuestionBank.get, question_id, db),  # in-memory hit, no round trip
+            'session': self._submit(self.sessions.get, session_id),
+            'card': self._submit(db.fsrs_cards.find_one, {
+                'user_id': _normalize_id(user_id),
+                'question_id': _normalize_id(question_id)
+            }),
+            'user': self._submit(
+                db.users.find_one,
+                {'_id': ObjectId(user_id)},
+                {'stats': 1, 'scheduler_profile': 1}
+            ),
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+        user_doc = results['user'] or {}
+        card_doc = results['card']
+        # A missing card is only built in memory; commit() upserts it with the review result
+        card = FSRSCard._from_dict(card_doc) if card_doc else FSRSCard(user_id=user_id, question_id=question_id)
+
+        return SubmitContext(
+            user_id=user_id,
+            session_id=session_id,
+            question_id=question_id,
+            question=results['question'],
+            session=results['session'],
+            card=card,
+            user_stats=user_doc.get('stats') or {},
+            scheduler_profile=user_doc.get('scheduler_profile') or {}
+        )
+
+    def commit(self, ctx: SubmitContext, card: FSRSCard, is_correct: bool,
+               answer_indices: List[int], response_time: float):
+        """Persist the reviewed card, session answer, report row and user stats concurrently."""
+        db = self.db
+        now = datetime.now(timezone.utc)
+
+        # Fields the user_progress rollup and due queries are keyed on; FSRSCard.save applies the change
+        card.denormalize_question(ctx.question)
+        card.ever_correct = card.ever_correct or is_correct
+
+        answer = {
+            'question_id': ctx.question_id,
+            'answer': answer_indices,
+            'correct': is_correct,
+            'response_time': response_time,
+            'timestamp': now
+        }
+
+        report = {
+            'user_id': ObjectId(ctx.user_id),
+            'session_id': ctx.session_id,
+            'question_id': ObjectId(ctx.question_id),
+            'is_correct': is_correct,
+            'selected_indices': answer_indices,
+            'response_time': response_time,
+            'timestamp': now
+        }
+
+        # $inc creates missing counters, so the old "initialize stats" update is folded in here
+        if is_correct:
+            user_update = {
+                '$inc': {
+                    'stats.total_questions': 1,
+                    'stats.correct_answers': 1,
+                    'stats.current_streak': 1
+                }
+            }
+        else:
+            user_update = {
+                '$inc': {
+                    'stats.total_questions': 1,
+                    'stats.correct_answers': 0
+                },
+                '$set': {
+                    'stats.current_streak': 0  # Reset streak on incorrect answer
+                }
+            }
+
+        futures = {
+            'card': self._submit(card.save),
+            'session': self._submit(self.sessions.record_answer, ctx.session_id, answer),
+            'report': self._submit(db.lesson_reports.insert_one, report),
+            'user': self._submit(db.users.update_one, {'_id': ObjectId(ctx.user_id)}, user_update),
+        }
+
+        try:
+            futures['report'].result()
+        except Exception as e:
+            logger.warning(f"Failed to write lesson report: {e}")
+
+        # Surface the first failure of a required write to the route
+        for name in ('card', 'session', 'user'):
+            futures[name].result()
@@ -1,8 +1,11 @@
 import api from './axios'
 
+const PREFETCH_COUNT = 5
+
 class LessonService {
   constructor() {
     this.api = api
+    this.prefetched = { sessionId: null, questions: [] }
   }
   async startLesson(data) {
     try {
@@ -34,20 +37,22 @@ class LessonService {
 
   async getNextQuestion(session_id) {
     try {
-      const res = await api.post('/lessons/next', { session_id })
-      console.log('Next question response:', res.data)
-
-      // Handle session completion
-      if (res.data.completed || res.data.message === 'Session complete') {
-        return { completed: true }
+      // Questions come in batches of PREFETCH_COUNT; serve from the buffer first
+      if (this.prefetched.sessionId !== session_id) {
+        this.prefetched = { sessionId: session_id, questions: [] }
       }
-
-      if (!res.data.question) {
-        return { completed: true }
+      if (!this.prefetched.questions.length) {
+        const res = await api.post('/lessons/next', { session_id, prefetch: PREFETCH_COUNT })
+        console.log('Next questions response:', res.data)
+
+        // Handle session completion
+        if (res.data.completed || res.data.message === 'Session complete' || !res.data.questions?.length) {
+          return { completed: true }
+        }
+        this.prefetched.questions = res.data.questions
       }
 
-      // Normalize the question ID and ensure it's a string
-      const question = res.data.question
+      const question = this.prefetched.questions.shift()
 
       // Normalize text field for legacy records
       if (!question.text && question.question_text) {
@@ -62,24 +67,24 @@ class LessonService {
       }
 
       // Ensure question type is set
-      if (!res.data.question.type) {
+      if (!question.type) {
         console.warn('Question type not set, defaulting to single')
-        res.data.question.type = 'single'
+        question.type = 'single'
       }
 
       // Validate type is either single or multiple
-      if (!['single', 'multiple'].includes(res.data.question.type)) {
-        console.error('Invalid question type:', res.data.question.type)
+      if (!['single', 'multiple'].includes(question.type)) {
+        console.error('Invalid question type:', question.type)
         throw new Error('Invalid question type received from server')
       }
 
       console.log('Processed question:', {
-        ...res.data.question,
-        type: res.data.question.type,
-        options: res.data.question.options.length
+        ...question,
+        type: question.type,
+        options: question.options.length
       })
 
-      return res.data
+      return { question }
     } catch (error) {
       console.error('Error getting next question:', error.response?.data || error)
       throw error
@@ -168,16 +173,59 @@ class LessonService {
     }
   }
 
-  async sendFollowUp({ questionId, selectedIndices, message, threadId, stepKey, history, explanation }) {
+  // Streams /lessons/explain/stream (SSE over fetch, since EventSource cannot POST).
+  // onDelta receives the explanation text so far; resolves with the final explanation.
+  async streamExplanation(questionId, selectedIndices, onDelta) {
+    const token = localStorage.getItem('token')
+    const res = await fetch(`${api.defaults.baseURL}/lessons/explain/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {})
+      },
+      body: JSON.stringify({ question_id: questionId, selected_indices: selectedIndices })
+    })
+    if (!res.ok || !res.body) {
+      const data = await res.json().catch(() => ({}))
+      throw new Error(data.message || data.error || '無法獲取解釋')
+    }
+
+    const reader = res.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let text = ''
+    for (;;) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      let sep
+      while ((sep = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, sep)
+        buffer = buffer.slice(sep + 2)
+        const event = (block.match(/^event: (.*)$/m) || [])[1]
+        const data = JSON.parse((block.match(/^data: (.*)$/m) || [])[1] || '{}')
+        if (event === 'delta') {
+          text += data.text
+          onDelta?.(text)
+        } else if (event === 'done') {
+          return { explanation: data.explanation }
+        } else if (event === 'error') {
+          throw new Error(data.message || data.error || '無法獲取解釋')
+        }
+      }
+    }
+    if (!text) throw new Error('No explanation received from server')
+    return { explanation: text }
+  }
+
+  async sendFollowUp({ questionId, selectedIndices, message, threadId, stepKey }) {
     try {
       const { data } = await api.post('/lessons/explain/chat', {
         question_id: questionId,
         selected_indices: selectedIndices,
         message,
         thread_id: threadId,
-        step_key: stepKey,
-        history,
-        explanation_text: explanation
+        step_key: stepKey
       })
       return data
     } catch (error) {
@@ -0,0 +1,91 @@
+"""
+Denormalize question fields onto existing FSRS cards.
+
+Skill-filtered due queries (FSRSHelper.get_due_cards / get_next_cards and the
+lesson composer) match on fsrs_cards.category and are served by the
+(user_id, category, due_date) index; /next-cards reports the card's
+question_difficulty. Cards created since these fields were added get them from
+FSRSCard.denormalize_question; this fills in the rest.
+
+Cards are walked in _id order in batches: each batch looks up its questions
+with one $in query and is written with one unordered bulk_write, so the run can
+be interrupted and resumed (--after <last _id printed>) at any point.
+
+Cards whose category changes here are counted under a different user_progress
+rollup afterwards, so when the script reports changed categories run
+scripts/backfill_user_progress.py as well:
+
+    python scripts/backfill_card_question_fields.py
+    python scripts/backfill_card_question_fields.py --batch-size 2000 --after <card id>
+"""
+
+import argparse
+import os
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+load_dotenv(dotenv_path='../.env')
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/innoserve-dev')
+
+CARD_FIELDS = {'question_id': 1, 'category': 1, 'question_difficulty': 1}
+
+def _question_fields(question):
+    difficulty = question.get('difficulty')
+    return {
+        'category': (question.get('category') or '').lower(),
+        'question_difficulty': difficulty if isinstance(difficulty, int) else None
+    }
+
+def backfill_batch(db, cards):
+    """Bring one batch of cards in line with their questions; returns (updated, categories changed)."""
+    question_ids = list({card['question_id'] for card in cards})
+    questions = {
+        q['_id']: _question_fields(q)
+        for q in db.questions.find({'_id': {'$in': question_ids}}, {'category': 1, 'difficulty': 1})
+    }
+    ops = []
+    recategorized = 0
+    for card in cards:
+        fields = questions.get(card['question_id'])
+        if fields is None:
+            continue  # question deleted; nothing to copy
+        if 'question_difficulty' in card and all(card.get(k) == v for k, v in fields.items()):
+            continue
+        if card.get('category') != fields['category']:
+            recategorized += 1
+        ops.append(UpdateOne({'_id': card['_id']}, {'$set': fields}))
+    if ops:
+        db.fsrs_cards.bulk_write(ops, ordered=False)
+    return len(ops), recategorized
+
+def backfill(db, batch_size=1000, after=None):
+    query = {'_id': {'$gt': ObjectId(after)}} if after else {}
+    scanned = updated = recategorized = 0
+    while True:
+        cards = list(db.fsrs_cards.find(query, CARD_FIELDS).sort('_id', 1).limit(batch_size))
+        if not cards:
+            break
+        changed, moved = backfill_batch(db, cards)
+        scanned += len(cards)
+        updated += changed
+        recategorized += moved
+        query = {'_id': {'$gt': cards[-1]['_id']}}
+        print(f"{scanned} cards scanned, {updated} updated (last _id {cards[-1]['_id']})")
+    print(f"Done: {updated} of {scanned} cards updated, {recategorized} changed category.")
+    if recategorized:
+        print("Run scripts/backfill_user_progress.py to rebuild the progress rollups.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--after', help='resume after this card _id')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGODB_URI)
+    try:
+        backfill(client.get_database(), args.batch_size, args.after)
+    finally:
+        client.close()
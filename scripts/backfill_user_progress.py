@@ -0,0 +1,120 @@
+"""
+Build user_progress rollups (per user and category) for existing data.
+
+For every user with FSRS cards this denormalizes the question category onto
+each card, marks cards whose question has a correct answer in lesson_reports
+as ever_correct, and replaces the user's rollup documents with totals computed
+from the cards. FSRSCard.save keeps them current afterwards.
+
+Run once after deploying the rollups, during low traffic (live updates that
+land while a user is being rebuilt are overwritten), or whenever
+/api/lessons/progress-summary drifts:
+
+    python scripts/backfill_user_progress.py            # all users
+    python scripts/backfill_user_progress.py --user <id>
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from models.user_progress import UserProgress
+
+load_dotenv(dotenv_path='../.env')
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/innoserve-dev')
+
+CARD_FIELDS = {
+    'question_id': 1, 'state': 1, 'stability': 1, 'difficulty': 1, 'reps': 1,
+    'lapses': 1, 'last_review': 1, 'category': 1, 'ever_correct': 1
+}
+
+def _rollup_document(user_id, category, inc, updated_at):
+    """Turn dotted $inc counters ('states.2': 3) into a full rollup document."""
+    doc = {'user_id': user_id, 'category': category, 'answered': 0, 'correct': 0,
+           'cards': 0, 'states': {}, 'stability_sum': {}, 'difficulty_sum': {},
+           'reps': 0, 'lapses': 0, 'updated_at': updated_at}
+    for field, value in inc.items():
+        if '.' in field:
+            parent, key = field.split('.', 1)
+            doc[parent][key] = value
+        else:
+            doc[field] = value
+    return doc
+
+def backfill_user(db, user_id, categories, run_started, batch_size):
+    correct_ids = set(db.lesson_reports.distinct('question_id', {'user_id': user_id, 'is_correct': True}))
+    card_ops = []
+    rollups = {}
+    for card in db.fsrs_cards.find({'user_id': user_id}, CARD_FIELDS).batch_size(batch_size):
+        category = categories.get(card['question_id'], '')
+        ever_correct = bool(card.get('ever_correct')) or card['question_id'] in correct_ids
+        if card.get('category') != category or card.get('ever_correct') != ever_correct:
+            card_ops.append(UpdateOne({'_id': card['_id']}, {'$set': {'category': category, 'ever_correct': ever_correct}}))
+            if len(card_ops) >= batch_size:
+                db.fsrs_cards.bulk_write(card_ops, ordered=False)
+                card_ops = []
+        card['category'] = category
+        card['ever_correct'] = ever_correct
+        inc = rollups.setdefault(category, {})
+        for field, value in UserProgress.card_contribution(card).items():
+            inc[field] = inc.get(field, 0) + value
+    if card_ops:
+        db.fsrs_cards.bulk_write(card_ops, ordered=False)
+
+    if rollups:
+        db.user_progress.bulk_write([
+            ReplaceOne(
+                {'user_id': user_id, 'category': category},
+                _rollup_document(user_id, category, inc, run_started),
+                upsert=True
+            )
+            for category, inc in rollups.items()
+        ], ordered=False)
+    # Categories the user no longer has cards in
+    db.user_progress.delete_many({'user_id': user_id, 'updated_at': {'$lt': run_started}})
+    return len(rollups)
+
+def backfill(db, user_id=None, batch_size=500):
+    run_started = datetime.now(timezone.utc)
+    categories = {
+        q['_id']: (q.get('category') or '').lower()
+        for q in db.questions.find({}, {'category': 1})
+    }
+    if user_id:
+        user_ids = [ObjectId(user_id)]
+    else:
+        user_ids = (doc['_id'] for doc in db.fsrs_cards.aggregate(
+            [{'$group': {'_id': '$user_id'}}], allowDiskUse=True
+        ))
+
+    users = 0
+    rollups = 0
+    for uid in user_ids:
+        rollups += backfill_user(db, uid, categories, run_started, batch_size)
+        users += 1
+
+    removed = 0
+    if not user_id:
+        # Users without any cards left
+        removed = db.user_progress.delete_many({'updated_at': {'$lt': run_started}}).deleted_count
+    print(f"Built {rollups} progress rollups for {users} users ({removed} stale removed).")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', help='only rebuild this user id')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    client = MongoClient(MONGODB_URI)
+    try:
+        backfill(client.get_database(), args.user, args.batch_size)
+    finally:
+        client.close()
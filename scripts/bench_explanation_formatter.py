@@ -0,0 +1,112 @@
+"""
+Time ExplanationFormatter against the multi-pass formatter it replaced.
+
+Runs over the recorded corpus in tests/data/explanation_corpus.json, checks
+that both produce the recorded output, then times whole-text formatting and
+chunked (streamed) formatting. No database or API token needed.
+
+    python scripts/bench_explanation_formatter.py --repeat 2000 --chunk-size 4
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils.explanation_formatter import format_explanation, iter_formatted
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), '../tests/data/explanation_corpus.json')
+
+def legacy_format(text):
+    """LLMHelper._process_explanation before the incremental formatter."""
+    def replace_env(match):
+        bullets = []
+        for p in re.split(r"\\\\\s*|\n+", match.group(2)):
+            s = p.strip()
+            if not s:
+                continue
+            s = s.replace('&', ' ')
+            s = re.sub(r"\s+", " ", s).strip()
+            if s.startswith('$') and s.endswith('$') and len(s) > 2:
+                s = s[1:-1].strip()
+            bullets.append(f"* ${s}$")
+        return "\n".join(bullets) if bullets else ''
+
+    for env in [r'align\*?', 'aligned', r'equation\*?', r'gather\*?', r'multline\*?', 'split', 'array']:
+        pattern = re.compile(rf"\\begin\{{({env})\}}([\s\S]*?)\\end\{{\1\}}", re.IGNORECASE)
+        text = pattern.sub(replace_env, text)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    processed_lines = []
+    for raw in text.split('\n'):
+        line = raw.strip()
+        if '$$' in line:
+            line = line.replace('$$', '$')
+        if '\\[' in line or '\\]' in line:
+            line = line.replace('\\[', '$').replace('\\]', '$')
+        if line.startswith('**步驟'):
+            if processed_lines and processed_lines[-1] != '':
+                processed_lines.append('')
+            processed_lines.append(line)
+            processed_lines.append('')
+            continue
+        if line.startswith('* ') or line.startswith('- '):
+            processed_lines.append(line)
+            continue
+        if '$' in line:
+            line = line.replace('$(', ' $(').replace(')$', ')$ ')
+            line = line.replace('$', ' $ ')
+            line = ' '.join(line.split())
+        processed_lines.append(line)
+    compact = []
+    for s in processed_lines:
+        if s == '' and (not compact or compact[-1] == ''):
+            continue
+        compact.append(s)
+    return '\n'.join(compact).strip()
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--chunk-size', type=int, default=4,
+                        help='characters per streamed chunk (roughly one model token)')
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as f:
+        corpus = json.load(f)
+    raws = [entry['raw'] for entry in corpus]
+    streams = [chunked(raw, args.chunk_size) for raw in raws]
+
+    for i, entry in enumerate(corpus):
+        if legacy_format(entry['raw'].strip()) != entry['expected']:
+            sys.exit(f"legacy output differs from the recording for corpus entry {i}")
+        if format_explanation(entry['raw']) != entry['expected']:
+            sys.exit(f"formatter output differs from the recording for corpus entry {i}")
+        if ''.join(iter_formatted(streams[i])) != entry['expected']:
+            sys.exit(f"streamed output differs from the recording for corpus entry {i}")
+
+    legacy = timed(lambda: [legacy_format(raw.strip()) for raw in raws], args.repeat)
+    whole = timed(lambda: [format_explanation(raw) for raw in raws], args.repeat)
+    streamed = timed(lambda: [''.join(iter_formatted(chunks)) for chunks in streams], args.repeat)
+
+    per_doc = 1e6 / (len(raws) * args.repeat)
+    print(f"corpus={len(raws)} docs  repeat={args.repeat}  chunk-size={args.chunk_size}")
+    print(f"legacy     {legacy * per_doc:8.1f} us/doc")
+    print(f"formatter  {whole * per_doc:8.1f} us/doc  ({legacy / whole:.1f}x)")
+    print(f"streamed   {streamed * per_doc:8.1f} us/doc")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare per-card Scheduler.review_card previews with the vectorized FSRSBatchEngine.
+
+No database needed; cards are synthesized in memory.
+
+    python scripts/bench_fsrs_batch.py --cards 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from fsrs import Card, State, Scheduler
+from models.fsrs_card import FSRSCard
+from utils.fsrs_batch import CardBatch, FSRSBatchEngine, RATINGS
+from utils.fsrs_helper import resolve_scheduler_params
+
+def make_cards(count, now):
+    rng = random.Random(42)
+    cards = []
+    for i in range(count):
+        state = rng.choice([State.Learning, State.Review, State.Relearning]).value
+        cards.append(FSRSCard(
+            user_id='bench', question_id=f'q{i}',
+            due_date=now + timedelta(hours=rng.randint(-500, 500)),
+            stability=rng.uniform(0.1, 120.0), difficulty=rng.uniform(1.0, 10.0),
+            state=state, step=None if state == State.Review.value else rng.randint(0, 2),
+            last_review=now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+        ))
+    return cards
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=100000)
+    parser.add_argument('--scalar-sample', type=int, default=5000,
+                        help='cards to time on the scalar path (extrapolated to --cards)')
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    scheduler = Scheduler(**resolve_scheduler_params())
+    cards = make_cards(args.cards, now)
+
+    sample = cards[:args.scalar_sample]
+    start = time.perf_counter()
+    for i, card in enumerate(sample):
+        fsrs_card = Card(card_id=i + 1, state=State(card.state), step=card.step, stability=card.stability,
+                         difficulty=card.difficulty, due=card.due_date, last_review=card.last_review)
+        scheduler.get_card_retrievability(fsrs_card, now)
+        for rating in RATINGS:
+            scheduler.review_card(fsrs_card, rating, now)
+    scalar = (time.perf_counter() - start) * len(cards) / len(sample)
+
+    start = time.perf_counter()
+    batch = CardBatch.from_cards(cards)
+    load = time.perf_counter() - start
+    engine = FSRSBatchEngine(scheduler)
+    start = time.perf_counter()
+    engine.preview(batch, now)
+    vectorized = time.perf_counter() - start
+
+    print(f"cards={len(cards)}")
+    print(f"scalar     {scalar * 1000:10.1f} ms (extrapolated from {len(sample)})")
+    print(f"batch load {load * 1000:10.1f} ms")
+    print(f"vectorized {vectorized * 1000:10.1f} ms  ({scalar / vectorized:.0f}x)")
+
+if __name__ == '__main__':
+    main()
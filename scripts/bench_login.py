@@ -0,0 +1,79 @@
+"""
+Login throughput of one web worker: bcrypt on the request threads vs the
+PasswordManager process pool, and how much a login burst slows a cheap
+request served by the same worker meanwhile.
+
+No database needed; each "login" is one PasswordManager.verify_password.
+
+    python scripts/bench_login.py --threads 8 --logins 64 --rounds 12
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import utils.security as security
+from utils.security import PasswordManager
+
+def cheap_request():
+    # Stands in for a small JSON endpoint: some pure-Python work under the GIL
+    return sum(i * i for i in range(2000))
+
+def run(workers, threads, logins, hashed, password):
+    security.PASSWORD_HASH_WORKERS = workers
+    security._pool = None
+    if workers:
+        security._get_pool().submit(int).result()  # start the pool outside the timing
+    stop = threading.Event()
+    latencies = []
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            cheap_request()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        ok = all(executor.map(lambda _: PasswordManager.verify_password(password, hashed), range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    if security._pool is not None:
+        security._pool.shutdown()
+    latencies.sort()
+    return {
+        'ok': ok,
+        'logins_per_s': logins / elapsed,
+        'probe_p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'probe_p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='request threads per worker (GUNICORN_THREADS)')
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=security.BCRYPT_ROUNDS)
+    parser.add_argument('--pool-workers', type=int, default=2, help='PASSWORD_HASH_WORKERS for the pooled run')
+    args = parser.parse_args()
+
+    password = 'correct horse battery staple'
+    hashed = security._hash(password, args.rounds)
+    print(f"bcrypt cost {args.rounds}, {args.threads} request threads, {args.logins} logins")
+    for label, workers in (('inline', 0), (f'pool({args.pool_workers})', args.pool_workers)):
+        result = run(workers, args.threads, args.logins, hashed, password)
+        assert result['ok']
+        print(f"{label:>10}: {result['logins_per_s']:7.1f} logins/s   "
+              f"cheap request p50 {result['probe_p50_ms']:6.2f} ms  p99 {result['probe_p99_ms']:6.2f} ms")
+
+if __name__ == '__main__':
+    main()
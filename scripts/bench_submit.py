@@ -0,0 +1,160 @@
+"""
+Benchmark the /api/lessons/submit data path: legacy sequential calls vs SubmitPipeline.
+
+Reports MongoDB commands per submission and p50/p99 latency for both paths.
+Runs against MONGODB_URI (seeds and removes its own bench_* documents).
+
+    python scripts/bench_submit.py --iterations 200 --rtt-ms 2
+
+--rtt-ms adds an artificial delay to every command to approximate a remote
+Mongo deployment when benchmarking against a local mongod.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+load_dotenv(dotenv_path='../.env')
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self, rtt_ms=0.0):
+        self.count = 0
+        self.rtt = rtt_ms / 1000.0
+
+    def started(self, event):
+        self.count += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def legacy_submit(db, user_id, session_id, question_id, answer_indices, response_time):
+    """The pre-pipeline call sequence of submit_answer, kept for comparison."""
+    from utils.fsrs_helper import FSRSHelper
+
+    question = db.questions.find_one({'_id': ObjectId(question_id)})
+    db.lesson_sessions.find_one({'session_id': session_id})
+    correct_indices = question.get('correct_answer', [])
+    is_correct = sorted(answer_indices) == sorted(correct_indices)
+
+    card = FSRSHelper.ensure_card(user_id, question_id)
+    user_stats = db.users.find_one({'_id': ObjectId(user_id)}, {'stats': 1}) or {'stats': {}}
+    streak = user_stats.get('stats', {}).get('current_streak', 0)
+
+    FSRSHelper().review_card(card=card, performance_data={
+        'is_correct': is_correct,
+        'response_time': response_time,
+        'consecutive_correct': streak if is_correct else 0
+    }, question_data=question)
+
+    now = datetime.now(timezone.utc)
+    db.lesson_sessions.update_one({'session_id': session_id}, {
+        '$push': {'used_questions': question_id, 'answers': {
+            'question_id': question_id, 'answer': answer_indices, 'correct': is_correct,
+            'response_time': response_time, 'timestamp': now}},
+        '$set': {'last_answer_time': now, 'last_answer_correct': is_correct}
+    })
+    db.lesson_reports.insert_one({
+        'user_id': ObjectId(user_id), 'session_id': session_id, 'question_id': ObjectId(question_id),
+        'is_correct': is_correct, 'selected_indices': answer_indices,
+        'response_time': response_time, 'timestamp': now
+    })
+    db.users.update_one(
+        {'_id': ObjectId(user_id), 'stats': {'$exists': False}},
+        {'$set': {'stats': {'total_questions': 0, 'correct_answers': 0, 'current_streak': 0}}}
+    )
+    if is_correct:
+        update = {'$inc': {'stats.total_questions': 1, 'stats.correct_answers': 1, 'stats.current_streak': 1}}
+    else:
+        update = {'$inc': {'stats.total_questions': 1}, '$set': {'stats.current_streak': 0}}
+    db.users.update_one({'_id': ObjectId(user_id)}, update)
+
+def pipeline_submit(db, user_id, session_id, question_id, answer_indices, response_time):
+    from utils.fsrs_helper import FSRSHelper
+    from utils.submit_pipeline import SubmitPipeline
+
+    pipeline = SubmitPipeline(db)
+    ctx = pipeline.load(user_id, session_id, question_id)
+    correct_indices = ctx.question.get('correct_answer', [])
+    is_correct = sorted(answer_indices) == sorted(correct_indices)
+    streak = ctx.user_stats.get('current_streak', 0)
+    card, _ = FSRSHelper(ctx.scheduler_profile).review_card(card=ctx.card, performance_data={
+        'is_correct': is_correct,
+        'response_time': response_time,
+        'consecutive_correct': streak if is_correct else 0
+    }, question_data=ctx.question, save=False)
+    pipeline.commit(ctx, card, is_correct, answer_indices, response_time)
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run(name, fn, db, fixtures, counter, iterations):
+    latencies = []
+    commands = []
+    for i in range(iterations):
+        user_id, session_id, question_ids = fixtures
+        question_id = question_ids[i % len(question_ids)]
+        before = counter.count
+        start = time.perf_counter()
+        fn(db, user_id, session_id, question_id, [i % 4], 8.0)
+        latencies.append((time.perf_counter() - start) * 1000)
+        commands.append(counter.count - before)
+    print(f"{name:<10} commands/submit={statistics.mean(commands):5.1f}  "
+          f"p50={percentile(latencies, 50):7.2f}ms  p99={percentile(latencies, 99):7.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--rtt-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    counter = CommandCounter(args.rtt_ms)
+    monitoring.register(counter)
+
+    from app import create_app
+    from utils.database import get_db
+
+    app = create_app()
+    with app.app_context():
+        db = get_db()
+        marker = f"bench_{ObjectId()}"
+        question_ids = [str(qid) for qid in db.questions.insert_many([
+            {'question_text': f'{marker} q{i}', 'options': ['a', 'b', 'c', 'd'],
+             'correct_answer': [i % 4], 'category': marker, 'difficulty': 1 + i % 5}
+            for i in range(args.questions)
+        ]).inserted_ids]
+        results = {}
+        try:
+            for name, fn in (('legacy', legacy_submit), ('pipeline', pipeline_submit)):
+                user_id = str(db.users.insert_one({'username': f'{marker}_{name}', 'email': f'{marker}_{name}@bench'}).inserted_id)
+                session_id = f'{marker}_{name}'
+                db.lesson_sessions.insert_one({'session_id': session_id, 'user_id': user_id, 'used_questions': []})
+                results[name] = (user_id, session_id, question_ids)
+                run(name, fn, db, results[name], counter, args.iterations)
+        finally:
+            user_oids = [ObjectId(fixtures[0]) for fixtures in results.values()]
+            db.questions.delete_many({'category': marker})
+            db.users.delete_many({'_id': {'$in': user_oids}})
+            db.fsrs_cards.delete_many({'user_id': {'$in': user_oids}})
+            db.lesson_reports.delete_many({'user_id': {'$in': user_oids}})
+            db.lesson_sessions.delete_many({'session_id': {'$regex': f'^{marker}'}})
+            db.lesson_session_answers.delete_many({'_id': {'$regex': f'^{marker}'}})
+
+if __name__ == '__main__':
+    main()
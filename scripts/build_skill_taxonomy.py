@@ -0,0 +1,37 @@
+"""
+Build the skill taxonomy (category -> sub_topic -> tags with question counts
+and difficulty histograms) served by /api/skills/categories and
+/api/skills/taxonomy, and publish the question bank version.
+
+Run after importing or editing questions, or on a schedule (e.g. cron):
+
+    python scripts/build_skill_taxonomy.py
+
+Running workers pick up the new taxonomy within SKILL_TAXONOMY_TTL_SECONDS
+and reload their question bank snapshot within QUESTION_BANK_CHECK_SECONDS.
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from models.skill_taxonomy import SkillTaxonomy
+from models.question_bank import QuestionBank
+
+load_dotenv(dotenv_path='../.env')
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/innoserve-dev')
+
+if __name__ == '__main__':
+    client = MongoClient(MONGODB_URI)
+    try:
+        tree = SkillTaxonomy.build(client.get_database())
+        print(f"Built skill taxonomy {tree['version']}: {len(tree['categories'])} categories, "
+              f"{tree['total']} questions.")
+        print(f"Published question bank version {QuestionBank.publish(client.get_database())}.")
+    finally:
+        client.close()
@@ -18,6 +18,7 @@ db.questions.createIndex({ "sub_topic": 1 })
 print('Creating indexes for fsrs_cards...')
 db.fsrs_cards.createIndex({ "user_id": 1, "due_date": 1 })
 db.fsrs_cards.createIndex({ "user_id": 1, "question_id": 1 }, { unique: true })
+db.fsrs_cards.createIndex({ "user_id": 1, "category": 1, "due_date": 1 })
 db.fsrs_cards.createIndex({ "due_date": 1, "state": 1 })
 
 // Lesson Reports collection
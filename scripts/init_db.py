@@ -27,9 +27,19 @@ def create_indexes():
     db.fsrs_cards.create_index({"user_id": 1, "due_date": 1})  # For retrieving due cards
     db.fsrs_cards.create_index({"user_id": 1, "question_id": 1}, unique=True)  # Unique card per user/question
     db.fsrs_cards.create_index([("user_id", 1), ("state", 1), ("due_date", 1)])  # For review scheduling
+    db.fsrs_cards.create_index([("user_id", 1), ("category", 1), ("due_date", 1)])  # For skill-filtered due cards
     db.fsrs_cards.create_index([("due_date", 1), ("state", 1)])  # For general review querying
     db.fsrs_cards.create_index({"updated_at": -1})  # For sync and maintenance
     
+    # Per-user seen-question buckets (_id is "<user_id>:<bucket>")
+    db.seen_questions.create_index({"user_id": 1})
+
+    # Per-user due-date histograms backing /api/lessons/forecast
+    db.due_histograms.create_index({"user_id": 1}, unique=True)
+
+    # Per-user, per-category progress rollups backing /api/lessons/progress-summary
+    db.user_progress.create_index([("user_id", 1), ("category", 1)], unique=True)
+
     # Learning session indexes
     db.lesson_sessions.create_index({"session_id": 1}, unique=True)  # Unique session lookup
     db.lesson_sessions.create_index({"user_id": 1, "created_at": -1})  # User's session history
@@ -41,6 +51,13 @@ def create_indexes():
     db.explanation_cache.create_index({"key": 1}, unique=True)  # Fast cache lookups
     # Auto-expire cache entries after ~30 days (2592000 seconds)
     db.explanation_cache.create_index("created_at", expireAfterSeconds=2592000)
+
+    # Explanation generation leases (utils/singleflight.py); drop them once expired
+    db.flight_leases.create_index("expires_at", expireAfterSeconds=0)
+
+    # Follow-up chat threads; utils/followup_cache.py indexes a question's recent threads
+    db.explanation_threads.create_index({"thread_id": 1}, unique=True)
+    db.explanation_threads.create_index([("question_id", 1), ("updated_at", -1)])
     
     # Session reports/analytics indexes
     db.lesson_reports.create_index({"user_id": 1, "timestamp": -1})  # User's learning history
@@ -0,0 +1,54 @@
+"""
+Move users.seen_question_ids into the bucketed seen_questions collection.
+
+Users are processed in batches; each user's ids are added with
+SeenQuestions.add (idempotent $addToSet upserts) before the array is unset,
+so an interrupted run can simply be started again:
+
+    python scripts/migrate_seen_questions.py
+    python scripts/migrate_seen_questions.py --batch-size 200
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from models.seen_questions import SeenQuestions
+
+load_dotenv(dotenv_path='../.env')
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/innoserve-dev')
+
+def migrate(db, batch_size=100):
+    users = ids = 0
+    while True:
+        batch = list(db.users.find(
+            {'seen_question_ids': {'$exists': True}}, {'seen_question_ids': 1}
+        ).limit(batch_size))
+        if not batch:
+            break
+        for user in batch:
+            seen = user.get('seen_question_ids') or []
+            SeenQuestions.add(user['_id'], seen, db=db)
+            ids += len(seen)
+        db.users.bulk_write([
+            UpdateOne({'_id': user['_id']}, {'$unset': {'seen_question_ids': ''}}) for user in batch
+        ], ordered=False)
+        users += len(batch)
+    print(f"Moved {ids} seen questions for {users} users.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    client = MongoClient(MONGODB_URI)
+    try:
+        migrate(client.get_database(), args.batch_size)
+    finally:
+        client.close()
@@ -0,0 +1,63 @@
+"""
+Rebuild due_histograms (per-user due-date day buckets) from fsrs_cards.
+
+Run after bulk card imports/deletes or whenever /api/lessons/forecast drifts.
+Rebuilt documents only hold days that have due cards, which also compacts
+histograms written before emptied buckets were removed:
+
+    python scripts/rebuild_due_histograms.py            # all users
+    python scripts/rebuild_due_histograms.py --user <id>
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient, ReplaceOne
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from models.due_forecast import DueForecast
+
+load_dotenv(dotenv_path='../.env')
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/innoserve-dev')
+
+def rebuild(db, user_id=None, batch_size=500):
+    match = {'user_id': ObjectId(user_id)} if user_id else {}
+    run_started = datetime.now(timezone.utc)
+    ops = []
+    users = 0
+    for doc in db.fsrs_cards.aggregate(DueForecast.rebuild_pipeline(match), allowDiskUse=True):
+        users += 1
+        ops.append(ReplaceOne(
+            {'user_id': doc['_id']},
+            {'user_id': doc['_id'], 'buckets': doc['buckets'], 'updated_at': run_started},
+            upsert=True
+        ))
+        if len(ops) >= batch_size:
+            db.due_histograms.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        db.due_histograms.bulk_write(ops, ordered=False)
+
+    # Histograms not touched by this run (users without cards) and not updated live since are stale
+    stale = dict(match)
+    stale['updated_at'] = {'$lt': run_started}
+    removed = db.due_histograms.delete_many(stale).deleted_count
+    print(f"Rebuilt due histograms for {users} users ({removed} stale removed).")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', help='only rebuild this user id')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    client = MongoClient(MONGODB_URI)
+    try:
+        rebuild(client.get_database(), args.user, args.batch_size)
+    finally:
+        client.close()
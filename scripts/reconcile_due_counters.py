@@ -0,0 +1,96 @@
+"""
+Rebuild the Redis due counters (sorted sets `due:<user_id>`) from fsrs_cards.
+
+Cards are streamed in user_id order in batches; each user's set is built under
+a temporary key and RENAMEd over the live one so /api/lessons/due-count never
+sees a half-built set. Counter keys of users that no longer have cards are
+dropped and rebuilt lazily on the next poll.
+
+    python scripts/reconcile_due_counters.py            # all users
+    python scripts/reconcile_due_counters.py --user <id>
+
+Without REDIS_URL there is nothing to reconcile: the due count is read from
+fsrs_cards directly.
+"""
+
+import argparse
+import os
+import sys
+
+import redis
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils.due_counter import KEY_PREFIX, LOADING_SUFFIX, READY_MEMBER, REDIS_TTL_SECONDS, counter_key, due_score
+
+load_dotenv(dotenv_path='../.env')
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/innoserve-dev')
+REDIS_URL = os.environ.get('REDIS_URL')
+
+def _flush(pipe, user_oid, scores):
+    key = counter_key(user_oid)
+    tmp_key = f'{key}:rebuild'
+    scores[READY_MEMBER] = float('inf')
+    pipe.delete(tmp_key)
+    pipe.zadd(tmp_key, scores)
+    pipe.expire(tmp_key, REDIS_TTL_SECONDS)
+    pipe.rename(tmp_key, key)
+
+def reconcile(db, client, user_id=None, batch_size=1000):
+    match = {'user_id': ObjectId(user_id)} if user_id else {}
+    cursor = db.fsrs_cards.find(match, {'user_id': 1, 'due_date': 1}).sort('user_id', 1).batch_size(batch_size)
+
+    seen = set()
+    pipe = client.pipeline(transaction=False)
+    pending = 0
+    current, scores = None, {}
+    for doc in cursor:
+        if not isinstance(doc.get('user_id'), ObjectId):
+            continue  # legacy/test cards without an ObjectId owner have no counter
+        if doc['user_id'] != current:
+            if current is not None:
+                _flush(pipe, current, scores)
+                seen.add(str(current))
+                pending += 1
+            current, scores = doc['user_id'], {}
+            if pending >= batch_size:
+                pipe.execute()
+                pending = 0
+        if doc.get('due_date'):
+            scores[str(doc['_id'])] = due_score(doc['due_date'])
+    if current is not None:
+        _flush(pipe, current, scores)
+        seen.add(str(current))
+    pipe.execute()
+
+    removed = 0
+    if user_id:
+        if user_id not in seen:
+            removed = client.delete(counter_key(user_id))
+    else:
+        for key in client.scan_iter(match=f'{KEY_PREFIX}*', count=batch_size):
+            key = key.decode() if isinstance(key, bytes) else key
+            suffix = key[len(KEY_PREFIX):]
+            if suffix not in seen and not suffix.endswith((':rebuild', LOADING_SUFFIX)):
+                removed += client.delete(key)
+    print(f"Reconciled due counters for {len(seen)} users ({removed} stale removed).")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', help='only reconcile this user id')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    if not REDIS_URL:
+        sys.exit("REDIS_URL is not set; due counts are read from fsrs_cards and need no reconciliation.")
+
+    client = MongoClient(MONGODB_URI)
+    redis_client = redis.Redis.from_url(REDIS_URL)
+    try:
+        reconcile(client.get_database(), redis_client, args.user, args.batch_size)
+    finally:
+        client.close()
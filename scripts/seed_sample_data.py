@@ -1,4 +1,5 @@
 from pymongo import MongoClient
+from bson import ObjectId
 import os
 from dotenv import load_dotenv
 
@@ -97,3 +98,8 @@ db.questions.drop()
 # Insert new questions
 db.questions.insert_many(sample_questions)
 print(f"Inserted {len(sample_questions)} questions into the database.")
+
+# Drop the precomputed skill taxonomy; the backend rebuilds it on the next request
+db.skill_taxonomy.delete_many({})
+# Force running workers to reload their question bank snapshot
+db.question_bank.update_one({'_id': 'meta'}, {'$set': {'version': f'seed-{ObjectId()}'}}, upsert=True)
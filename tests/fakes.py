@@ -0,0 +1,125 @@
+"""
+In-memory stand-ins for the pymongo calls the models and utils make.
+
+Only the query and update operators the code under test sends are
+implemented; test modules subclass FakeCollection for anything specific to
+them.
+"""
+
+import copy
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+class FakeCursor(list):
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+    def limit(self, count):
+        return FakeCursor(self[:count])
+
+def matches(doc, query):
+    """Equality, $in, $lte, $ne and $exists on top-level fields."""
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if '$exists' in condition and (field in doc) != condition['$exists']:
+                return False
+            if '$in' in condition and value not in condition['$in']:
+                return False
+            if '$lte' in condition and not (value is not None and value <= condition['$lte']):
+                return False
+            if '$ne' in condition and value == condition['$ne']:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+def project(doc, projection):
+    """Exclusion projections, or inclusion with `$slice: [skip, limit]` on arrays."""
+    if doc is None or not projection:
+        return doc
+    if not any(projection.values()):
+        return {k: v for k, v in doc.items() if k not in projection}
+    shown = {'_id': doc.get('_id')}
+    for field, spec in projection.items():
+        if field in doc:
+            shown[field] = doc[field]
+            if isinstance(spec, dict):
+                skip, limit = spec['$slice']
+                shown[field] = doc[field][skip:skip + limit]
+    return shown
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+        self.queries = 0
+        self.writes = 0
+
+    def _first(self, query):
+        return next((d for d in self.docs if matches(d, query)), None)
+
+    def find(self, query=None, projection=None):
+        self.queries += 1
+        return FakeCursor(d for d in self.docs if matches(d, query or {}))
+
+    def find_one(self, query, projection=None):
+        self.queries += 1
+        return copy.deepcopy(project(self._first(query), projection))
+
+    def insert_one(self, doc):
+        self.docs.append(dict(doc, _id=doc.get('_id', ObjectId())))
+
+    def _apply(self, doc, update):
+        self.writes += 1
+        for field, amount in update.get('$inc', {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        doc.update(update.get('$set', {}))
+        for field in update.get('$unset', {}):
+            doc.pop(field, None)
+        for field, push in update.get('$push', {}).items():
+            doc[field] = (doc.get(field, []) + push['$each'])[push['$slice']:]
+
+    def _upsert(self, query):
+        doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+        self.docs.append(doc)
+        return doc
+
+    def update_one(self, query, update, upsert=False):
+        doc = self._first(query)
+        if doc is None:
+            if not upsert:
+                return
+            doc = self._upsert(query)
+        self._apply(doc, update)
+
+    def find_one_and_update(self, query, update, projection=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE):
+        doc = self._first(query)
+        if doc is None:
+            if not upsert:
+                return None
+            doc = self._upsert(query)
+            before = None
+        else:
+            before = copy.deepcopy(doc)
+        self._apply(doc, update)
+        result = before if return_document == ReturnDocument.BEFORE else doc
+        return copy.deepcopy(project(result, projection))
+
+class FakeDB(dict):
+    """Collections by item or attribute, created empty on first use."""
+
+    def __init__(self, collection=FakeCollection, **docs):
+        super().__init__()
+        self.collection = collection
+        for name, collection_docs in docs.items():
+            self[name] = collection(collection_docs)
+
+    def __missing__(self, name):
+        collection = self[name] = self.collection()
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
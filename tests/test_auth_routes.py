@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch
+from bson import ObjectId
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from pymongo.errors import DuplicateKeyError
+import utils.security as security
+from models.user import User
+from routes.auth import auth_bp
+from utils.security import PasswordManager
+
+class AuthRouteTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key-with-enough-length'
+        JWTManager(self.app)
+        self.app.register_blueprint(auth_bp, url_prefix='/api/auth')
+        self.client = self.app.test_client()
+        for name, value in (('BCRYPT_ROUNDS', 4), ('PASSWORD_HASH_WORKERS', 0)):
+            patcher = patch.object(security, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+class TestRegister(AuthRouteTestCase):
+    def _register(self):
+        return self.client.post('/api/auth/register', json={
+            'username': 'ada', 'email': 'ada@example.com', 'password': 'secret'
+        })
+
+    def test_created(self):
+        with patch.object(User, 'create_user', return_value=User(id=ObjectId())):
+            self.assertEqual(self._register().status_code, 201)
+
+    def test_duplicate_key_maps_to_conflict(self):
+        cases = {'email': '該電子郵件信箱已被註冊', 'username': '該使用者名稱已被註冊'}
+        for field, message in cases.items():
+            error = DuplicateKeyError('E11000 duplicate key error', 11000, {'keyPattern': {field: 1}})
+            with self.subTest(field=field), patch.object(User, 'create_user', side_effect=error):
+                response = self._register()
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual(response.get_json()['error'], message)
+
+class TestLogin(AuthRouteTestCase):
+    def _login(self, stored_hash):
+        user = User(id=str(ObjectId()), username='ada', email='ada@example.com', password_hash=stored_hash)
+        with patch.object(User, 'find_by_email', return_value=user), \
+                patch('models.user.get_db') as get_db:
+            response = self.client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'secret'})
+        return response, get_db.return_value.users.update_one
+
+    def test_outdated_cost_is_rehashed_in_the_login_update(self):
+        response, update_one = self._login(PasswordManager.hash_password('secret', rounds=5))
+        self.assertEqual(response.status_code, 200)
+        update = update_one.call_args[0][1]['$set']
+        self.assertIn('last_login', update)
+        self.assertFalse(PasswordManager.needs_rehash(update['password_hash']))
+        self.assertTrue(PasswordManager.verify_password('secret', update['password_hash']))
+
+    def test_current_cost_only_records_the_login(self):
+        response, update_one = self._login(PasswordManager.hash_password('secret'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('password_hash', update_one.call_args[0][1]['$set'])
+
+    def test_wrong_password_writes_nothing(self):
+        user = User(id=str(ObjectId()), email='ada@example.com', password_hash=PasswordManager.hash_password('other'))
+        with patch.object(User, 'find_by_email', return_value=user), patch('models.user.get_db') as get_db:
+            response = self.client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'secret'})
+        self.assertEqual(response.status_code, 401)
+        get_db.return_value.users.update_one.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from bson import ObjectId
+from utils import cache as cache_module
+from utils.cache import CacheManager, JSONSerializer, LocalCacheBackend, MsgpackSerializer
+
+class FailingBackend:
+    name = 'failing'
+
+    def mget(self, keys):
+        raise ConnectionError('redis down')
+
+    def mset(self, items, ttls):
+        raise ConnectionError('redis down')
+
+    def delete(self, keys):
+        raise ConnectionError('redis down')
+
+class TestSerializers(unittest.TestCase):
+    def setUp(self):
+        self.value = {
+            '_id': ObjectId(),
+            'created_at': datetime(2025, 3, 1, 12, 30),  # naive UTC, as pymongo returns it
+            'options': ['a', 'b'],
+            'difficulty': 3
+        }
+
+    def _assert_round_trip(self, serializer):
+        restored = serializer.loads(serializer.dumps(self.value))
+        self.assertEqual(restored['_id'], self.value['_id'])
+        self.assertEqual(restored['created_at'], self.value['created_at'])
+        self.assertEqual(restored['options'], ['a', 'b'])
+        self.assertEqual(restored['difficulty'], 3)
+
+    def test_json_round_trip(self):
+        self._assert_round_trip(JSONSerializer())
+
+    @unittest.skipIf(cache_module.msgpack is None, 'msgpack not installed')
+    def test_msgpack_round_trip(self):
+        self._assert_round_trip(MsgpackSerializer())
+
+class TestLocalCacheBackend(unittest.TestCase):
+    def test_expired_entries_are_misses(self):
+        backend = LocalCacheBackend()
+        with patch('utils.cache.time.monotonic', return_value=100.0):
+            backend.mset({'a': b'1'}, {'a': 10})
+        with patch('utils.cache.time.monotonic', return_value=105.0):
+            self.assertEqual(backend.mget(['a']), [b'1'])
+        with patch('utils.cache.time.monotonic', return_value=111.0):
+            self.assertEqual(backend.mget(['a']), [None])
+        self.assertEqual(len(backend), 0)
+
+    def test_evicts_least_recently_used(self):
+        backend = LocalCacheBackend(max_entries=2)
+        backend.mset({'a': b'1', 'b': b'2'}, {'a': 60, 'b': 60})
+        backend.mget(['a'])
+        backend.mset({'c': b'3'}, {'c': 60})
+        self.assertEqual(backend.mget(['a', 'b', 'c']), [b'1', None, b'3'])
+
+class TestCacheManager(unittest.TestCase):
+    def setUp(self):
+        self.cache = CacheManager(LocalCacheBackend(), jitter=0)
+
+    def test_get_many_and_stats(self):
+        self.cache.set_many('question', {'q1': {'text': 'one'}, 'q2': {'text': 'two'}})
+        found = self.cache.get_many('question', ['q1', 'q2', 'q3'])
+        self.assertEqual(set(found), {'q1', 'q2'})
+        stats = self.cache.stats()['namespaces']['question']
+        self.assertEqual((stats['hits'], stats['misses'], stats['sets']), (2, 1, 2))
+        self.assertAlmostEqual(stats['hit_ratio'], 0.6667)
+
+    def test_namespace_version_in_key(self):
+        with patch.dict(cache_module.NAMESPACE_VERSIONS, {'question': 7}):
+            self.assertEqual(self.cache.key('question', 'abc'), 'lw:question:v7:abc')
+
+    def test_get_or_load_does_not_cache_none(self):
+        calls = []
+        def loader():
+            calls.append(1)
+            return None
+        self.assertIsNone(self.cache.get_or_load('taxonomy', 'version', loader))
+        self.assertIsNone(self.cache.get_or_load('taxonomy', 'version', loader))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.cache.get_or_load('taxonomy', 'version', lambda: 'v1'), 'v1')
+        self.assertEqual(self.cache.get_or_load('taxonomy', 'version', loader), 'v1')
+
+    def test_ttl_jitter_stays_in_bounds(self):
+        cache = CacheManager(LocalCacheBackend(), default_ttl=1000, jitter=0.1)
+        ttls = {cache._ttl(None) for _ in range(200)}
+        self.assertTrue(all(900 <= ttl <= 1100 for ttl in ttls))
+        self.assertGreater(len(ttls), 1)
+
+    def test_backend_errors_are_misses(self):
+        cache = CacheManager(FailingBackend())
+        cache.set('explanation', 'k', 'text')
+        self.assertEqual(cache.get('explanation', 'k', 'default'), 'default')
+        stats = cache.stats()['namespaces']['explanation']
+        self.assertEqual(stats['errors'], 2)
+        self.assertEqual(stats['misses'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime, timedelta
+from utils.chat_context import (
+    TRUNCATED_MARK, build_chat_context, estimate_tokens, truncate_to_tokens,
+)
+
+START = datetime(2024, 1, 1)
+
+def _thread(turns, **extra):
+    messages = []
+    for i, (question, answer) in enumerate(turns):
+        messages.append({'role': 'user', 'content': question, 'ts': START + timedelta(minutes=2 * i)})
+        messages.append({'role': 'assistant', 'content': answer, 'ts': START + timedelta(minutes=2 * i + 1)})
+    return dict({'messages': messages}, **extra)
+
+class TestTokenEstimate(unittest.TestCase):
+    def test_cjk_counts_per_character(self):
+        self.assertEqual(estimate_tokens('判別式'), 3)
+        self.assertEqual(estimate_tokens('abcdefgh'), 2)
+        self.assertEqual(estimate_tokens(''), 0)
+
+    def test_truncates_at_line_boundary(self):
+        text = '第一行內容\n第二行內容\n第三行內容'
+        cut = truncate_to_tokens(text, 14)
+        self.assertTrue(cut.startswith('第一行內容'))
+        self.assertTrue(cut.endswith(TRUNCATED_MARK))
+        self.assertNotIn('第三行', cut)
+        self.assertLessEqual(estimate_tokens(cut), 14 + 1)
+
+    def test_short_text_is_unchanged(self):
+        self.assertEqual(truncate_to_tokens(' 短 ', 10), '短')
+
+class TestBuildChatContext(unittest.TestCase):
+    def test_recent_turns_fit_the_history_budget(self):
+        turns = [(f'問題{i}' * 5, f'回答{i}' * 10) for i in range(10)]
+        ctx = build_chat_context(_thread(turns), '解釋', history_tokens=100)
+        self.assertTrue(ctx.history)
+        self.assertLessEqual(sum(estimate_tokens(m['content']) + 4 for m in ctx.history), 100)
+        self.assertEqual(ctx.history[-1]['content'], '回答9' * 10)
+        self.assertIn('問題7', ctx.summary)
+
+    def test_older_turns_are_summarized_once(self):
+        turns = [(f'問題{i}' * 5, f'回答{i}。補充說明' * 5) for i in range(6)]
+        thread = _thread(turns)
+        first = build_chat_context(thread, '解釋', history_tokens=100)
+        self.assertIsNotNone(first.summary_update)
+        self.assertEqual(first.summary_update['summary'], first.summary)
+
+        # Stored summary covers the older turns; nothing new to summarize next time
+        thread.update(first.summary_update)
+        second = build_chat_context(thread, '解釋', history_tokens=100)
+        self.assertIsNone(second.summary_update)
+        self.assertEqual(second.summary, first.summary)
+        self.assertEqual(second.history, first.history)
+
+    def test_summary_is_capped(self):
+        turns = [(f'問題{i}' * 5, f'回答{i}' * 5) for i in range(30)]
+        ctx = build_chat_context(_thread(turns), '解釋', history_tokens=50, summary_tokens=60)
+        self.assertLessEqual(estimate_tokens(ctx.summary), 60)
+        self.assertNotIn('問題0', ctx.summary)
+
+    def test_oversized_turn_is_clipped(self):
+        ctx = build_chat_context(_thread([('問題', '很長' * 500)]), '解釋', history_tokens=100)
+        self.assertEqual(len(ctx.history), 2)
+        self.assertTrue(ctx.history[1]['content'].endswith(TRUNCATED_MARK))
+
+    def test_explanation_is_budgeted(self):
+        ctx = build_chat_context(None, '步驟\n' * 500, explanation_tokens=50)
+        self.assertLessEqual(estimate_tokens(ctx.explanation), 51)
+
+    def test_fallback_history_without_thread(self):
+        history = [{'role': 'user', 'content': '為什麼？'}, 'bad', {'role': 'assistant', 'content': '因為'}]
+        ctx = build_chat_context(None, None, fallback_history=history)
+        self.assertEqual([m['content'] for m in ctx.history], ['為什麼？', '因為'])
+        self.assertIsNone(ctx.summary_update)
+        self.assertEqual(ctx.explanation, '')
+
+if __name__ == '__main__':
+    unittest.main()
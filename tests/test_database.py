@@ -0,0 +1,73 @@
+import os
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from pymongo import ReadPreference
+import utils.database as database
+from utils.database import PoolStats, get_db, init_mongo, mongo_client_options
+
+class TestDatabaseHandle(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update({
+            'MONGODB_URI': 'mongodb://localhost:27017/lw-test?retryWrites=true',
+            'MONGO_MAX_POOL_SIZE': 20,
+            'MONGO_MAX_IDLE_TIME_MS': 30000,
+            'MONGO_COMPRESSORS': 'zlib',
+            'MONGO_WRITE_CONCERN': 'majority',
+            'MONGO_READ_PREFERENCE': 'secondaryPreferred',
+        })
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.ctx.pop()
+        if getattr(self.app, 'mongo', None) is not None:
+            self.app.mongo.close()
+
+    def test_client_uses_configured_pool(self):
+        client = init_mongo(self.app, verify=False)  # MongoClient connects lazily
+        self.assertEqual(client.options.pool_options.max_pool_size, 20)
+        self.assertEqual(client.options.pool_options.max_idle_time_seconds, 30)
+        self.assertEqual(client.options._options['compressors'], ['zlib'])
+        self.assertEqual(client.write_concern.document, {'w': 'majority'})
+        self.assertEqual(client.read_preference, ReadPreference.SECONDARY_PREFERRED)
+
+    def test_handle_is_resolved_once(self):
+        init_mongo(self.app, verify=False)
+        with patch.object(database, 'urlparse') as parse:
+            first = get_db()
+            self.assertIs(get_db(), first)
+            parse.assert_not_called()
+        self.assertEqual(first.name, 'lw-test')
+
+    def test_inherited_client_is_replaced(self):
+        init_mongo(self.app, verify=False)
+        inherited = self.app.mongo
+        self.app.mongo_pid = os.getpid() + 1  # as if created in the parent before fork
+        get_db()
+        self.assertIsNot(self.app.mongo, inherited)
+        inherited.close()
+
+    def test_defaults(self):
+        options = mongo_client_options({})
+        self.assertEqual((options['maxPoolSize'], options['readPreference']), (50, 'primary'))
+        self.assertNotIn('w', options)
+        self.assertEqual(mongo_client_options({'MONGO_WRITE_CONCERN': '1'})['w'], 1)
+
+class TestPoolStats(unittest.TestCase):
+    def test_counts_checkouts_and_in_use(self):
+        stats = PoolStats()
+        for _ in range(2):
+            stats.connection_created(None)
+            stats.connection_check_out_started(None)
+            stats.connection_checked_out(None)
+        stats.connection_checked_in(None)
+        stats.connection_check_out_failed(None)
+        result = stats.stats()
+        self.assertEqual((result['checkouts'], result['in_use'], result['max_in_use']), (2, 1, 2))
+        self.assertEqual((result['open'], result['checkout_failures']), (2, 1))
+        self.assertGreaterEqual(result['wait_ms_max'], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
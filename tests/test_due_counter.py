@@ -0,0 +1,133 @@
+import unittest
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch
+from bson import ObjectId
+from utils.due_counter import READY_MEMBER, DueCounter, counter_key, due_score, loading_key
+
+try:
+    import fakeredis
+    fakeredis.FakeRedis().eval('return 1', 0)
+except Exception:  # not installed, or without its Lua extra
+    fakeredis = None
+
+class FakeCards:
+    """Minimal fsrs_cards stand-in: counts the user's cards due by the query's cutoff."""
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+        self.on_find = None
+
+    def count_documents(self, query):
+        self.queries.append(query)
+        cutoff = query['due_date']['$lte']
+        return sum(1 for d in self.docs if d['user_id'] == query['user_id'] and d['due_date'] <= cutoff)
+
+    def find(self, query, projection=None):
+        if self.on_find is None:
+            raise AssertionError('the count must not load the cards')
+        self.on_find()
+        return [d for d in self.docs if d['user_id'] == query['user_id']]
+
+class FakeDB:
+    def __init__(self, docs):
+        self.fsrs_cards = FakeCards(docs)
+
+class TestDueCounterWithoutRedis(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+        self.user = ObjectId()
+        self.cards = [ObjectId() for _ in range(5)]
+        self.db = FakeDB([
+            {'_id': card_id, 'user_id': self.user, 'due_date': self.now + timedelta(hours=offset)}
+            for card_id, offset in zip(self.cards, (-48, -1, 0, 2, 72))
+        ])
+        patcher = patch('utils.due_counter.get_redis', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counts_in_mongo_on_every_poll(self):
+        self.assertEqual(DueCounter.count_due(self.user, self.now, db=self.db), 3)
+        self.assertEqual(DueCounter.count_due(str(self.user), self.now + timedelta(days=4), db=self.db), 5)
+        self.assertEqual(self.db.fsrs_cards.queries[0], {'user_id': self.user, 'due_date': {'$lte': self.now}})
+        self.assertEqual(len(self.db.fsrs_cards.queries), 2)
+
+    def test_record_and_invalidate_keep_no_state(self):
+        DueCounter.record(self.user, self.cards[0], self.now + timedelta(days=3))
+        DueCounter.invalidate(self.user)
+        self.assertEqual(self.db.fsrs_cards.queries, [])
+
+    def test_invalid_user_counts_nothing(self):
+        self.assertEqual(DueCounter.count_due('not-an-id', self.now, db=self.db), 0)
+        self.assertEqual(self.db.fsrs_cards.queries, [])
+
+    def test_due_score_naive_is_utc(self):
+        aware = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.assertEqual(due_score(aware.replace(tzinfo=None)), due_score(aware))
+
+@unittest.skipIf(fakeredis is None, 'fakeredis[lua] is not installed')
+class TestRedisDueCounter(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+        self.user = ObjectId()
+        self.cards = [ObjectId() for _ in range(4)]
+        self.db = FakeDB([
+            {'_id': card_id, 'user_id': self.user, 'due_date': self.now + timedelta(hours=offset)}
+            for card_id, offset in zip(self.cards, (-48, -1, 2, 72))
+        ])
+        self.db.fsrs_cards.loads = 0
+
+        def loaded():
+            self.db.fsrs_cards.loads += 1
+        self.db.fsrs_cards.on_find = loaded
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch('utils.due_counter.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.key = counter_key(self.user)
+
+    def test_first_count_hydrates_once(self):
+        self.assertEqual(DueCounter.count_due(self.user, self.now, db=self.db), 2)
+        self.assertEqual(DueCounter.count_due(self.user, self.now + timedelta(days=4), db=self.db), 4)
+        self.assertEqual(self.db.fsrs_cards.loads, 1)
+        self.assertEqual(self.redis.zscore(self.key, READY_MEMBER), float('inf'))
+        self.assertFalse(self.redis.exists(loading_key(self.user)))
+        self.assertGreater(self.redis.ttl(self.key), 0)
+
+    def test_user_without_cards_stays_hydrated(self):
+        empty = ObjectId()
+        self.assertEqual(DueCounter.count_due(empty, self.now, db=self.db), 0)
+        self.assertEqual(DueCounter.count_due(empty, self.now, db=self.db), 0)
+        self.assertEqual(self.db.fsrs_cards.loads, 1)
+
+    def test_record_moves_card_in_a_hydrated_set(self):
+        DueCounter.count_due(self.user, self.now, db=self.db)
+        DueCounter.record(self.user, self.cards[0], self.now + timedelta(days=3))
+        DueCounter.record(self.user, ObjectId(), self.now - timedelta(minutes=5))
+        self.assertEqual(DueCounter.count_due(self.user, self.now, db=self.db), 2)
+        self.assertEqual(self.db.fsrs_cards.loads, 1)
+
+    def test_record_before_hydration_is_ignored(self):
+        DueCounter.record(self.user, ObjectId(), self.now - timedelta(days=1))
+        self.assertFalse(self.redis.exists(self.key))
+        self.assertEqual(DueCounter.count_due(self.user, self.now, db=self.db), 2)
+
+    def test_record_during_hydration_is_kept(self):
+        # The card is saved (due in 3 days) after the load read its old due date
+        def save_during_load():
+            DueCounter.record(self.user, self.cards[0], self.now + timedelta(days=3))
+        self.db.fsrs_cards.on_find = save_during_load
+        self.assertEqual(DueCounter.count_due(self.user, self.now, db=self.db), 1)
+        self.assertEqual(self.redis.zscore(self.key, str(self.cards[0])),
+                         due_score(self.now + timedelta(days=3)))
+
+    def test_failed_record_invalidates(self):
+        DueCounter.count_due(self.user, self.now, db=self.db)
+        with patch('utils.due_counter.RedisDueCounter.record', side_effect=RuntimeError('script error')), \
+                self.assertLogs('utils.due_counter', level='WARNING'):
+            DueCounter.record(self.user, self.cards[0], self.now + timedelta(days=3))
+        self.assertFalse(self.redis.exists(self.key))
+        self.assertEqual(DueCounter.count_due(self.user, self.now, db=self.db), 2)
+        self.assertEqual(self.db.fsrs_cards.loads, 2)
+
+if __name__ == '__main__':
+    unittest.main()
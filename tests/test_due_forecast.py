@@ -0,0 +1,64 @@
+import unittest
+from datetime import datetime, timezone, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from models.due_forecast import DueForecast
+
+class FakeHistograms:
+    """Just the operators DueForecast.record_move sends, on dotted bucket paths."""
+
+    def __init__(self):
+        self.docs = {}
+
+    @staticmethod
+    def _bucket_matches(doc, query):
+        for field, condition in query.items():
+            if field.startswith('buckets.'):
+                value = doc.get('buckets', {}).get(field.split('.', 1)[1])
+                if value is None or value > condition['$lte']:
+                    return False
+        return True
+
+    def find_one_and_update(self, query, update, projection=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE):
+        doc = self.docs.setdefault(query['user_id'], {'user_id': query['user_id'], 'buckets': {}})
+        for field, amount in update['$inc'].items():
+            key = field.split('.', 1)[1]
+            doc['buckets'][key] = doc['buckets'].get(key, 0) + amount
+        return {'buckets': dict(doc['buckets'])}
+
+    def update_one(self, query, update):
+        doc = self.docs.get(query['user_id'])
+        if doc is not None and self._bucket_matches(doc, query):
+            for field in update['$unset']:
+                doc['buckets'].pop(field.split('.', 1)[1], None)
+
+class FakeDB:
+    def __init__(self):
+        self.due_histograms = FakeHistograms()
+
+class TestDueHistogram(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB()
+        self.user = ObjectId()
+        self.day = datetime(2025, 3, 1, 9, 0, tzinfo=timezone.utc)
+
+    def _buckets(self):
+        return self.db.due_histograms.docs[self.user]['buckets']
+
+    def test_emptied_buckets_are_removed(self):
+        DueForecast.record_move(self.user, None, self.day, db=self.db)
+        DueForecast.record_move(self.user, None, self.day, db=self.db)
+        due = self.day
+        for step in range(1, 30):
+            # One card reviewed daily, always due the next day
+            DueForecast.record_move(self.user, due, self.day + timedelta(days=step), db=self.db)
+            due = self.day + timedelta(days=step)
+        self.assertEqual(self._buckets(), {'2025-03-01': 1, '2025-03-30': 1})
+
+    def test_same_day_move_writes_nothing(self):
+        DueForecast.record_move(self.user, self.day, self.day + timedelta(hours=2), db=self.db)
+        self.assertEqual(self.db.due_histograms.docs, {})
+
+if __name__ == '__main__':
+    unittest.main()
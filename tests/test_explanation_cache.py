@@ -0,0 +1,107 @@
+import time
+import unittest
+from bson import ObjectId
+from flask import Flask
+from utils.cache import CacheManager, LocalCacheBackend
+from utils.explanation_cache import ExplanationCache, ExplanationLRU, question_version
+
+class FakeExplanations:
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    def find_one(self, query, projection=None):
+        self.reads += 1
+        return self.docs.get(query['key'])
+
+    def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query['key'], {}).update(update['$set'])
+
+class FakeDB:
+    def __init__(self):
+        self.explanation_cache = FakeExplanations()
+
+QUESTION = {'_id': ObjectId(), 'question_text': '1+1=?', 'options': ['1', '2'], 'correct_answer': [1]}
+QUESTION_ID = str(QUESTION['_id'])
+KEY = f"explanation:{QUESTION_ID}:0"
+
+class TestExplanationLRU(unittest.TestCase):
+    def test_evicts_least_recently_used_by_bytes(self):
+        lru = ExplanationLRU(max_bytes=1000)
+        for i in range(3):
+            lru.put('q', f'k{i}', 'v', 'x' * 300)
+        self.assertEqual(len(lru), 2)
+        self.assertIsNone(lru.get('q', 'k0', 'v'))
+        self.assertLessEqual(lru.bytes, 1000)
+        self.assertEqual(lru.stats()['evictions'], 1)
+
+    def test_recent_use_protects_an_entry(self):
+        lru = ExplanationLRU(max_bytes=1000)
+        lru.put('q', 'k0', 'v', 'x' * 300)
+        lru.put('q', 'k1', 'v', 'x' * 300)
+        lru.get('q', 'k0', 'v')
+        lru.put('q', 'k2', 'v', 'x' * 300)
+        self.assertIsNotNone(lru.get('q', 'k0', 'v'))
+        self.assertIsNone(lru.get('q', 'k1', 'v'))
+
+    def test_entries_expire(self):
+        lru = ExplanationLRU(ttl=0.01)
+        lru.put('q', 'k', 'v', 'text')
+        time.sleep(0.02)
+        self.assertIsNone(lru.get('q', 'k', 'v'))
+        self.assertEqual((lru.stats()['expirations'], lru.bytes), (1, 0))
+
+    def test_new_version_drops_old_entries(self):
+        lru = ExplanationLRU()
+        lru.put('q', 'k0', 'v1', 'old')
+        lru.put('q', 'k1', 'v1', 'old')
+        lru.put('other', 'k2', 'v1', 'kept')
+        self.assertIsNone(lru.get('q', 'k0', 'v2'))
+        self.assertEqual(len(lru), 1)
+        self.assertEqual(lru.stats()['invalidations'], 2)
+
+class TestExplanationCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.cache = CacheManager(LocalCacheBackend())
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.db = FakeDB()
+        self.version = question_version(QUESTION)
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def test_hits_are_served_from_memory(self):
+        ExplanationCache().put(self.db, QUESTION_ID, KEY, self.version, [0], 'explanation')
+        other_worker = ExplanationCache()
+        self.assertEqual(other_worker.get(self.db, QUESTION_ID, KEY, self.version), 'explanation')
+        self.assertEqual(other_worker.get(self.db, QUESTION_ID, KEY, self.version), 'explanation')
+        stats = other_worker.stats()
+        self.assertEqual((stats['shared_hits'], stats['local_hits']), (1, 1))
+        self.assertEqual(self.db.explanation_cache.reads, 0)
+
+    def test_falls_back_to_the_store(self):
+        self.db.explanation_cache.docs[KEY] = {'explanation': 'stored', 'question_version': self.version}
+        explanations = ExplanationCache()
+        self.assertEqual(explanations.get(self.db, QUESTION_ID, KEY, self.version), 'stored')
+        self.assertEqual(explanations.get(self.db, QUESTION_ID, KEY, self.version), 'stored')
+        self.assertEqual(self.db.explanation_cache.reads, 1)
+        self.assertEqual(explanations.stats()['store_hits'], 1)
+
+    def test_legacy_documents_without_version_are_used(self):
+        self.db.explanation_cache.docs[KEY] = {'explanation': 'legacy'}
+        self.assertEqual(ExplanationCache().get(self.db, QUESTION_ID, KEY, self.version), 'legacy')
+
+    def test_editing_the_question_invalidates(self):
+        explanations = ExplanationCache()
+        explanations.put(self.db, QUESTION_ID, KEY, self.version, [0], 'explanation')
+        edited = dict(QUESTION, options=['1', '3'])
+        new_version = question_version(edited)
+        self.assertNotEqual(new_version, self.version)
+        self.assertIsNone(explanations.get(self.db, QUESTION_ID, KEY, new_version))
+        self.assertEqual(explanations.stats()['stale'], 1)
+        self.assertIsNotNone(self.db.explanation_cache.docs[KEY]['created_at'].tzinfo)
+
+if __name__ == '__main__':
+    unittest.main()
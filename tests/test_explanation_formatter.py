@@ -0,0 +1,50 @@
+import json
+import os
+import unittest
+from utils.explanation_formatter import ExplanationFormatter, format_explanation, iter_formatted
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'explanation_corpus.json')
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+class TestExplanationFormatter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(CORPUS_PATH, encoding='utf-8') as f:
+            cls.corpus = json.load(f)
+
+    def test_matches_recorded_corpus(self):
+        for i, entry in enumerate(self.corpus):
+            with self.subTest(entry=i):
+                self.assertEqual(format_explanation(entry['raw']), entry['expected'])
+
+    def test_chunked_input_matches_recorded_corpus(self):
+        for i, entry in enumerate(self.corpus):
+            for size in (1, 2, 5, 17):
+                with self.subTest(entry=i, size=size):
+                    text = ''.join(iter_formatted(chunked(entry['raw'], size)))
+                    self.assertEqual(text, entry['expected'])
+
+    def test_lines_are_emitted_as_they_complete(self):
+        formatter = ExplanationFormatter()
+        self.assertEqual(formatter.feed('**步驟一：理解'), [])
+        self.assertEqual(formatter.feed('題目**\n已知 $$x=1$$'), ['**步驟一：理解題目**'])
+        self.assertEqual(formatter.feed('\n\n\n* 重點'), ['', '已知 $ x=1 $'])
+        self.assertEqual(formatter.close(), ['', '* 重點'])
+
+    def test_display_environment_is_held_until_closed(self):
+        formatter = ExplanationFormatter()
+        self.assertEqual(formatter.feed('\\begin{align}\na &= b \\\\\n'), [])
+        self.assertEqual(formatter.feed('c &= d\n\\end{align}\n'), ['* $a = b$', '* $c = d$'])
+
+    def test_unclosed_environment_is_flushed_on_close(self):
+        formatter = ExplanationFormatter()
+        self.assertEqual(formatter.feed('\\begin{split}\nx = 1\n'), [])
+        self.assertEqual(formatter.close(), ['\\begin{split}', 'x = 1'])
+
+    def test_crlf_split_across_chunks(self):
+        self.assertEqual(''.join(iter_formatted(['a\r', '\nb\r', '\r', '\n'])), 'a\nb')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import unittest
+from unittest.mock import patch
+from utils.llm_helper import LLMHelper
+
+RAW = (
+    "**步驟一：理解題目**\n\n"
+    "* 已知 $$x + y = 10$$\n"
+    "- 座標 $(3, 7)$\n\n"
+    "\\begin{align}\n a &= b \\\\\n\n c &= d\n\\end{align}\n\n\n"
+    "**步驟二：正確的解題思路**\n"
+    "代入 \\[x = 3\\] 即可\r\n\r\n"
+)
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+class TestExplanationStream(unittest.TestCase):
+    def setUp(self):
+        with patch.dict(os.environ, {'REPLICATE_API_TOKEN': 'test-token'}):
+            self.llm = LLMHelper()
+
+    def test_streamed_pieces_match_full_formatting(self):
+        expected = self.llm._process_explanation(RAW.strip())
+        for size in (1, 3, 7, len(RAW)):
+            with self.subTest(size=size):
+                self.assertEqual(''.join(self.llm._format_stream(chunked(RAW, size))), expected)
+
+    def test_paragraphs_are_emitted_before_stream_ends(self):
+        pieces = self.llm._format_stream(iter(chunked(RAW, 4)))
+        self.assertEqual(next(pieces), '**步驟一：理解題目**')
+
+    def test_open_display_environment_is_held_back(self):
+        pieces = list(self.llm._format_stream(chunked(RAW, 5)))
+        self.assertTrue(any('* $a = b$\n* $c = d$' in piece for piece in pieces))
+
+    def test_stream_explanation_uses_model_events(self):
+        with patch.object(LLMHelper, '_stream', return_value=iter(chunked(RAW, 6))):
+            text = ''.join(self.llm.stream_explanation({'options': [], 'selected_indices': []}))
+        self.assertEqual(text, self.llm._process_explanation(RAW.strip()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+from bson import ObjectId
+from flask import Flask
+from utils.cache import CacheManager, LocalCacheBackend
+from utils.followup_cache import FollowupCache, FollowupIndex, normalize_message
+
+class FakeCursor(list):
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+    def limit(self, count):
+        return FakeCursor(self[:count])
+
+class FakeThreads:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = 0
+
+    def find(self, query, projection=None):
+        self.queries += 1
+        return FakeCursor(d for d in self.docs if d['question_id'] == query['question_id']
+                          and d.get('selected_indices') == query['selected_indices'])
+
+class FakeDB:
+    def __init__(self, threads):
+        self.explanation_threads = FakeThreads(threads)
+
+QUESTION_ID = str(ObjectId())
+
+def _thread(step_key, *turns, updated_at=0, selected_indices=(1,)):
+    messages = []
+    for question, answer in turns:
+        messages.append({'role': 'user', 'content': question})
+        messages.append({'role': 'assistant', 'content': answer})
+    return {'question_id': ObjectId(QUESTION_ID), 'step_key': step_key, 'messages': messages,
+            'updated_at': updated_at, 'selected_indices': list(selected_indices)}
+
+class TestNormalization(unittest.TestCase):
+    def test_width_case_spacing_and_punctuation_are_ignored(self):
+        self.assertEqual(normalize_message('為什麼這裡要除以２？'), normalize_message(' 為什麼 這裡要除以 2 ?'))
+        self.assertEqual(normalize_message('Why Divide BY 2?'), 'whydivideby2')
+
+class TestFollowupIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = FollowupIndex([
+            ('為什麼這裡要除以2？', 'divide-answer'),
+            ('判別式小於零代表什麼？', 'discriminant-answer'),
+            ('怎麼知道要用配方法？', 'completing-square-answer'),
+        ])
+
+    def test_paraphrase_is_nearest(self):
+        answer, score = self.index.nearest('為什麼這一步要除以2')
+        self.assertEqual(answer, 'divide-answer')
+        self.assertGreater(score, 0.6)
+
+    def test_identical_question_scores_one(self):
+        answer, score = self.index.nearest('判別式小於零代表什麼')
+        self.assertEqual(answer, 'discriminant-answer')
+        self.assertAlmostEqual(score, 1.0)
+
+    def test_unrelated_question_has_no_match(self):
+        self.assertIsNone(self.index.nearest('xyz'))
+
+    def test_different_numbers_do_not_match(self):
+        self.assertIsNone(self.index.nearest('為什麼這裡要除以3？'))
+
+class TestFollowupCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.cache = CacheManager(LocalCacheBackend())
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.db = FakeDB([
+            _thread('step1', ('為什麼這裡要除以2？', 'step1-divide'), updated_at=2),
+            _thread('step2', ('為什麼這裡要除以2？', 'step2-divide'), updated_at=1),
+        ])
+        self.followups = FollowupCache(threshold=0.6, refresh_seconds=60)
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def test_exact_match_is_scoped_to_the_step(self):
+        match = self.followups.lookup(self.db, QUESTION_ID, 'step2', [1], '為什麼這裡要除以 2 ?')
+        self.assertEqual((match.answer, match.kind), ('step2-divide', 'exact'))
+
+    def test_similar_match_above_threshold(self):
+        match = self.followups.lookup(self.db, QUESTION_ID, 'step1', [1], '為什麼這一步要除以2')
+        self.assertEqual((match.answer, match.kind), ('step1-divide', 'similar'))
+
+    def test_miss_below_threshold(self):
+        self.assertIsNone(self.followups.lookup(self.db, QUESTION_ID, 'step1', [1], '可以再舉一個類似的例子嗎'))
+        self.assertEqual(self.followups.stats()['misses'], 1)
+
+    def test_short_contextual_messages_are_not_cached(self):
+        self.assertIsNone(self.followups.lookup(self.db, QUESTION_ID, 'step1', [1], '為什麼？'))
+        self.assertEqual(self.followups.stats()['skipped'], 1)
+        self.assertEqual(self.db.explanation_threads.queries, 0)
+
+    def test_answers_are_scoped_to_the_selection(self):
+        self.db.explanation_threads.docs.append(
+            _thread('step1', ('為什麼這裡要除以2？', 'picked-c-divide'), updated_at=3, selected_indices=(2,)))
+        match = self.followups.lookup(self.db, QUESTION_ID, 'step1', [2], '為什麼這裡要除以2？')
+        self.assertEqual(match.answer, 'picked-c-divide')
+        self.followups.record(QUESTION_ID, 'step1', [0], '這個公式是怎麼來的呢', 'picked-a-formula')
+        self.assertIsNone(self.followups.lookup(self.db, QUESTION_ID, 'step1', [2], '這個公式是怎麼來的呢'))
+        self.assertEqual(self.followups.lookup(self.db, QUESTION_ID, 'step1', [0], '這個公式是怎麼來的呢').answer,
+                         'picked-a-formula')
+        # A correct answer (option 1 here) never sees either
+        match = self.followups.lookup(self.db, QUESTION_ID, 'step1', [1], '為什麼這裡要除以2？')
+        self.assertEqual(match.answer, 'step1-divide')
+
+    def test_recorded_answers_are_served_without_reloading(self):
+        self.followups.lookup(self.db, QUESTION_ID, 'step3', [1], '這個公式是怎麼來的呢')
+        self.followups.record(QUESTION_ID, 'step3', [1], '這個公式是怎麼來的呢', 'formula-answer')
+        other_worker = FollowupCache(threshold=0.6)
+        match = other_worker.lookup(self.db, QUESTION_ID, 'step3', [1], '這個公式是怎麼來的呢？')
+        self.assertEqual((match.answer, match.kind), ('formula-answer', 'exact'))
+        match = self.followups.lookup(self.db, QUESTION_ID, 'step3', [1], '這個公式怎麼來的')
+        self.assertEqual((match.answer, match.kind), ('formula-answer', 'similar'))
+        self.assertEqual(self.db.explanation_threads.queries, 1)
+
+if __name__ == '__main__':
+    unittest.main()
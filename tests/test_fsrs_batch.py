@@ -0,0 +1,109 @@
+import unittest
+import random
+from datetime import datetime, timezone, timedelta
+import numpy as np
+from fsrs import Card, Rating, State, Scheduler
+from models.fsrs_card import FSRSCard
+from utils.fsrs_batch import CardBatch, FSRSBatchEngine, RATINGS, from_us
+from utils.fsrs_helper import resolve_scheduler_params
+
+class TestFSRSBatchEngine(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+        self.rng = random.Random(1234)
+
+    def _random_cards(self, count):
+        cards = []
+        for i in range(count):
+            state = self.rng.choice([State.Learning, State.Review, State.Relearning]).value
+            step = None if state == State.Review.value else self.rng.randint(0, 4)
+            last_review = None
+            if self.rng.random() > 0.15:
+                last_review = self.now - timedelta(minutes=self.rng.randint(0, 60 * 24 * 90))
+            cards.append(FSRSCard(
+                user_id='test_batch_user',
+                question_id=f'q{i}',
+                due_date=self.now + timedelta(hours=self.rng.randint(-500, 500)),
+                stability=self.rng.uniform(0.1, 120.0),
+                difficulty=self.rng.uniform(1.0, 10.0),
+                state=state,
+                step=step,
+                last_review=last_review
+            ))
+        return cards
+
+    def _assert_matches_scheduler(self, scheduler, cards):
+        engine = FSRSBatchEngine(scheduler)
+        batch = CardBatch.from_cards(cards)
+        preview = engine.preview(batch, self.now)
+
+        for i, card in enumerate(cards):
+            fsrs_card = Card(
+                card_id=i + 1,
+                state=State(card.state),
+                step=card.step,
+                stability=card.stability,
+                difficulty=card.difficulty,
+                due=card.due_date,
+                last_review=card.last_review
+            )
+            self.assertAlmostEqual(
+                preview.retrievability[i],
+                scheduler.get_card_retrievability(fsrs_card, self.now),
+                places=12
+            )
+            for row, rating in enumerate(RATINGS):
+                expected, _ = scheduler.review_card(fsrs_card, rating, self.now)
+                msg = f"card {i} state={card.state} step={card.step} rating={rating.name}"
+                self.assertAlmostEqual(preview.stability[row, i], expected.stability, places=9, msg=msg)
+                self.assertAlmostEqual(preview.difficulty[row, i], expected.difficulty, places=9, msg=msg)
+                self.assertEqual(preview.state[row, i], expected.state.value, msg)
+                expected_step = -1 if expected.step is None else expected.step
+                self.assertEqual(preview.step[row, i], expected_step, msg)
+                self.assertEqual(from_us(preview.due[row, i]), expected.due, msg)
+
+    def test_matches_scalar_scheduler_default_profile(self):
+        params = resolve_scheduler_params()
+        params['enable_fuzzing'] = False
+        self._assert_matches_scheduler(Scheduler(**params), self._random_cards(300))
+
+    def test_matches_scalar_scheduler_edge_step_counts(self):
+        for learning_steps, relearning_steps in (
+            ([timedelta(minutes=3)], []),
+            ([], [timedelta(minutes=7)]),
+            ([timedelta(minutes=1), timedelta(minutes=11)], [timedelta(minutes=10), timedelta(hours=1)]),
+        ):
+            scheduler = Scheduler(
+                learning_steps=learning_steps,
+                relearning_steps=relearning_steps,
+                maximum_interval=365,
+                enable_fuzzing=False
+            )
+            self._assert_matches_scheduler(scheduler, self._random_cards(120))
+
+    def test_from_documents_normalizes_like_fsrs_card(self):
+        doc = {
+            '_id': 'c1', 'user_id': 'u', 'question_id': 'q', 'state': State.Learning.value,
+            'stability': 0.0, 'difficulty': None, 'due_date': datetime(2025, 1, 1), 'last_review': None
+        }
+        batch = CardBatch.from_documents([doc])
+        card = FSRSCard._from_dict(doc)
+        self.assertEqual(batch.stability[0], card.stability)
+        self.assertEqual(batch.difficulty[0], card.difficulty)
+        self.assertEqual(batch.step[0], card.step)
+        self.assertEqual(from_us(batch.due[0]), card.due_date)
+
+    def test_fuzzed_intervals_stay_in_range(self):
+        engine = FSRSBatchEngine(Scheduler(**resolve_scheduler_params()))
+        cards = [c for c in self._random_cards(200) if c.state == State.Review.value]
+        batch = CardBatch.from_cards(cards)
+        plain = engine.preview(batch, self.now)
+        fuzzed = engine.preview(batch, self.now, fuzz=True, rng=np.random.default_rng(7))
+        row = RATINGS.index(Rating.Good)
+        days = plain.interval[row] // 86_400_000_000
+        fuzzed_days = fuzzed.interval[row] // 86_400_000_000
+        self.assertTrue(np.all(np.abs(fuzzed_days - days) <= np.maximum(2, 0.2 * days) + 1))
+        self.assertTrue(np.all(fuzzed_days <= engine.maximum_interval))
+
+if __name__ == '__main__':
+    unittest.main()
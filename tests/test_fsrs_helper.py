@@ -3,7 +3,7 @@ from datetime import datetime, timezone, timedelta
 from utils.fsrs_helper import FSRSHelper
 from models.fsrs_card import FSRSCard
 from fsrs import Rating, State
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 class TestFSRSHelper(unittest.TestCase):
     def setUp(self):
@@ -143,32 +143,6 @@ class TestFSRSHelper(unittest.TestCase):
         )
         self.assertEqual(len(cards), 1)  # Should only get card2
 
-    @patch('utils.fsrs_helper.get_db')
-    def test_next_cards_with_skills(self, mock_get_db):
-        """Test getting next cards filtered by skills."""
-        mock_db = MagicMock()
-        mock_get_db.return_value = mock_db
-        
-        # Mock the database queries
-        mock_db.fsrs_cards.find.return_value.sort.return_value.limit.return_value = [
-            {'question_id': 'q1'},
-            {'question_id': 'q2'}
-        ]
-        
-        mock_db.questions.find.return_value = [
-            {'_id': 'q1', 'skill_category': 'algebra'},
-            {'_id': 'q2', 'skill_category': 'geometry'}
-        ]
-        
-        # Test filtering by skills
-        cards = FSRSHelper.get_next_cards(
-            self.test_user_id,
-            skills=['algebra'],
-            limit=10
-        )
-        self.assertEqual(len(cards), 1)
-        self.assertEqual(cards[0]['question_id'], 'q1')
-
     def test_retrievability(self):
         """Test getting card retrievability."""
         card = FSRSCard(
@@ -184,5 +158,51 @@ class TestFSRSHelper(unittest.TestCase):
         self.assertIsInstance(retrievability, float)
         self.assertTrue(0 <= retrievability <= 1)
 
+class TestDueCardQuery(unittest.TestCase):
+    """Shape of the due-card query; fsrs_cards is mocked, so no database or app context."""
+
+    def setUp(self):
+        self.test_user_id = 'test_user_123'
+        patcher = patch('models.fsrs_card.get_db')
+        self.db = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.limited = self.db.fsrs_cards.find.return_value.sort.return_value.limit
+
+    @patch('models.fsrs_card.QuestionBank.get_many', return_value={})
+    def test_next_cards_with_skills(self, _get_many):
+        """Skill filtering runs in the due-card query on the denormalized category."""
+        now = datetime.now(timezone.utc)
+        self.limited.return_value = [
+            {'_id': 'c1', 'user_id': self.test_user_id, 'question_id': 'q1', 'state': State.Review.value,
+             'due_date': now - timedelta(hours=1), 'category': 'algebra', 'question_difficulty': 4}
+        ]
+
+        cards = FSRSHelper.get_next_cards(
+            self.test_user_id,
+            skills=['Algebra', 'ALGEBRA'],
+            limit=10,
+            include_learning=False
+        )
+        query = self.db.fsrs_cards.find.call_args[0][0]
+        self.assertEqual(set(query), {'user_id', 'due_date', 'category', 'state'})
+        self.assertEqual(query['user_id'], self.test_user_id)
+        self.assertLessEqual(query['due_date']['$lte'], datetime.now(timezone.utc))
+        self.assertEqual(query['category'], {'$in': ['algebra']})
+        self.assertEqual(query['state'], State.Review.value)
+        self.db.fsrs_cards.find.return_value.sort.assert_called_once_with('due_date', 1)
+        self.limited.assert_called_once_with(10)
+        self.assertEqual(len(cards), 1)
+        self.assertEqual((cards[0]['question_id'], cards[0]['difficulty']), ('q1', 4))
+        self.db.questions.find_one.assert_not_called()
+
+    def test_due_cards_without_skills_match_every_category(self):
+        self.limited.return_value = [{'_id': 'c1', 'user_id': self.test_user_id, 'question_id': 'q1',
+                                      'state': State.Review.value, 'due_date': datetime.now(timezone.utc)}]
+        cards = FSRSHelper.get_due_cards(self.test_user_id, limit=5)
+        query = self.db.fsrs_cards.find.call_args[0][0]
+        self.assertEqual(set(query), {'user_id', 'due_date'})
+        self.limited.assert_called_once_with(5)
+        self.assertEqual(cards, [{'question_id': 'q1'}])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+import models.question_bank as question_bank
+from models.question_bank import QuestionBank
+from utils.lesson_composer import compose_lesson, serve_questions
+from fakes import FakeDB
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+USER_ID = ObjectId()
+
+def _card(question, overdue_days):
+    return {'user_id': USER_ID, 'question_id': question['_id'], 'category': question['category'].lower(),
+            'due_date': NOW - timedelta(days=overdue_days), 'last_review': NOW - timedelta(days=30)}
+
+class LessonTestCase(unittest.TestCase):
+    def setUp(self):
+        self.algebra = [{'_id': ObjectId(), 'category': 'Algebra', 'difficulty': 1 + i % 5,
+                         'options': ['1', '2'], 'correct_answer': [1], 'explanation': 'long text'} for i in range(40)]
+        self.geometry = [{'_id': ObjectId(), 'category': 'geometry', 'difficulty': 1} for _ in range(10)]
+        cards = [_card(q, days) for q, days in zip(self.algebra[:6], [1, 5, 3, -2, -1, 2])]
+        cards.append(_card(self.geometry[0], 9))  # due, but not in the chosen category
+        self.db = FakeDB(questions=self.algebra + self.geometry, fsrs_cards=cards)
+        question_bank._snapshot = None
+        question_bank._state['checked'] = float('inf')
+        QuestionBank.load(self.db)
+
+    def tearDown(self):
+        question_bank._snapshot = None
+        question_bank._state['checked'] = 0.0
+
+    def _ids(self, questions):
+        return [q['_id'] for q in questions]
+
+class TestComposeLesson(LessonTestCase):
+    def test_review_serves_most_overdue_first(self):
+        plan = compose_lesson(self.db, str(USER_ID), ['ALGEBRA'], 'review', now=NOW)
+        due = self._ids([self.algebra[1], self.algebra[2], self.algebra[5], self.algebra[0]])
+        self.assertEqual(plan.question_ids[:4], due)
+        self.assertEqual((plan.due, plan.new, plan.practice), (4, 0, 6))
+        self.assertEqual(len(set(plan.question_ids)), 10)
+
+    def test_initial_prefers_questions_without_cards(self):
+        plan = compose_lesson(self.db, USER_ID, ['algebra'], 'initial', now=NOW)
+        carded = set(self._ids(self.algebra[:6]))
+        self.assertEqual(plan.due, 0)
+        self.assertEqual(plan.new + plan.practice, 10)
+        self.assertFalse(carded & set(plan.question_ids[:plan.new]))
+
+    def test_practice_caps_due_and_new(self):
+        self.db.fsrs_cards.docs.extend(_card(q, 4) for q in self.algebra[6:10])
+        plan = compose_lesson(self.db, USER_ID, ['algebra', 'geometry'], 'practice', now=NOW)
+        self.assertEqual(plan.due, 5)
+        self.assertLessEqual(plan.new, 3)
+        self.assertEqual(len(plan.question_ids), 10)
+        # Due query, one $in card lookup
+        self.assertEqual(self.db.fsrs_cards.queries, 2)
+
+    def test_difficulty_stratum_applies_to_new_and_practice(self):
+        plan = compose_lesson(self.db, USER_ID, ['algebra'], 'initial', difficulties=[2], now=NOW)
+        levels = {q['_id']: q['difficulty'] for q in self.algebra}
+        self.assertEqual({levels[oid] for oid in plan.question_ids}, {2})
+        self.assertEqual(len(plan.question_ids), 8)
+
+    def test_partial_category_name(self):
+        plan = compose_lesson(self.db, USER_ID, ['geo'], 'initial', now=NOW)
+        self.assertEqual(len(plan.question_ids), 10)
+        self.assertEqual(set(plan.question_ids), set(self._ids(self.geometry)))
+
+    def test_empty_category(self):
+        plan = compose_lesson(self.db, USER_ID, ['unknown'], 'practice', now=NOW)
+        self.assertEqual(plan.question_ids, [])
+
+class TestServeQuestions(LessonTestCase):
+    def test_served_fields_and_review_flags_in_one_query(self):
+        self.db.fsrs_cards.docs[1]['last_review'] = None  # card created, never reviewed
+        ids = [str(q['_id']) for q in self.algebra[:3]]
+        served = serve_questions(self.db, USER_ID, ids)
+        self.assertEqual([q['id'] for q in served], ids)
+        self.assertEqual([q['is_review'] for q in served], [True, False, True])
+        self.assertNotIn('explanation', served[0])
+        self.assertEqual(served[0]['correct_answer'], [1])
+        self.assertEqual(self.db.fsrs_cards.queries, 1)
+
+if __name__ == '__main__':
+    unittest.main()
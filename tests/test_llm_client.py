@@ -0,0 +1,149 @@
+import asyncio
+import json
+import re
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from utils.llm_helper import LLMHelper, LLMTimeoutError
+
+OUTPUT = ["**步驟一：理解題目**\n\n", "* 已知 $$x", " = 1$$\n", "答案為 $(1, 2)$"]
+
+class FakeReplicate(BaseHTTPRequestHandler):
+    """Just enough of the Replicate API for streamed model predictions."""
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _prediction(self, prediction_id, status='starting'):
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        return {
+            'id': prediction_id, 'model': 'fake/model', 'version': '', 'status': status,
+            'input': {}, 'output': None, 'logs': '', 'error': None, 'metrics': None,
+            'created_at': None, 'started_at': None, 'completed_at': None,
+            'urls': {'stream': f"{base}/stream/{prediction_id}", 'cancel': f"{base}/v1/predictions/{prediction_id}/cancel"}
+        }
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        server = self.server
+        if re.fullmatch(r'/v1/models/[^/]+/[^/]+/predictions', self.path):
+            server.created += 1
+            self._json(201, self._prediction(f"p{server.created}"))
+        elif (match := re.fullmatch(r'/v1/predictions/([^/]+)/cancel', self.path)):
+            server.canceled.append(match.group(1))
+            self._json(200, self._prediction(match.group(1), 'canceled'))
+        else:
+            self._json(404, {'detail': 'not found'})
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        try:
+            for i, text in enumerate(OUTPUT):
+                time.sleep(self.server.delay)
+                data = '\n'.join(f"data: {line}" for line in text.split('\n'))
+                self.wfile.write(f"event: output\nid: {i}\n{data}\n\n".encode('utf-8'))
+                self.wfile.flush()
+            self.wfile.write(b"event: done\nid: done\ndata: {}\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class TestLLMClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeReplicate)
+        self.server.daemon_threads = True
+        self.server.created = 0
+        self.server.canceled = []
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _llm(self, **kwargs):
+        return LLMHelper(api_token='test-token', base_url=self.base_url, **kwargs)
+
+    def _wait_for_cancel(self):
+        deadline = time.monotonic() + 2
+        while not self.server.canceled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.server.canceled
+
+    def test_streams_formatted_output_over_one_pool(self):
+        llm = self._llm()
+        expected = llm._process_explanation(''.join(OUTPUT))
+        self.assertEqual(''.join(llm.stream_explanation({'options': [], 'selected_indices': []})), expected)
+        self.assertEqual(llm.generate_explanation({'options': [], 'selected_indices': []}), expected)
+        self.assertIs(llm.client, llm.client)
+        self.assertEqual(self.server.created, 2)
+        self.assertEqual(self.server.canceled, [])
+
+    def test_read_timeout(self):
+        self.server.delay = 1
+        llm = self._llm(timeout=httpx.Timeout(0.2, connect=1))
+        with self.assertRaises(httpx.ReadTimeout):
+            llm.generate_explanation({'options': [], 'selected_indices': []})
+        self.assertEqual(self._wait_for_cancel(), ['p1'])
+
+    def test_total_deadline_cancels_prediction(self):
+        self.server.delay = 0.1
+        llm = self._llm(total_timeout=0.15)
+        with self.assertRaises(LLMTimeoutError):
+            llm.generate_explanation({'options': [], 'selected_indices': []})
+        self.assertEqual(self._wait_for_cancel(), ['p1'])
+
+    def test_closing_the_stream_cancels_prediction(self):
+        llm = self._llm()
+        pieces = llm.stream_explanation({'options': [], 'selected_indices': []})
+        self.assertEqual(next(pieces), '**步驟一：理解題目**')
+        pieces.close()  # what a client disconnect does to the SSE generator
+        self.assertEqual(self._wait_for_cancel(), ['p1'])
+
+    def test_async_stream_matches_sync(self):
+        llm = self._llm()
+
+        async def collect():
+            try:
+                return [piece async for piece in llm.astream_explanation({'options': [], 'selected_indices': []})]
+            finally:
+                await llm.aclose()
+
+        pieces = asyncio.run(collect())
+        self.assertEqual(''.join(pieces), llm._process_explanation(''.join(OUTPUT)))
+        self.assertEqual(self.server.canceled, [])
+
+    def test_async_task_cancellation_cancels_prediction(self):
+        self.server.delay = 0.2
+        llm = self._llm()
+
+        async def consume(started):
+            async for _ in llm.astream_explanation({'options': [], 'selected_indices': []}):
+                started.set()
+
+        async def run():
+            started = asyncio.Event()
+            task = asyncio.create_task(consume(started))
+            await started.wait()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await llm.aclose()
+
+        asyncio.run(run())
+        self.assertEqual(self.server.canceled, ['p1'])
+
+if __name__ == '__main__':
+    unittest.main()
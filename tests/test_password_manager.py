@@ -0,0 +1,34 @@
+import unittest
+from unittest.mock import patch
+import utils.security as security
+from utils.security import PasswordManager
+
+class TestPasswordManager(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(security, 'BCRYPT_ROUNDS', 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hash_and_verify_in_the_pool(self):
+        with patch.object(security, 'PASSWORD_HASH_WORKERS', 1):
+            hashed = PasswordManager.hash_password('secret')
+            self.assertTrue(PasswordManager.verify_password('secret', hashed))
+            self.assertFalse(PasswordManager.verify_password('wrong', hashed))
+        security._get_pool().shutdown()
+        security._pool = None
+
+    def test_inline_when_pool_disabled(self):
+        with patch.object(security, 'PASSWORD_HASH_WORKERS', 0), \
+                patch.object(security, '_get_pool', side_effect=AssertionError('pool used')):
+            self.assertTrue(PasswordManager.verify_password('secret', PasswordManager.hash_password('secret')))
+
+    def test_needs_rehash_when_cost_changes(self):
+        with patch.object(security, 'PASSWORD_HASH_WORKERS', 0):
+            current = PasswordManager.hash_password('secret')
+            outdated = PasswordManager.hash_password('secret', rounds=5)
+        self.assertFalse(PasswordManager.needs_rehash(current))
+        self.assertTrue(PasswordManager.needs_rehash(outdated))
+        self.assertTrue(PasswordManager.needs_rehash('not-a-bcrypt-hash'))
+
+if __name__ == '__main__':
+    unittest.main()
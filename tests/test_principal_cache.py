@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch
+from bson import ObjectId
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token
+from models.user import User
+from utils.security import PrincipalCache, access_token_claims, require_role
+
+USER_ID = str(ObjectId())
+
+class TestRequireRole(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['JWT_SECRET_KEY'] = 'test-secret-key-with-enough-length'
+        JWTManager(self.app)
+        self.app.principal_cache = PrincipalCache(ttl=60)
+
+        @self.app.route('/admin')
+        @require_role('admin')
+        def admin():
+            return jsonify({'ok': True})
+
+        self.client = self.app.test_client()
+        self.stored = User(id=USER_ID, role='admin', auth_version=0)
+        patcher = patch('models.user.User.get_by_id', side_effect=lambda user_id, view='profile': self.stored)
+        self.get_by_id = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, user):
+        with self.app.app_context():
+            token = create_access_token(identity=USER_ID, additional_claims=access_token_claims(user))
+        return self.client.get('/admin', headers={'Authorization': f'Bearer {token}'})
+
+    def test_repeat_requests_skip_the_database(self):
+        for _ in range(3):
+            self.assertEqual(self._get(self.stored).status_code, 200)
+        self.assertEqual(self.get_by_id.call_count, 1)
+        self.assertEqual(self.app.principal_cache.stats()['hits'], 2)
+
+    def test_role_change_retires_old_tokens(self):
+        old = User(id=USER_ID, role='admin', auth_version=0)
+        self.assertEqual(self._get(old).status_code, 200)
+        self.stored = User(id=USER_ID, role='user', auth_version=1)
+        self.app.principal_cache.invalidate(USER_ID)  # as if the entry had expired
+        # The old token fails against the refreshed entry...
+        self.assertEqual(self._get(old).status_code, 403)
+        # ...and keeps failing from the cache, the newer entry answering for it
+        self.assertEqual(self._get(old).status_code, 403)
+        self.assertEqual(self.get_by_id.call_count, 2)
+
+    def test_newer_token_bypasses_the_cached_entry(self):
+        self.assertEqual(self._get(self.stored).status_code, 200)
+        self.stored = User(id=USER_ID, role='admin', auth_version=1)
+        self.assertEqual(self._get(self.stored).status_code, 200)
+        self.assertEqual(self.get_by_id.call_count, 2)
+
+    def test_role_claim_rejects_without_lookup(self):
+        self.stored = User(id=USER_ID, role='user', auth_version=0)
+        self.assertEqual(self._get(self.stored).status_code, 403)
+        self.assertEqual(self.get_by_id.call_count, 0)
+        self.assertEqual(self.app.principal_cache.stats()['misses'], 0)
+
+    def test_entries_expire(self):
+        self.app.principal_cache.ttl = 0
+        self._get(self.stored)
+        self._get(self.stored)
+        self.assertEqual(self.get_by_id.call_count, 2)
+
+class TestPrincipalCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        principals = PrincipalCache(max_entries=2)
+        principals.put('a', 'user', 0)
+        principals.put('b', 'user', 0)
+        principals.get('a', 0)
+        principals.put('c', 'admin', 0)
+        self.assertIsNone(principals.get('b', 0))
+        self.assertEqual(principals.get('a', 0)[0], 'user')
+
+    def test_answers_only_tokens_no_newer_than_the_entry(self):
+        principals = PrincipalCache()
+        principals.put('a', 'user', 2)
+        self.assertEqual(principals.get('a', 1)[:2], ('user', 2))
+        self.assertIsNone(principals.get('a', 3))
+
+if __name__ == '__main__':
+    unittest.main()
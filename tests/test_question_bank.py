@@ -0,0 +1,130 @@
+import unittest
+import threading
+from bson import ObjectId
+from unittest.mock import patch
+import models.question_bank as question_bank
+from utils.cache import CacheManager, LocalCacheBackend
+from models.question_bank import QuestionBank, QuestionRecord
+from fakes import FakeDB
+
+def _question(i, **extra):
+    doc = {'_id': ObjectId(), 'text': f'What is {i} + {i}?', 'options': [str(i), str(2 * i)],
+           'correct_answer': [1], 'category': 'algebra', 'difficulty': 1 + i % 5,
+           'tags': ['addition'], 'meta': {'source': 'seed', 'refs': [i]}}
+    doc.update(extra)
+    return doc
+
+class TestQuestionBank(unittest.TestCase):
+    def setUp(self):
+        self.docs = [_question(i) for i in range(5)]
+        self.db = FakeDB(questions=self.docs)
+        question_bank._snapshot = None
+        question_bank._state['checked'] = float('inf')  # no version checks in these tests
+        QuestionBank.load(self.db)
+
+    def tearDown(self):
+        question_bank._snapshot = None
+        question_bank._state['checked'] = 0.0
+
+    def test_record_round_trip(self):
+        for doc in self.docs:
+            self.assertEqual(QuestionRecord(doc).to_dict(), doc)
+
+    def test_records_share_key_layout(self):
+        first, second = QuestionRecord(self.docs[0]), QuestionRecord(self.docs[1])
+        self.assertIs(first.keys, second.keys)
+
+    def test_lookup_is_served_from_memory_and_copies(self):
+        queries = self.db.questions.queries
+        question = QuestionBank.get(str(self.docs[2]['_id']), self.db)
+        self.assertEqual(question, self.docs[2])
+        question['options'].append('mutated')
+        question['_id'] = str(question['_id'])
+        self.assertEqual(QuestionBank.get(self.docs[2]['_id'], self.db), self.docs[2])
+        self.assertEqual(self.db.questions.queries, queries)
+
+    def test_missing_question_falls_back_to_cache_and_database(self):
+        late = _question(99)
+        self.db.questions.docs.append(late)
+        cache = CacheManager(LocalCacheBackend())
+        with patch('models.question_bank.get_cache', return_value=cache):
+            self.assertEqual(QuestionBank.get(late['_id'], self.db), late)
+            queries = self.db.questions.queries
+            self.assertEqual(QuestionBank.get(late['_id'], self.db), late)
+            self.assertEqual(self.db.questions.queries, queries)
+            self.assertIsNone(QuestionBank.get(ObjectId(), self.db))
+            found = QuestionBank.get_many([self.docs[0]['_id'], str(late['_id'])], self.db)
+        self.assertEqual(set(found), {str(self.docs[0]['_id']), str(late['_id'])})
+        self.assertEqual(cache.stats()['namespaces']['question']['hits'], 2)
+
+    def test_content_version(self):
+        version = QuestionBank.content_version(sorted(self.docs, key=lambda d: d['_id']))
+        self.assertEqual(question_bank._snapshot.version, version)
+        self.assertEqual(QuestionBank.publish(self.db), version)
+
+    def test_publish_triggers_atomic_reload(self):
+        old = question_bank._snapshot
+        late = _question(42)
+        self.db.questions.docs.append(late)
+        QuestionBank.publish(self.db)
+        question_bank._state['checked'] = 0.0
+        self.assertIs(QuestionBank.snapshot(self.db), old)  # served while reloading
+        for thread in [t for t in threading.enumerate() if t.name == 'question-bank-reload']:
+            thread.join(5)
+        self.assertIsNot(question_bank._snapshot, old)
+        self.assertIn(late['_id'], question_bank._snapshot.records)
+        self.assertNotIn(late['_id'], old.records)
+
+    def test_unchanged_version_keeps_the_shared_snapshot(self):
+        QuestionBank.publish(self.db)
+        QuestionBank.load(self.db)
+        old = question_bank._snapshot
+        old.loaded_at -= 10 * 86400  # however old, an unchanged version is not reloaded
+        question_bank._state['checked'] = 0.0
+        QuestionBank.snapshot(self.db)
+        self.assertFalse(question_bank._state['refreshing'])
+        self.assertIs(question_bank._snapshot, old)
+
+    def test_concurrent_checks_start_one_reload(self):
+        QuestionBank.publish(self.db)
+        self.db.questions.docs.append(_question(43))
+        QuestionBank.publish(self.db)
+        question_bank._state['checked'] = 0.0
+        with patch.object(QuestionBank, '_start_reload', wraps=QuestionBank._start_reload) as start:
+            threads = [threading.Thread(target=QuestionBank.snapshot, args=(self.db,)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for thread in [t for t in threading.enumerate() if t.name == 'question-bank-reload']:
+                thread.join(5)
+        self.assertEqual(start.call_count, 1)
+
+    def test_sample_draws_distinct_ids_from_the_categories(self):
+        others = [_question(i, category='Geometry') for i in range(5, 30)]
+        self.db.questions.docs.extend(others)
+        QuestionBank.load(self.db)
+        geometry = {doc['_id'] for doc in others}
+        picked = QuestionBank.sample(['GEOMETRY'], 10, db=self.db)
+        self.assertEqual(len(picked), 10)
+        self.assertEqual(len(set(picked)), 10)
+        self.assertTrue(set(picked) <= geometry)
+        both = QuestionBank.sample(['algebra', 'geometry', 'algebra'], 100, db=self.db)
+        self.assertEqual(set(both), geometry | {doc['_id'] for doc in self.docs})
+
+    def test_sample_difficulty_stratum(self):
+        picked = QuestionBank.sample(['algebra'], 10, difficulties=[2, 3], db=self.db)
+        expected = {doc['_id'] for doc in self.docs if doc['difficulty'] in (2, 3)}
+        self.assertEqual(set(picked), expected)
+        self.assertEqual(QuestionBank.sample(['unknown'], 10, db=self.db), [])
+
+    def test_match_categories_falls_back_to_substrings(self):
+        self.db.questions.docs.extend([_question(5, category='Linear Algebra'), _question(6, category='Geometry')])
+        QuestionBank.load(self.db)
+        self.assertEqual(QuestionBank.match_categories(['ALGEBRA', 'topology'], db=self.db), ['algebra'])
+        self.assertEqual(QuestionBank.match_categories(['Linear'], db=self.db), ['linear algebra'])
+        self.assertEqual(QuestionBank.match_categories(['ALGEBR'], db=self.db), ['algebra', 'linear algebra'])
+        self.assertEqual(QuestionBank.match_categories(['topology', ''], db=self.db), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import threading
+from datetime import timedelta
+from utils.fsrs_helper import (
+    FSRSHelper, SchedulerCache, resolve_scheduler_params, scheduler_profile_key
+)
+
+class TestSchedulerCache(unittest.TestCase):
+    def test_same_profile_shares_scheduler(self):
+        """Helpers built from equal profiles reuse one Scheduler instance."""
+        first = FSRSHelper({'user_level': 'beginner'})
+        second = FSRSHelper({'user_level': 'beginner'})
+        self.assertIs(first.scheduler, second.scheduler)
+        self.assertIsNot(first.scheduler, FSRSHelper().scheduler)
+
+    def test_user_level_profiles(self):
+        """user_level adjusts retention and learning steps before explicit overrides."""
+        beginner = FSRSHelper({'user_level': 'beginner'}).scheduler
+        self.assertEqual(beginner.desired_retention, 0.90)
+        self.assertEqual(len(beginner.learning_steps), 4)
+
+        advanced = FSRSHelper({'user_level': 'advanced', 'desired_retention': 0.82}).scheduler
+        self.assertEqual(advanced.desired_retention, 0.82)
+        self.assertEqual(len(advanced.learning_steps), 2)
+
+    def test_stored_steps_equal_timedelta_steps(self):
+        """Profiles stored with steps in seconds hash the same as timedelta steps."""
+        as_seconds = resolve_scheduler_params({'learning_steps': [60, 600]})
+        as_timedelta = resolve_scheduler_params({'learning_steps': [timedelta(minutes=1), timedelta(minutes=10)]})
+        self.assertEqual(scheduler_profile_key(as_seconds), scheduler_profile_key(as_timedelta))
+
+    def test_cached_scheduler_is_read_only(self):
+        scheduler = FSRSHelper().scheduler
+        with self.assertRaises(AttributeError):
+            scheduler.desired_retention = 0.5
+
+    def test_cache_is_bounded(self):
+        cache = SchedulerCache(maxsize=2)
+        for retention in (0.80, 0.85, 0.90):
+            cache.get(resolve_scheduler_params({'desired_retention': retention}))
+        self.assertEqual(len(cache), 2)
+        cache.get(resolve_scheduler_params({'desired_retention': 0.90}))
+        self.assertEqual(cache.hits, 1)
+
+    def test_concurrent_gets_return_one_instance(self):
+        cache = SchedulerCache(maxsize=4)
+        params = resolve_scheduler_params({'desired_retention': 0.88})
+        seen = []
+
+        def worker():
+            seen.append(cache.get(params))
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertTrue(all(s is seen[0] for s in seen))
+
+    def test_normalize_profile_validation(self):
+        normalized = FSRSHelper.normalize_profile({
+            'user_level': 'beginner',
+            'learning_steps': [timedelta(minutes=2), 300]
+        })
+        self.assertEqual(normalized['learning_steps'], [120, 300])
+        with self.assertRaises(ValueError):
+            FSRSHelper.normalize_profile({'desired_retention': 0.2})
+        with self.assertRaises(ValueError):
+            FSRSHelper.normalize_profile({'unknown_field': 1})
+
+if __name__ == '__main__':
+    unittest.main()
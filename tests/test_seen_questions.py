@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+from bson import ObjectId
+from models.seen_questions import BUCKETS, SeenQuestions
+from models.user import USER_VIEWS, User
+
+class FakeSeenQuestions:
+    """Just the operators SeenQuestions sends; records how much array data a read returns."""
+
+    def __init__(self):
+        self.docs = {}
+        self.returned_ids = 0
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            key, update = op._filter['_id'], op._doc
+            doc = self.docs.setdefault(key, {'_id': key, **update['$setOnInsert']})
+            ids = doc.setdefault('ids', [])
+            ids.extend(oid for oid in update['$addToSet']['ids']['$each'] if oid not in ids)
+
+    def find(self, query, projection):
+        if '_id' in query:
+            docs = [self.docs[key] for key in query['_id']['$in'] if key in self.docs]
+        else:
+            docs = [doc for doc in self.docs.values() if doc['user_id'] == query['user_id']]
+        for doc in docs:
+            if 'hits' in projection:
+                asked = projection['hits']['$setIntersection'][1]
+                hits = [oid for oid in doc['ids'] if oid in asked]
+                self.returned_ids += len(hits)
+                yield {'hits': hits}
+            else:
+                yield {'n': len(doc['ids'])}
+
+    def delete_many(self, query):
+        self.docs = {k: d for k, d in self.docs.items() if d['user_id'] != query['user_id']}
+
+class FakeDB:
+    def __init__(self):
+        self.seen_questions = FakeSeenQuestions()
+
+class TestSeenQuestions(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB()
+        self.user_id = ObjectId()
+        self.questions = [ObjectId() for _ in range(40)]
+
+    def test_membership_and_count(self):
+        SeenQuestions.add(self.user_id, self.questions[:30], db=self.db)
+        SeenQuestions.add(str(self.user_id), [str(q) for q in self.questions[:5]], db=self.db)  # already seen
+        self.assertEqual(SeenQuestions.count(self.user_id, db=self.db), 30)
+        self.assertTrue(SeenQuestions.contains(self.user_id, self.questions[0], db=self.db))
+        self.assertFalse(SeenQuestions.contains(self.user_id, self.questions[35], db=self.db))
+        self.assertEqual(SeenQuestions.seen_among(self.user_id, self.questions[28:32], db=self.db),
+                         {str(q) for q in self.questions[28:30]})
+
+    def test_reads_return_only_matches(self):
+        SeenQuestions.add(self.user_id, self.questions, db=self.db)
+        SeenQuestions.contains(self.user_id, self.questions[0], db=self.db)
+        self.assertEqual(self.db.seen_questions.returned_ids, 1)
+        self.assertLessEqual(len(self.db.seen_questions.docs), BUCKETS)
+
+    def test_users_are_separate(self):
+        other = ObjectId()
+        SeenQuestions.add(self.user_id, self.questions[:3], db=self.db)
+        SeenQuestions.add(other, self.questions[:1], db=self.db)
+        SeenQuestions.reset(self.user_id, db=self.db)
+        self.assertEqual(SeenQuestions.count(self.user_id, db=self.db), 0)
+        self.assertEqual(SeenQuestions.count(other, db=self.db), 1)
+
+class TestUserViews(unittest.TestCase):
+    @patch('models.user.get_db')
+    def test_loaders_project_their_view(self, mock_get_db):
+        users = mock_get_db.return_value.users
+        users.find_one.return_value = {'_id': ObjectId(), 'role': 'admin'}
+        user = User.get_by_id(str(ObjectId()), view='role')
+        self.assertEqual(users.find_one.call_args[0][1], {'role': 1, 'auth_version': 1})
+        self.assertEqual(user.role, 'admin')
+
+        User.find_by_email('a@example.com')
+        self.assertEqual(users.find_one.call_args[0][1], USER_VIEWS['auth'])
+        self.assertNotIn('seen_question_ids', USER_VIEWS['auth'])
+        self.assertNotIn('seen_question_ids', USER_VIEWS['profile'])
+
+    @patch('models.user.SeenQuestions.count', return_value=7)
+    def test_stats_count_without_loading_ids(self, _count):
+        user = User(id=str(ObjectId()), total_questions_answered=10, correct_answers=7)
+        self.assertEqual(user.get_question_stats()['seen_questions'], 7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import copy
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from bson import ObjectId
+from utils.session_store import MongoSessionStore, RedisSessionStore
+from fakes import FakeCollection, FakeDB
+
+try:
+    import fakeredis
+    fakeredis.FakeRedis().eval('return 1', 0)
+except Exception:  # not installed, or without its Lua extra
+    fakeredis = None
+
+class RecordingCollection(FakeCollection):
+    """Keeps what each find_one_and_update returned, to check how much of the queue is shipped."""
+
+    def __init__(self, docs=None):
+        super().__init__(docs)
+        self.returned = []
+
+    def find_one_and_update(self, *args, **kwargs):
+        self.returned.append(super().find_one_and_update(*args, **kwargs))
+        return copy.deepcopy(self.returned[-1])
+
+QUESTIONS = [str(ObjectId()) for _ in range(5)]
+
+class TestMongoSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB(RecordingCollection)
+        patcher = patch('utils.session_store.get_db', return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = MongoSessionStore()
+        self.store.create('s1', 'u1', QUESTIONS, selected_categories=['algebra'], type='practice')
+
+    def test_cursor_walks_the_queue(self):
+        self.assertEqual(self.store.next('s1', 'u1', 1), (QUESTIONS[:1], 4))
+        self.assertEqual(self.store.next('s1', 'u1', 3), (QUESTIONS[1:4], 1))
+        self.assertEqual(self.store.next('s1', 'u1', 3), (QUESTIONS[4:], 0))
+        self.assertEqual(self.store.next('s1', 'u1', 1), ([], 0))
+        session = self.store.get('s1')
+        self.assertNotIn('questions', session)
+        self.assertEqual((session['total'], session['cursor']), (5, 5))
+        self.assertEqual(session['type'], 'practice')
+
+    def test_completed_when_the_cursor_reaches_the_end(self):
+        self.store.next('s1', 'u1', 4)
+        self.assertFalse(self.store.get('s1')['completed'])
+        self.store.next('s1', 'u1', 1)
+        self.assertTrue(self.store.get('s1')['completed'])
+
+    def test_only_the_served_ids_are_returned(self):
+        self.store.next('s1', 'u1', 2)
+        self.store.next('s1', 'u1', 2)
+        returned = self.db['lesson_sessions'].returned
+        self.assertEqual([doc['questions'] for doc in returned], [QUESTIONS[:2], QUESTIONS[2:4]])
+
+    def test_a_concurrent_step_is_not_served_twice(self):
+        collection = self.db['lesson_sessions']
+        find_one = collection.find_one
+
+        def racing_find_one(query, projection=None):
+            state = find_one(query, projection)
+            if not collection.returned:
+                collection.find_one = find_one
+                self.store.next('s1', 'u1', 2)  # lands between our read and update
+            return state
+
+        collection.find_one = racing_find_one
+        self.assertEqual(self.store.next('s1', 'u1', 2), (QUESTIONS[2:4], 1))
+
+    def test_only_the_owner_advances(self):
+        self.assertIsNone(self.store.next('s1', 'someone-else', 1))
+        self.assertIsNone(self.store.next('missing', 'u1', 1))
+        self.assertEqual(self.store.get('s1')['cursor'], 0)
+
+    def test_each_step_leaves_the_document_size_unchanged(self):
+        doc = self.db['lesson_sessions'].docs[0]
+        keys = set(doc)
+        for _ in range(4):
+            self.store.next('s1', 'u1', 1)
+        self.assertEqual(set(doc), keys)
+        self.assertEqual(doc['questions'], QUESTIONS)
+
+    def test_answers_are_capped(self):
+        with patch('utils.session_store.MAX_ANSWERS', 3):
+            for i in range(5):
+                self.store.record_answer('s1', {'question_id': QUESTIONS[i], 'correct': i % 2 == 0,
+                                                'timestamp': datetime.now(timezone.utc)})
+        answers = self.store.answers('s1')
+        self.assertEqual([a['question_id'] for a in answers], QUESTIONS[2:])
+        self.assertTrue(self.db['lesson_session_answers'].find_one({'_id': 's1'})['last_answer_correct'])
+        self.assertNotIn('answers', self.db['lesson_sessions'].docs[0])
+
+    def test_legacy_session_is_converted(self):
+        self.db['lesson_sessions'].insert_one({
+            'session_id': 'old', 'user_id': 'u1', 'available_questions': QUESTIONS[2:],
+            'used_questions': QUESTIONS[:2] + QUESTIONS[:2]
+        })
+        self.assertEqual(self.store.next('old', 'u1', 2), (QUESTIONS[2:4], 1))
+        doc = self.db['lesson_sessions'].find_one({'session_id': 'old'})
+        self.assertNotIn('used_questions', doc)
+        self.assertEqual(doc['cursor'], 2)
+
+@unittest.skipIf(fakeredis is None, 'fakeredis[lua] is not installed')
+class TestRedisSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.store = RedisSessionStore(self.redis, ttl=600)
+        self.store.create('s1', 'u1', QUESTIONS, selected_categories=['algebra'], type='practice')
+
+    def test_cursor_walks_the_queue_and_stops_at_the_end(self):
+        self.assertEqual(self.store.next('s1', 'u1', 1), (QUESTIONS[:1], 4))
+        self.assertEqual(self.store.next('s1', 'u1', 3), (QUESTIONS[1:4], 1))
+        self.assertFalse(self.store.get('s1')['completed'])
+        self.assertEqual(self.store.next('s1', 'u1', 3), (QUESTIONS[4:], 0))
+        self.assertEqual(self.store.next('s1', 'u1', 1), ([], 0))
+        session = self.store.get('s1')
+        self.assertEqual((session['total'], session['cursor']), (5, 5))
+        self.assertTrue(session['completed'])
+
+    def test_only_the_owner_advances(self):
+        self.assertIsNone(self.store.next('s1', 'someone-else', 1))
+        self.assertIsNone(self.store.next('missing', 'u1', 1))
+        self.assertEqual(self.store.get('s1')['cursor'], 0)
+
+    def test_get_decodes_the_hash(self):
+        session = self.store.get('s1')
+        self.assertEqual(session['user_id'], 'u1')
+        self.assertEqual(session['selected_categories'], ['algebra'])
+        self.assertEqual(session['type'], 'practice')
+        self.assertIsInstance(session['created_at'], datetime)
+        self.assertIsNone(self.store.get('missing'))
+
+    def test_empty_queue_is_completed_at_once(self):
+        self.store.create('s2', 'u1', [])
+        self.assertTrue(self.store.get('s2')['completed'])
+        self.assertEqual(self.store.next('s2', 'u1', 1), ([], 0))
+
+    def test_answers_are_capped(self):
+        with patch('utils.session_store.MAX_ANSWERS', 3):
+            for i in range(5):
+                self.store.record_answer('s1', {'question_id': QUESTIONS[i], 'correct': i % 2 == 0,
+                                                'timestamp': datetime.now(timezone.utc)})
+        self.assertEqual([a['question_id'] for a in self.store.answers('s1')], QUESTIONS[2:])
+        self.assertEqual(self.redis.hget('lw:lesson:s1', 'last_answer_correct'), b'1')
+
+    def test_each_step_refreshes_the_ttl(self):
+        self.store.record_answer('s1', {'question_id': QUESTIONS[0], 'correct': True,
+                                        'timestamp': datetime.now(timezone.utc)})
+        keys = ['lw:lesson:s1', 'lw:lesson:s1:queue', 'lw:lesson:s1:answers']
+        for key in keys:
+            self.redis.expire(key, 5)
+        self.store.next('s1', 'u1', 1)
+        for key in keys:
+            self.assertGreater(self.redis.ttl(key), 5, key)
+
+if __name__ == '__main__':
+    unittest.main()
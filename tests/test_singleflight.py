@@ -0,0 +1,118 @@
+import threading
+import time
+import unittest
+from utils import singleflight as singleflight_module
+from utils.singleflight import SingleFlight
+
+class MemoryLeaseStore:
+    """Lease store shared by several SingleFlight instances, standing in for Redis/Mongo."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self.leases = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key, token, ttl):
+        with self.lock:
+            lease = self.leases.get(key)
+            if lease and lease[1] > time.monotonic():
+                return False
+            self.leases[key] = (token, time.monotonic() + ttl)
+            return True
+
+    def held(self, key):
+        lease = self.leases.get(key)
+        return bool(lease and lease[1] > time.monotonic())
+
+    def release(self, key, token):
+        with self.lock:
+            if self.leases.get(key, (None,))[0] == token:
+                del self.leases[key]
+
+class FailingLeaseStore:
+    name = 'failing'
+
+    def acquire(self, key, token, ttl):
+        raise ConnectionError('lease store down')
+
+    def held(self, key):
+        raise ConnectionError('lease store down')
+
+    def release(self, key, token):
+        raise ConnectionError('lease store down')
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.store = MemoryLeaseStore()
+        self.results = {}
+        self._poll = singleflight_module.POLL_INTERVAL
+        singleflight_module.POLL_INTERVAL = 0.01
+
+    def tearDown(self):
+        singleflight_module.POLL_INTERVAL = self._poll
+
+    def _slow_generate(self, calls, key='k', value='explanation'):
+        def generate():
+            calls.append(1)
+            time.sleep(0.1)
+            self.results[key] = value
+            return value
+        return generate
+
+    def test_concurrent_calls_in_one_worker_share_one_generation(self):
+        flights = SingleFlight(self.store, wait_seconds=5)
+        calls, answers = [], []
+        generate = self._slow_generate(calls)
+        threads = [
+            threading.Thread(target=lambda: answers.append(flights.do('k', generate, lambda: self.results.get('k'))))
+            for _ in range(20)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(answers, ['explanation'] * 20)
+        self.assertEqual(flights.stats()['in_flight'], 0)
+        self.assertEqual(self.store.leases, {})
+
+    def test_other_worker_waits_for_the_lease_holder(self):
+        leader, follower = SingleFlight(self.store, wait_seconds=5), SingleFlight(self.store, wait_seconds=5)
+        calls = []
+        flight = leader.try_lead('k')
+        self.assertIsNotNone(flight)
+
+        def finish():
+            time.sleep(0.1)
+            self.results['k'] = 'explanation'
+            flight.release()
+        threading.Thread(target=finish).start()
+
+        answer = follower.do('k', self._slow_generate(calls), lambda: self.results.get('k'))
+        self.assertEqual(answer, 'explanation')
+        self.assertEqual(calls, [])
+        self.assertEqual(follower.stats()['remote_waits'], 1)
+
+    def test_follower_takes_over_when_the_leader_fails(self):
+        flights = SingleFlight(self.store, wait_seconds=5)
+        calls = []
+        with flights.try_lead('k'):
+            pass  # leader released without storing a result
+        self.assertEqual(flights.do('k', self._slow_generate(calls), lambda: self.results.get('k')), 'explanation')
+        self.assertEqual(len(calls), 1)
+
+    def test_expired_lease_does_not_block(self):
+        self.store.acquire('k', 'crashed-worker', ttl=0)
+        flights = SingleFlight(self.store, wait_seconds=5)
+        self.assertIsNotNone(flights.try_lead('k'))
+
+    def test_store_errors_fall_back_to_generating(self):
+        flights = SingleFlight(FailingLeaseStore(), wait_seconds=1)
+        calls = []
+        self.assertEqual(flights.do('k', self._slow_generate(calls), lambda: None), 'explanation')
+        self.assertEqual(len(calls), 1)
+        self.assertGreaterEqual(flights.stats()['errors'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
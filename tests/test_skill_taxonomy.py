@@ -0,0 +1,46 @@
+import unittest
+from models.skill_taxonomy import SkillTaxonomy
+
+def _rows(*entries):
+    return [{'_id': key, 'count': count} for key, count in entries]
+
+class TestSkillTaxonomy(unittest.TestCase):
+    def setUp(self):
+        self.nodes = _rows(
+            ({'category': 'geometry', 'sub_topic': 'circles', 'difficulty': 2}, 3),
+            ({'category': 'algebra', 'sub_topic': 'equations', 'difficulty': 1}, 4),
+            ({'category': 'algebra', 'sub_topic': 'equations', 'difficulty': 3}, 1),
+            ({'category': 'algebra', 'sub_topic': '', 'difficulty': 2}, 2),
+            ({'category': '', 'sub_topic': 'orphans', 'difficulty': 1}, 5),
+        )
+        self.tags = _rows(
+            ({'category': 'algebra', 'sub_topic': 'equations', 'tag': 'linear', 'difficulty': 1}, 3),
+            ({'category': 'algebra', 'sub_topic': 'equations', 'tag': 'linear', 'difficulty': 3}, 1),
+            ({'category': 'algebra', 'sub_topic': 'equations', 'tag': 'quadratic', 'difficulty': 1}, 1),
+            ({'category': '', 'sub_topic': 'orphans', 'tag': 'x', 'difficulty': 1}, 5),
+        )
+
+    def test_tree_counts_and_histograms(self):
+        tree = SkillTaxonomy.assemble(self.nodes, self.tags)
+        self.assertEqual(tree['total'], 10)
+        self.assertEqual([c['name'] for c in tree['categories']], ['algebra', 'geometry'])
+
+        algebra = tree['categories'][0]
+        self.assertEqual(algebra['count'], 7)
+        self.assertEqual(algebra['difficulty'], {'1': 4, '2': 2, '3': 1})
+        self.assertEqual([s['name'] for s in algebra['sub_topics']], ['', 'equations'])
+
+        equations = algebra['sub_topics'][1]
+        self.assertEqual(equations['count'], 5)
+        linear = equations['tags'][0]
+        self.assertEqual((linear['name'], linear['count'], linear['difficulty']), ('linear', 4, {'1': 3, '3': 1}))
+
+    def test_version_is_stable_and_content_addressed(self):
+        first = SkillTaxonomy.assemble(self.nodes, self.tags)
+        second = SkillTaxonomy.assemble(list(reversed(self.nodes)), list(reversed(self.tags)))
+        self.assertEqual(first['version'], second['version'])
+        changed = SkillTaxonomy.assemble(self.nodes[:-2], self.tags)
+        self.assertNotEqual(first['version'], changed['version'])
+
+if __name__ == '__main__':
+    unittest.main()
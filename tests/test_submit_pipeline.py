@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from flask import Flask
+from fsrs import State
+from models.fsrs_card import FSRSCard
+from utils.submit_pipeline import SubmitPipeline
+
+USER_ID = str(ObjectId())
+QUESTION_ID = str(ObjectId())
+QUESTION = {'_id': ObjectId(QUESTION_ID), 'category': 'Algebra', 'difficulty': 2, 'correct_answer': [1]}
+
+class TestSubmitPipeline(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.session_store = self.sessions = MagicMock()
+        self.db = MagicMock()
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        patcher = patch('utils.submit_pipeline.QuestionBank.get', return_value=QUESTION)
+        self.question_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pipeline = SubmitPipeline(self.db)
+
+    def test_load_collects_all_four_reads(self):
+        self.sessions.get.return_value = {'session_id': 's1', 'user_id': USER_ID}
+        self.db.fsrs_cards.find_one.return_value = {
+            '_id': ObjectId(), 'user_id': ObjectId(USER_ID), 'question_id': ObjectId(QUESTION_ID),
+            'state': State.Review.value, 'stability': 4.0, 'difficulty': 5.0, 'reps': 3
+        }
+        self.db.users.find_one.return_value = {'stats': {'current_streak': 2},
+                                               'scheduler_profile': {'desired_retention': 0.85}}
+        ctx = self.pipeline.load(USER_ID, 's1', QUESTION_ID)
+        self.assertEqual(ctx.question, QUESTION)
+        self.assertEqual(ctx.session['session_id'], 's1')
+        self.assertEqual((ctx.card.state, ctx.card.reps), (State.Review.value, 3))
+        self.assertEqual(ctx.user_stats, {'current_streak': 2})
+        self.assertEqual(ctx.scheduler_profile, {'desired_retention': 0.85})
+        self.assertEqual(self.db.users.find_one.call_args[0][1], {'stats': 1, 'scheduler_profile': 1})
+
+    def test_load_tolerates_missing_documents(self):
+        self.question_get.return_value = None
+        self.sessions.get.return_value = None
+        self.db.fsrs_cards.find_one.return_value = None
+        self.db.users.find_one.return_value = None
+        ctx = self.pipeline.load(USER_ID, 's1', QUESTION_ID)
+        self.assertIsNone(ctx.question)
+        self.assertIsNone(ctx.session)
+        # A card that does not exist yet is built in memory only
+        self.assertIsNone(ctx.card._id)
+        self.assertEqual(str(ctx.card.question_id), QUESTION_ID)
+        self.assertEqual((ctx.user_stats, ctx.scheduler_profile), ({}, {}))
+
+    def _commit(self, is_correct=True, card=None):
+        self.db.fsrs_cards.find_one.return_value = None
+        self.db.users.find_one.return_value = None
+        ctx = self.pipeline.load(USER_ID, 's1', QUESTION_ID)
+        card = card or MagicMock(spec=FSRSCard, ever_correct=False)
+        self.pipeline.commit(ctx, card, is_correct, [1], 4.5)
+        return card
+
+    def test_commit_writes_every_store(self):
+        card = self._commit(is_correct=False)
+        card.denormalize_question.assert_called_once_with(QUESTION)
+        card.save.assert_called_once_with()
+        session_id, answer = self.sessions.record_answer.call_args[0]
+        self.assertEqual((session_id, answer['question_id'], answer['correct']), ('s1', QUESTION_ID, False))
+        self.assertEqual(self.db.lesson_reports.insert_one.call_args[0][0]['selected_indices'], [1])
+        user_update = self.db.users.update_one.call_args[0][1]
+        self.assertEqual(user_update['$set'], {'stats.current_streak': 0})
+
+    def test_failed_report_insert_is_tolerated(self):
+        self.db.lesson_reports.insert_one.side_effect = Exception('report store down')
+        with self.assertLogs('utils.submit_pipeline', level='WARNING'):
+            self._commit()
+        self.db.users.update_one.assert_called_once()
+
+    def test_failed_required_writes_are_raised(self):
+        for name in ('card', 'session', 'user'):
+            with self.subTest(write=name):
+                card = MagicMock(spec=FSRSCard, ever_correct=False)
+                card.save.side_effect = RuntimeError('card') if name == 'card' else None
+                self.sessions.record_answer.side_effect = RuntimeError('session') if name == 'session' else None
+                self.db.users.update_one.side_effect = RuntimeError('user') if name == 'user' else None
+                with self.assertRaisesRegex(RuntimeError, name):
+                    self._commit(card=card)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from fsrs import State
+from models.user_progress import UserProgress
+
+class TestUserProgressDelta(unittest.TestCase):
+    def setUp(self):
+        self.reviewed = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+    def _card(self, **fields):
+        card = {'category': 'algebra', 'state': State.Learning.value, 'stability': 2.5,
+                'difficulty': 2.5, 'reps': 0, 'lapses': 0, 'last_review': None, 'ever_correct': False}
+        card.update(fields)
+        return card
+
+    def test_first_answer_counts_card_and_answer(self):
+        current = self._card(reps=1, last_review=self.reviewed, ever_correct=True)
+        delta = UserProgress.card_delta(None, current)
+        self.assertEqual(delta, {'algebra': {
+            'cards': 1, 'states.1': 1, 'stability_sum.1': 2.5, 'difficulty_sum.1': 2.5,
+            'reps': 1, 'answered': 1, 'correct': 1
+        }})
+
+    def test_repeat_answer_only_moves_state(self):
+        previous = self._card(reps=1, last_review=self.reviewed, ever_correct=True)
+        current = self._card(state=State.Review.value, stability=10.0, difficulty=3.0,
+                             reps=2, last_review=self.reviewed, ever_correct=True)
+        delta = UserProgress.card_delta(previous, current)['algebra']
+        self.assertNotIn('answered', delta)
+        self.assertNotIn('correct', delta)
+        self.assertNotIn('cards', delta)
+        self.assertEqual(delta['states.1'], -1)
+        self.assertEqual(delta['states.2'], 1)
+        self.assertEqual(delta['stability_sum.2'], 10.0)
+        self.assertEqual(delta['reps'], 1)
+
+    def test_first_correct_after_wrong_answer(self):
+        previous = self._card(reps=1, lapses=1, last_review=self.reviewed)
+        current = self._card(reps=2, lapses=1, last_review=self.reviewed, ever_correct=True)
+        delta = UserProgress.card_delta(previous, current)['algebra']
+        self.assertEqual(delta, {'reps': 1, 'correct': 1})
+
+    def test_legacy_card_without_category_is_only_added(self):
+        previous = self._card(reps=3, last_review=self.reviewed)
+        del previous['category']
+        current = self._card(reps=4, last_review=self.reviewed)
+        delta = UserProgress.card_delta(previous, current)
+        self.assertEqual(delta['algebra']['cards'], 1)
+        self.assertEqual(delta['algebra']['reps'], 4)
+
+    def test_category_change_moves_between_rollups(self):
+        previous = self._card(category='', last_review=self.reviewed)
+        current = self._card(last_review=self.reviewed)
+        delta = UserProgress.card_delta(previous, current)
+        self.assertEqual(delta['']['cards'], -1)
+        self.assertEqual(delta['']['answered'], -1)
+        self.assertEqual(delta['algebra']['cards'], 1)
+
+    def test_state_totals(self):
+        docs = [
+            {'states': {'1': 2, '2': 1}, 'stability_sum': {'1': 5.0, '2': 9.0}, 'difficulty_sum': {'1': 4.0, '2': 3.0}},
+            {'states': {'2': 1, '3': 0}, 'stability_sum': {'2': 3.0}, 'difficulty_sum': {'2': 5.0}},
+        ]
+        totals = UserProgress.state_totals(docs)
+        self.assertEqual(set(totals), {1, 2})
+        self.assertEqual(totals[2], {'count': 2, 'stability': 12.0, 'difficulty': 8.0})
+
+    def test_failed_rollup_write_is_logged_and_counted(self):
+        db = MagicMock()
+        db.user_progress.update_one.side_effect = [Exception('primary stepped down'), None]
+        previous = self._card(category='', last_review=self.reviewed)
+        current = self._card(last_review=self.reviewed)
+        before = UserProgress.stats()
+        with self.assertLogs('models.user_progress', level='ERROR'):
+            UserProgress.record_card('u1', previous, current, db=db)
+        after = UserProgress.stats()
+        self.assertEqual(db.user_progress.update_one.call_count, 2)
+        self.assertEqual(after['failed_writes'] - before['failed_writes'], 1)
+        self.assertEqual(after['writes'] - before['writes'], 1)
+
+if __name__ == '__main__':
+    unittest.main()